@@ -0,0 +1,48 @@
+"""Per-lookup cost of translated text.
+
+Run from the repository root:
+
+    python benchmarks/bench_localization.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.localization import LocalizationManager
+
+def legacy_get_text(translations, default_language, language_code, key_path, **kwargs):
+    """The nested-walk lookup LocalizationManager used before catalogs were flattened"""
+    language = translations.get(language_code, translations[default_language])
+    text = language
+    for key in key_path.split('-'):
+        text = text.get(key, None)
+    if isinstance(text, str):
+        return text.format(**kwargs)
+    if language_code != default_language:
+        return legacy_get_text(translations, default_language, default_language, key_path, **kwargs)
+    return f"Missing translation: {key_path}"
+
+CASES = [
+    ('static text', 'en', 'errors-not_found', {}),
+    ('formatted text', 'en', 'event-create-success', {'event_id': 42}),
+    ('fallback to default', 'xx', 'errors-event_closed', {}),
+]
+
+def main():
+    manager = LocalizationManager()
+    # A partial language exercises the fallback path in both implementations
+    manager.translations['xx'] = {'errors': {'not_found': 'Introuvable.'}}
+    manager._compile()
+    number = 200_000
+    print(f"{'case':<22} {'legacy':>10} {'catalog':>10}")
+    for label, language, key, kwargs in CASES:
+        legacy = timeit.timeit(
+            lambda: legacy_get_text(manager.translations, 'en', language, key, **kwargs), number=number
+        ) / number
+        current = timeit.timeit(lambda: manager.get_text(language, key, **kwargs), number=number) / number
+        print(f"{label:<22} {legacy * 1e9:>8.0f}ns {current * 1e9:>8.0f}ns")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Micro-benchmark of event message rendering.
+
+Run from the repository root:
+
+    python benchmarks/bench_renderer.py
+"""
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from events.renderer import EventRenderer
+from events.templates import TemplateRegistry
+
+ROSTER_SIZES = [10, 1_000, 10_000]
+
+def legacy_render(event, participants, templates):
+    """The per-role filtering renderer that used to live in the cogs"""
+    message_parts = [
+        f"📅 **{event['name']}**\n",
+        f"{event['description']}\n",
+        f"🕒 Start: {event['start_date'].strftime('%Y-%m-%d %H:%M')}\n"
+    ]
+    template = templates[event['template_name']]
+    message_parts.append("\n**Roles:**")
+    for role_name, role_info in template['roles'].items():
+        role_participants = [p for p in participants if p['role_name'] == role_name]
+        participant_list = [f"<@{p['user_id']}>" for p in role_participants]
+        message_parts.append(f"\n{role_info['emoji']} {role_name} ({len(role_participants)}/{role_info['limit']})")
+        message_parts.append("→ " + ", ".join(participant_list) if participant_list else "→ No participants")
+    message_parts.append(f"\n📝 Event ID: {event['id']} | Status: {event['status']}")
+    return "\n".join(message_parts)
+
+def make_roster(size, roles):
+    return [
+        {'user_id': 100000000000000000 + i, 'role_name': roles[i % len(roles)]}
+        for i in range(size)
+    ]
+
+def main():
+    templates = TemplateRegistry('templates', poll_interval=0)
+    templates.load()
+    roles = templates['raid'].role_order
+    event = {
+        'id': 1, 'name': 'Benchmark Raid', 'description': 'Weekly raid',
+        'start_date': datetime(2024, 1, 1, 20, 0), 'status': 'open', 'template_name': 'raid'
+    }
+    print(f"{'roster':>8} {'legacy':>12} {'cold':>12} {'one change':>12} {'length':>7}")
+    for size in ROSTER_SIZES:
+        participants = make_roster(size, roles)
+        number = max(1, 20_000 // size)
+        legacy = timeit.timeit(lambda: legacy_render(event, participants, templates), number=number) / number
+
+        def cold():
+            EventRenderer(templates).render_text(event, participants)
+        cold_time = timeit.timeit(cold, number=number) / number
+
+        renderer = EventRenderer(templates)
+        renderer.render_text(event, participants)
+        changed = list(participants)
+
+        def one_change():
+            # A signup in one role: the other role sections come from the cache
+            changed.append({'user_id': len(changed), 'role_name': roles[0]})
+            renderer.render_text(event, changed)
+            changed.pop()
+        warm_time = timeit.timeit(one_change, number=number) / number
+        # Large rosters are shortened so the message stays within Discord's limit
+        length = len(renderer.render_text(event, participants))
+        print(f"{size:>8} {legacy * 1e6:>10.1f}us {cold_time * 1e6:>10.1f}us {warm_time * 1e6:>10.1f}us {length:>7}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Startup cost: time per startup phase and time to the first answered interaction.
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10
+
+Each run builds a fresh EventBot on the load test's fake gateway and
+SQLite database (benchmarks/loadtest), runs setup_hook, fires on_ready
+twice (a start and a reconnect) and clicks a signup button. tree.sync is replaced by a counter, so the report also
+shows how many syncs the conditional command sync actually sent.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'loadtest'))
+
+from events.router import encode_custom_id
+from run import Harness
+from utils.startup import CommandSyncState
+
+class Options:
+    db_latency = 0.0
+    api_latency = 0.0
+    edit_delay = 0.05
+
+async def measure(state_path):
+    """Returns (phases, time to first interaction, tree syncs sent)"""
+    harness = Harness(Options())
+    started = time.perf_counter()
+    await harness.start()
+    bot = harness.bot
+    bot.command_sync = CommandSyncState(state_path)
+    syncs = []
+
+    async def sync():
+        syncs.append(time.perf_counter())
+        return bot.tree.get_commands()
+    bot.tree.sync = sync
+    try:
+        await bot.on_ready()
+        await bot.on_ready()
+        event_id, message, roles = await harness.post_event()
+        interaction = harness.gateway.click(harness.gateway.user(), message, encode_custom_id('signup', event_id, roles[0]))
+        await harness.click(interaction)
+        first_interaction = time.perf_counter() - started
+    finally:
+        bot.scheduler.stop()
+        bot.conversations.stop()
+        await harness.stop()
+    return dict(bot.startup.phases), first_interaction, len(syncs)
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure startup phases and time to first interaction')
+    parser.add_argument('--runs', type=int, default=5)
+    options = parser.parse_args()
+    results = []
+    with tempfile.TemporaryDirectory(prefix='eventbot-startup-') as directory:
+        state_path = os.path.join(directory, 'command_tree.json')
+        for _ in range(options.runs):
+            results.append(asyncio.run(measure(state_path)))
+    phases = list(results[0][0])
+    print(f"{options.runs} runs (median ms)")
+    for phase in phases:
+        print(f"  {phase:<20}{statistics.median(r[0].get(phase, 0.0) for r in results) * 1000:>10.1f}")
+    print(f"  {'first interaction':<20}{statistics.median(r[1] for r in results) * 1000:>10.1f}")
+    print(f"command tree syncs sent: {sum(r[2] for r in results)} over {options.runs * 2} on_ready calls")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""The same event workload on each storage backend.
+
+Run from the repository root:
+
+    python benchmarks/bench_storage.py
+    python benchmarks/bench_storage.py --mysql-database eventbot_bench
+
+SQLite runs on a temporary file. MySQL is only included when a scratch
+database is named; the connection settings come from config.yml.
+"""
+import argparse
+import asyncio
+from datetime import datetime
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.conformance import load_config
+from database.db_manager import DatabaseManager
+
+EVENTS = 50
+SIGNUPS_PER_EVENT = 40
+
+async def workload(db, guild_id):
+    """Returns seconds per phase"""
+    timings = {}
+    started = time.perf_counter()
+    event_ids = [
+        await db.create_event(guild_id, 1, f"Event {index}", 'bench', datetime(2030, 1, 1, 20, 0))
+        for index in range(EVENTS)
+    ]
+    timings['create'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        db.signup_participant(event_id, user_id, 'participant')
+        for event_id in event_ids for user_id in range(SIGNUPS_PER_EVENT)
+    ))
+    timings['signup'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    db.cache.clear()
+    await asyncio.gather(*(db.get_roster(event_id) for event_id in event_ids))
+    timings['roster'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await asyncio.gather(*(db.cancel_participant(event_id, 0) for event_id in event_ids))
+    await asyncio.gather(*(db.update_event(event_id, status='closed') for event_id in event_ids))
+    timings['cancel+close'] = time.perf_counter() - started
+
+    for event_id in event_ids:
+        await db.delete_event(event_id)
+    return timings
+
+async def measure(config):
+    db = DatabaseManager(config)
+    try:
+        await db.connect()
+        return await workload(db, 700000000000000000)
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare storage backends on one workload')
+    parser.add_argument('--mysql-database', help='scratch MySQL database to include in the comparison')
+    options = parser.parse_args()
+    runs = []
+    with tempfile.TemporaryDirectory(prefix='eventbot-bench-') as directory:
+        config = load_config('sqlite')
+        config['sqlite_path'] = os.path.join(directory, 'bench.sqlite3')
+        runs.append(('sqlite', asyncio.run(measure(config))))
+    if options.mysql_database:
+        runs.append(('mysql', asyncio.run(measure(load_config('mysql', options.mysql_database)))))
+    phases = list(runs[0][1])
+    signups = EVENTS * SIGNUPS_PER_EVENT
+    print(f"{EVENTS} events, {signups} signups")
+    print(f"{'backend':<8}" + ''.join(f"{phase:>14}" for phase in phases) + f"{'signups/s':>12}")
+    for name, timings in runs:
+        print(
+            f"{name:<8}" + ''.join(f"{timings[phase] * 1000:>12.1f}ms" for phase in phases)
+            + f"{signups / timings['signup']:>12.0f}"
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""Just enough of the Discord object model to drive the bot without a gateway.
+
+Every REST call the bot would make (defer, followup, edit, send, DM) sleeps
+for `api_latency` and is counted on the FakeGateway, so scenarios can report
+how many API calls and message edits a burst of clicks turned into.
+"""
+import asyncio
+from collections import Counter
+from itertools import count
+import time
+import discord
+
+class FakeGateway:
+    """Owns the fake guilds, channels and users and counts simulated API calls"""
+
+    def __init__(self, api_latency=0.05):
+        self.api_latency = api_latency
+        self.calls = Counter()
+        self.channels = {}
+        self.users = {}
+        self._ids = count(900000000000000000)
+
+    def next_id(self):
+        return next(self._ids)
+
+    async def api_call(self, kind):
+        self.calls[kind] += 1
+        if self.api_latency:
+            await asyncio.sleep(self.api_latency)
+
+    def guild(self):
+        return FakeGuild(self.next_id())
+
+    def channel(self, guild):
+        channel = FakeChannel(self, self.next_id(), guild)
+        self.channels[channel.id] = channel
+        return channel
+
+    def user(self, user_id=None):
+        user = FakeUser(self, user_id or self.next_id())
+        self.users[user.id] = user
+        return user
+
+    def click(self, user, message, custom_id):
+        return FakeInteraction(self, user, message, custom_id)
+
+    def install(self, bot):
+        """Point the bot's channel and user lookups at this gateway"""
+        bot.get_channel = self.channels.get
+        bot.get_user = self.users.get
+
+        async def fetch_user(user_id):
+            await self.api_call('fetch_user')
+            return self.users.get(user_id) or self.user(user_id)
+        bot.fetch_user = fetch_user
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+
+class FakeUser:
+    def __init__(self, gateway, user_id):
+        self._gateway = gateway
+        self.id = user_id
+        self.mention = f"<@{user_id}>"
+        self.dms = []
+
+    async def send(self, content=None, **kwargs):
+        await self._gateway.api_call('dm')
+        self.dms.append(content)
+
+class FakeChannel:
+    def __init__(self, gateway, channel_id, guild):
+        self._gateway = gateway
+        self.id = channel_id
+        self.guild = guild
+        self.messages = {}
+
+    async def send(self, content=None, view=None, **kwargs):
+        await self._gateway.api_call('send')
+        message = FakeMessage(self._gateway, self._gateway.next_id(), self, content)
+        self.messages[message.id] = message
+        return message
+
+    def get_partial_message(self, message_id):
+        return self.messages[message_id]
+
+class FakeMessage:
+    def __init__(self, gateway, message_id, channel, content):
+        self._gateway = gateway
+        self.id = message_id
+        self.channel = channel
+        self.content = content
+        self.edits = 0
+
+    async def edit(self, content=None, **kwargs):
+        await self._gateway.api_call('edit')
+        self.edits += 1
+        if content is not None:
+            self.content = content
+        return self
+
+    async def create_thread(self, name, **kwargs):
+        await self._gateway.api_call('create_thread')
+        return self._gateway.channel(self.channel.guild)
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def defer(self, ephemeral=False, thinking=False):
+        await self._interaction._gateway.api_call('defer')
+        self._done = True
+        self._interaction.acked = time.perf_counter()
+
+    async def send_message(self, content=None, ephemeral=False, **kwargs):
+        await self._interaction._gateway.api_call('respond')
+        self._done = True
+        self._interaction.acked = time.perf_counter()
+        self._interaction.replies.append(content)
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def send(self, content=None, ephemeral=False, **kwargs):
+        await self._interaction._gateway.api_call('followup')
+        self._interaction.replies.append(content)
+
+class FakeInteraction:
+    """A component click, timestamped the moment it is created"""
+
+    def __init__(self, gateway, user, message, custom_id):
+        self._gateway = gateway
+        self.type = discord.InteractionType.component
+        self.data = {'custom_id': custom_id}
+        self.user = user
+        self.guild = message.channel.guild
+        self.guild_id = self.guild.id
+        self.channel = message.channel
+        self.message = message
+        self.created_at = discord.utils.utcnow()
+        self.clicked = time.perf_counter()
+        self.acked = None
+        self.replies = []
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+
+    async def edit_original_response(self, content=None, **kwargs):
+        await self._gateway.api_call('edit_original_response')
+        self.replies.append(content)
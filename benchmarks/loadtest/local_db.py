@@ -0,0 +1,93 @@
+"""A DatabaseManager on a throwaway SQLite file, with every statement counted.
+
+This is the real SQLite storage backend; the only additions are a
+simulated round-trip latency per statement, standing in for the network
+hop to a MySQL server, and statement counts by kind.
+"""
+from collections import Counter
+import os
+import tempfile
+import threading
+import time
+from database.backends.sqlite import SQLiteBackend, SQLiteConnection, SQLiteCursor
+from database.db_manager import DatabaseManager
+
+class QueryStats:
+    """Thread-safe statement counts by kind"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = Counter()
+
+    def record(self, query, statements=1):
+        kind = query.lstrip().split(None, 1)[0].upper()
+        with self._lock:
+            self.counts[kind] += statements
+            self.counts['total'] += statements
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def reset(self):
+        with self._lock:
+            self.counts.clear()
+
+class CountingCursor(SQLiteCursor):
+    def __init__(self, connection, dictionary=False):
+        super().__init__(connection, dictionary)
+        self._connection = connection
+
+    def execute(self, query, params=()):
+        self._connection.round_trip(query)
+        super().execute(query, params)
+
+    def executemany(self, query, rows):
+        rows = list(rows)
+        # mysql-connector sends a multi-row INSERT as one statement
+        self._connection.round_trip(query, 1 if query.lstrip().upper().startswith('INSERT') else len(rows))
+        super().executemany(query, rows)
+
+class CountingConnection(SQLiteConnection):
+    cursor_class = CountingCursor
+
+    def round_trip(self, query, statements=1):
+        self._backend.stats.record(query, statements)
+        if self._backend.latency:
+            time.sleep(self._backend.latency)
+
+    def start_transaction(self):
+        self.round_trip('BEGIN')
+        super().start_transaction()
+
+    def commit(self):
+        if self.raw.in_transaction:
+            self.round_trip('COMMIT')
+        super().commit()
+
+    def rollback(self):
+        if self.raw.in_transaction:
+            self.round_trip('ROLLBACK')
+        super().rollback()
+
+class CountingSQLiteBackend(SQLiteBackend):
+    connection_class = CountingConnection
+
+    def __init__(self, config, latency, stats):
+        super().__init__(config)
+        self.latency = latency
+        self.stats = stats
+
+class LocalDatabaseManager(DatabaseManager):
+    """DatabaseManager on a temporary SQLite file with a simulated round-trip latency"""
+
+    def __init__(self, latency=0.001):
+        self._directory = tempfile.TemporaryDirectory(prefix='eventbot-loadtest-')
+        config = dict(self._load_config())
+        config.update(backend='sqlite', sqlite_path=os.path.join(self._directory.name, 'eventbot.sqlite3'))
+        self.stats = QueryStats()
+        super().__init__(config, CountingSQLiteBackend(config, latency, self.stats))
+
+    def close(self):
+        super().close()
+        self._directory.cleanup()
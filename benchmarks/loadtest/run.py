@@ -0,0 +1,267 @@
+"""Load test: bursts of component clicks against a real EventBot.
+
+Drives EventBot.on_interaction and the CreateEventCommand / CloseEventCommand
+cogs through the fake Discord layer in fakes.py, against the SQLite-backed
+DatabaseManager in local_db.py. Each scenario gets a fresh bot and database.
+Results are written as JSON so runs can be compared; warnings the bot
+logs go to stderr.
+
+Run from the repository root:
+
+    python benchmarks/loadtest/run.py
+    python benchmarks/loadtest/run.py --scenario signup_storm --users 200 --template raid -o storm.json
+"""
+import argparse
+import asyncio
+from collections import Counter
+from datetime import datetime
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from events.notifications import interaction_progress
+from events.router import encode_custom_id
+from events.views import EventSignupView
+from fakes import FakeGateway
+from local_db import LocalDatabaseManager
+from main import EventBot
+
+SCENARIOS = ['signup_storm', 'cancel_churn', 'mass_close', 'many_guilds']
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def latency_summary(samples):
+    return {
+        'p50_ms': round(percentile(samples, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(samples, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 2),
+        'max_ms': round(max(samples, default=0.0) * 1000, 2)
+    }
+
+def classify(reply):
+    if reply is None:
+        return 'no_reply'
+    if reply.startswith('You have successfully'):
+        return 'ok'
+    if reply.startswith('An error occurred'):
+        return 'error'
+    if reply.startswith('The server is busy'):
+        return 'timeout'
+    if 'on the waitlist' in reply:
+        return 'waitlisted'
+    if reply.startswith('You have left the waitlist'):
+        return 'left_waitlist'
+    return 'rejected'
+
+class Harness:
+    """A bot wired to a FakeGateway and a LocalDatabaseManager"""
+
+    def __init__(self, options):
+        self.options = options
+        self.gateway = FakeGateway(api_latency=options.api_latency)
+        self.bot = None
+
+    async def start(self):
+        bot = EventBot()
+        bot.db.close()
+        bot.db = LocalDatabaseManager(latency=self.options.db_latency)
+        bot.message_updater.delay = self.options.edit_delay
+        bot.metrics_server = None
+        self.gateway.install(bot)
+        await bot.setup_hook()
+        self.bot = bot
+
+    async def stop(self):
+        self.bot.message_updater.stop()
+        self.bot.notifier.stop()
+        self.bot.templates.stop()
+        self.bot.loop_lag.stop()
+        self.bot.db.close()
+
+    async def post_event(self, template_name=None):
+        """Create an event in a new guild and post it the way /create_event does"""
+        guild = self.gateway.guild()
+        channel = self.gateway.channel(guild)
+        await self.bot.guild_settings.update(guild.id, channel.id)
+        template = self.bot.templates[template_name] if template_name else None
+        event_id = await self.bot.db.create_event(
+            guild_id=guild.id,
+            creator_id=self.gateway.user().id,
+            name='Load test',
+            description='Synthetic event',
+            start_date=datetime(2030, 1, 1, 20, 0),
+            template_name=template_name,
+            template_version=template.version if template else None
+        )
+        create_event_command = self.bot.get_cog('CreateEventCommand')
+        view = EventSignupView(create_event_command, await self.bot.db.get_event(event_id), self.bot.templates)
+        message = await channel.send(content=await self.bot.render_event_message(event_id), view=view)
+        thread = await message.create_thread(name='Load test')
+        await self.bot.db.store_event_message(event_id, guild.id, channel.id, message.id, thread.id)
+        roles = template.role_order if template else ['participant']
+        return event_id, message, roles
+
+    async def click(self, interaction):
+        await self.bot.on_interaction(interaction)
+        return interaction, time.perf_counter()
+
+    async def burst(self, interactions):
+        """Deliver every interaction at once and return (interaction, finished_at) pairs"""
+        return await asyncio.gather(*(self.click(interaction) for interaction in interactions))
+
+    async def drain(self):
+        """Wait until every queued message edit has been flushed"""
+        while self.bot.message_updater._tasks:
+            await asyncio.sleep(0.01)
+
+    def reset_counters(self):
+        self.bot.db.stats.reset()
+        self.gateway.calls.clear()
+
+    def report(self, name, started, results, extra=None):
+        elapsed = time.perf_counter() - started
+        interactions = [interaction for interaction, _ in results]
+        report = {
+            'scenario': name,
+            'interactions': len(interactions),
+            'duration_s': round(elapsed, 4),
+            'throughput_per_s': round(len(interactions) / elapsed, 2) if elapsed else 0.0,
+            'ack_latency': latency_summary([i.acked - i.clicked for i in interactions if i.acked]),
+            'total_latency': latency_summary([finished - i.clicked for i, finished in results]),
+            'replies': dict(Counter(classify(i.replies[-1] if i.replies else None) for i in interactions)),
+            'queries': self.bot.db.stats.snapshot(),
+            'api_calls': dict(self.gateway.calls),
+            'message_edits': self.gateway.calls['edit'],
+            'updater': self.bot.message_updater.stats(),
+            'cache': self.bot.db.cache.stats()
+        }
+        report.update(extra or {})
+        return report
+
+async def signup_storm(harness, options):
+    """Every user clicks a signup button on the same event within the same instant"""
+    event_id, message, roles = await harness.post_event(options.template)
+    users = [harness.gateway.user() for _ in range(options.users)]
+    harness.reset_counters()
+    started = time.perf_counter()
+    clicks = [
+        harness.gateway.click(user, message, encode_custom_id('signup', event_id, roles[index % len(roles)]))
+        for index, user in enumerate(users)
+    ]
+    results = await harness.burst(clicks)
+    await harness.drain()
+    return harness.report('signup_storm', started, results)
+
+async def cancel_churn(harness, options):
+    """Signed-up users cancel and sign up again, all at once, for several rounds"""
+    event_id, message, roles = await harness.post_event(options.template)
+    users = [harness.gateway.user() for _ in range(options.users)]
+    await harness.burst([
+        harness.gateway.click(user, message, encode_custom_id('signup', event_id, roles[index % len(roles)]))
+        for index, user in enumerate(users)
+    ])
+    await harness.drain()
+    harness.reset_counters()
+    started = time.perf_counter()
+    results = []
+
+    async def churn(index, user):
+        # Each user cancels first and signs up again once that has been answered
+        role_name = roles[index % len(roles)]
+        cancelled = await harness.click(harness.gateway.click(user, message, encode_custom_id('cancel', event_id)))
+        signed_up = await harness.click(harness.gateway.click(user, message, encode_custom_id('signup', event_id, role_name)))
+        results.extend([cancelled, signed_up])
+
+    for _ in range(options.rounds):
+        await asyncio.gather(*(churn(index, user) for index, user in enumerate(users)))
+    await harness.drain()
+    return harness.report('cancel_churn', started, results, {'rounds': options.rounds})
+
+async def mass_close(harness, options):
+    """Close an event with a full roster and notify every participant by DM"""
+    event_id, message, _ = await harness.post_event()
+    create_event_command = harness.bot.get_cog('CreateEventCommand')
+    for _ in range(options.users):
+        await create_event_command.add_participant(event_id, harness.gateway.user().id, 'participant')
+    harness.reset_counters()
+    admin = harness.gateway.user()
+    interaction = harness.gateway.click(admin, message, encode_custom_id('edit', event_id))
+    started = time.perf_counter()
+    task = await harness.bot.get_cog('CloseEventCommand').close_event(
+        event_id, notify=True, on_progress=interaction_progress(interaction, f"Event {event_id} has been closed.")
+    )
+    result = await task
+    await harness.drain()
+    elapsed = time.perf_counter() - started
+    return harness.report('mass_close', started, [], {
+        'notified': {
+            'total': result.total,
+            'sent': result.sent,
+            'forbidden': result.forbidden,
+            'failed': result.failed,
+            'dms_per_s': round(result.sent / elapsed, 2) if elapsed else 0.0
+        },
+        'progress_updates': len(interaction.replies)
+    })
+
+async def many_guilds(harness, options):
+    """Signup storms in many guilds at the same time, one event each"""
+    posted = [await harness.post_event(options.template) for _ in range(options.guilds)]
+    clicks = []
+    for event_id, message, roles in posted:
+        for index in range(options.users):
+            user = harness.gateway.user()
+            clicks.append(harness.gateway.click(user, message, encode_custom_id('signup', event_id, roles[index % len(roles)])))
+    harness.reset_counters()
+    started = time.perf_counter()
+    results = await harness.burst(clicks)
+    await harness.drain()
+    return harness.report('many_guilds', started, results, {'guilds': options.guilds})
+
+async def run_scenario(name, options):
+    harness = Harness(options)
+    await harness.start()
+    try:
+        return await globals()[name](harness, options)
+    finally:
+        await harness.stop()
+
+async def run(options):
+    return [await run_scenario(name, options) for name in options.scenario or SCENARIOS]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='scenario to run (repeatable; default: all)')
+    parser.add_argument('--users', type=int, default=200, help='users per event')
+    parser.add_argument('--guilds', type=int, default=20, help='guilds in many_guilds')
+    parser.add_argument('--rounds', type=int, default=3, help='cancel/signup rounds in cancel_churn')
+    parser.add_argument('--template', help='template for signup events (default: none, one unlimited role)')
+    parser.add_argument('--db-latency', type=float, default=0.001, help='simulated seconds per SQL statement')
+    parser.add_argument('--api-latency', type=float, default=0.05, help='simulated seconds per Discord API call')
+    parser.add_argument('--edit-delay', type=float, default=0.05, help='message edit coalescing window')
+    parser.add_argument('-o', '--output', help='write the JSON report here instead of stdout')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    options = parse_args(argv)
+    scenarios = asyncio.run(run(options))
+    report = {
+        'options': {key: value for key, value in vars(options).items() if key != 'output'},
+        'scenarios': scenarios
+    }
+    output = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,53 @@
 from discord import app_commands
 from discord.ext import commands
 from utils.permissions import is_admin,has_event_permission
-import asyncio
+from events.conversations import Conversation
+from events.renderer import MESSAGE_LIMIT
+from commands.list_events import event_id_autocomplete
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+EVENT_ID_PATTERN = re.compile(r"Event ID: (\d+)")
+
+class SetupConversation(Conversation):
+    """Asks an admin for the channel the bot should listen to"""
+
+    first_step = 'channel'
+    prompts = {
+        'channel': "Please specify the channel where the bot should listen for commands)"
+    }
+
+    def __init__(self, bot, interaction):
+        super().__init__(interaction.user)
+        self.bot = bot
+        self.interaction = interaction
+        self.channel_id = None
+
+    async def begin(self):
+        await self.interaction.response.send_message(self.prompts[self.step], ephemeral=True)
+        return self.interaction.channel.id
+
+    async def send(self, content):
+        await self.interaction.followup.send(content, ephemeral=True)
+
+    def on_channel(self, content):
+        try:
+            self.channel_id = int(content.strip('<>#'))
+        except ValueError:
+            raise ValueError("Please mention a channel or paste its ID.")
+        return None
+
+    async def finish(self):
+        guild_id = self.interaction.guild.id
+        # Save channel settings to the database
+        await self.bot.guild_settings.update(guild_id, listening_channel=self.channel_id)
+        logger.info("Guild %s now listens to channel %s", guild_id, self.channel_id)
+        await self.send(f"Bot will now listen to <#{self.channel_id}>")
+
+    async def expire(self):
+        await self.send("Setup timed out. Please try again.")
 
 class AdminCommands(commands.Cog):
     def __init__(self, bot):
@@ -27,23 +73,84 @@ class AdminCommands(commands.Cog):
     @app_commands.check(is_admin)
     async def setup(self, interaction: discord.Interaction):
         """Initial bot setup"""
-        print(f"Received setup command from {interaction.user}")
-        await interaction.response.send_message("Please specify the channel where the bot should listen for commands)", ephemeral=True)
+        logger.debug("Received setup command from %s", interaction.user)
+        await self.bot.conversations.begin(SetupConversation(self.bot, interaction))
 
-        def check(m):
-            return m.author == interaction.user and m.channel == interaction.channel
+    @app_commands.command(name='set_language', description='Choose the language the bot uses in this server')
+    @app_commands.check(is_admin)
+    async def set_language(self, interaction: discord.Interaction, language: str):
+        """Set the server language"""
+        if language not in self.bot.localization.catalogs:
+            available = ', '.join(sorted(self.bot.localization.catalogs))
+            await interaction.response.send_message(f"Unknown language. Available: {available}", ephemeral=True)
+            return
+        await self.bot.guild_settings.update_language(interaction.guild.id, language)
+        await interaction.response.send_message(f"Language set to {language}.", ephemeral=True)
 
+    @app_commands.command(name='backfill_event_messages', description='Index event messages posted before the message index existed')
+    @app_commands.check(is_admin)
+    async def backfill_event_messages(self, interaction: discord.Interaction):
+        """Scan the listening channel once and record every legacy event message"""
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        channel = await self.bot.guild_settings.get_listening_channel(interaction.guild.id)
+        if not channel:
+            await interaction.followup.send("Listening channel not set for this guild.", ephemeral=True)
+            return
+        missing = await self.bot.db.get_unindexed_event_ids(interaction.guild.id)
+        if not missing:
+            await interaction.followup.send("Every event message is already indexed.", ephemeral=True)
+            return
+        rows = []
+        scanned = 0
         try:
-            print("Waiting for channel message...")
-            msg = await self.bot.wait_for('message', timeout=60.0, check=check)
-            channel_id = int(msg.content.strip('<>#'))
-            # Save channel settings to the database
-            self.bot.db.update_guild_settings(interaction.guild.id, listening_channel=channel_id)
-            print(f"Channel ID received: {channel_id}")
-            await interaction.followup.send(f"Bot will now listen to <#{channel_id}>", ephemeral=True)
-        except asyncio.TimeoutError:
-            print("Setup timed out.")
-            await interaction.followup.send("Setup timed out. Please try again.", ephemeral=True)
+            async for message in channel.history(limit=None):
+                scanned += 1
+                if message.author.id != self.bot.user.id:
+                    continue
+                match = EVENT_ID_PATTERN.search(message.content)
+                if not match or int(match.group(1)) not in missing:
+                    continue
+                event_id = int(match.group(1))
+                missing.discard(event_id)
+                thread = message.guild.get_thread(message.id)
+                rows.append((event_id, interaction.guild.id, channel.id, message.id, thread.id if thread else None))
+                if not missing:
+                    break
+        except discord.Forbidden:
+            await interaction.followup.send("Bot doesn't have permission to read message history", ephemeral=True)
+            return
+        if rows:
+            await self.bot.db.store_event_messages(rows)
+        await interaction.followup.send(
+            f"Indexed {len(rows)} event messages after scanning {scanned} messages; {len(missing)} events have no message.",
+            ephemeral=True
+        )
+
+    @app_commands.command(name='event_history', description='Show past events of this server, including archived ones')
+    @app_commands.autocomplete(event_id=event_id_autocomplete)
+    @app_commands.check(is_admin)
+    async def event_history(self, interaction: discord.Interaction, event_id: int = None):
+        """List recent events, or show one event's final roster"""
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        if event_id is None:
+            events = await self.bot.db.get_guild_history(interaction.guild.id)
+            if not events:
+                await interaction.followup.send("No events found.", ephemeral=True)
+                return
+            lines = [
+                f"#{event['id']} {event['name']} - {event['start_date'].strftime('%Y-%m-%d %H:%M')} "
+                f"({event['status']}{', archived' if event['archived'] else ''})"
+                for event in events
+            ]
+            await interaction.followup.send('\n'.join(lines), ephemeral=True)
+            return
+        event, participants = await self.bot.db.get_event_history(event_id)
+        if not event or event['guild_id'] != interaction.guild.id:
+            await interaction.followup.send("Event not found.", ephemeral=True)
+            return
+        prefix = "(archived)\n" if event['archived'] else ''
+        content = self.bot.renderer.render_text(event, participants, limit=MESSAGE_LIMIT - len(prefix))
+        await interaction.followup.send(prefix + content, ephemeral=True)
 
 async def setup(bot):
     await bot.add_cog(AdminCommands(bot))
@@ -1,6 +1,8 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
+from events.notifications import interaction_progress
+from commands.list_events import event_id_autocomplete
 
 class CloseEventCommand(commands.Cog):
     def __init__(self, bot):
@@ -8,33 +10,38 @@ class CloseEventCommand(commands.Cog):
         self.db = bot.db
 
     @app_commands.command(name='close_event', description='Close an event')
+    @app_commands.autocomplete(event_id=event_id_autocomplete)
     @app_commands.default_permissions(administrator=True)
     async def close_event_command(self, interaction: discord.Interaction, event_id: int):
-        event = self.db.get_event(event_id)
+        guild_id = interaction.guild.id
+        event = await self.db.get_event(event_id)
         if not event:
-            await interaction.response.send_message("Event not found.")
+            await interaction.response.send_message(self.bot.text(guild_id, 'errors-not_found'))
             return
         if interaction.user.id != event['creator_id'] and interaction.user.id != self.bot.owner_id:
-            await interaction.response.send_message("You do not have permission to close this event.")
+            await interaction.response.send_message(self.bot.text(guild_id, 'errors-no_permission'))
             return
-        await self.close_event(event_id, notify=True)
-        await interaction.response.send_message(f"Event {event_id} has been closed.")
+        await interaction.response.send_message(self.bot.text(guild_id, 'event-close-success', event_id=event_id))
+        await self.close_event(event_id, notify=True, on_progress=interaction_progress(
+            interaction, self.bot.text(guild_id, 'event-close-notifying', event_id=event_id)
+        ))
 
-    async def close_event(self, event_id: int, notify: bool = False):
-        """Close an event"""
-        event = self.db.get_event(event_id)
+    async def close_event(self, event_id: int, notify: bool = False, on_progress=None):
+        """Close an event; notifications are sent in the background and the task is returned"""
+        event = await self.db.get_event(event_id)
         if not event:
             raise ValueError("Event not found")
-        self.db.update_event(event_id, status='closed')
+        await self.db.update_event(event_id, status='closed')
+        self.bot.scheduler.unschedule(event_id)
+        await self.bot.refresh_event_message(event_id)
         if notify:
-            participants = self.db.get_participants(event_id)
-            for participant in participants:
-                user = self.bot.get_user(participant['user_id'])
-                if user:
-                    try:
-                        await user.send(f"Event '{event['name']}' has been closed.")
-                    except discord.Forbidden:
-                        pass  # Cannot send DM to user
+            participants = await self.db.get_participants(event_id)
+            if participants:
+                return self.bot.notifier.notify(
+                    [p['user_id'] for p in participants],
+                    self.bot.text(event['guild_id'], 'event-close-notification', name=event['name']),
+                    on_progress=on_progress
+                )
 
 async def setup(bot):
     await bot.add_cog(CloseEventCommand(bot))
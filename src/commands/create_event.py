@@ -2,10 +2,84 @@ from datetime import datetime
 import discord
 from discord.ext import commands
 from discord import app_commands
-import json
-import os
-import asyncio
-from events.views import EventSignupView
+import logging
+from database.db_manager import DatabaseTimeoutError, NotSignedUpError
+from events.conversations import Conversation
+from events.views import CreateEventModal, EventSignupView
+
+logger = logging.getLogger(__name__)
+
+DATE_FORMAT = '%Y-%m-%d %H:%M'
+MAX_NAME_LENGTH = 100
+
+def parse_start_date(value):
+    try:
+        return datetime.strptime(value.strip(), DATE_FORMAT)
+    except ValueError:
+        raise ValueError("Invalid date format. Please use YYYY-MM-DD HH:MM")
+
+class CreateEventConversation(Conversation):
+    """The DM wizard behind /create_event"""
+
+    first_step = 'name'
+    # Translation keys of each step's prompt
+    prompt_keys = {
+        'name': 'event-create-start',
+        'description': 'event-create-description_prompt',
+        'start_date': 'event-create-start_date_prompt',
+        'use_template': 'event-create-use_template_prompt',
+        'template_name': 'event-create-template_name_prompt'
+    }
+
+    def __init__(self, cog, user, guild_id):
+        super().__init__(user)
+        self.cog = cog
+        self.guild_id = guild_id
+        self.template_name = None
+        self.prompts = {step: self.text(key) for step, key in self.prompt_keys.items()}
+
+    def text(self, key_path, **kwargs):
+        return self.cog.bot.text(self.guild_id, key_path, **kwargs)
+
+    async def begin(self):
+        message = await self.user.send(self.prompts[self.first_step])
+        return message.channel.id
+
+    async def send(self, content):
+        await self.user.send(content)
+
+    def on_name(self, content):
+        if not content or len(content) > MAX_NAME_LENGTH:
+            raise ValueError(f"Event names must be 1-{MAX_NAME_LENGTH} characters.")
+        self.name = content
+        return 'description'
+
+    def on_description(self, content):
+        self.description = content
+        return 'start_date'
+
+    def on_start_date(self, content):
+        self.start_date = parse_start_date(content)
+        return 'use_template'
+
+    def on_use_template(self, content):
+        return 'template_name' if content.lower() == 'yes' else None
+
+    def on_template_name(self, content):
+        if content not in self.cog.bot.templates:
+            raise ValueError(f"Template '{content}' not found")
+        self.template_name = content
+        return None
+
+    async def finish(self):
+        event_id = await self.cog.store_event(
+            self.guild_id, self.user.id, self.name, self.description, self.start_date, self.template_name
+        )
+        await self.send(self.text('event-create-success', event_id=event_id))
+        await self.cog.post_event(event_id, self.guild_id)
+
+    async def expire(self):
+        await self.send(self.text('event-create-timeout'))
 
 class CreateEventCommand(commands.Cog):
     def __init__(self, bot):
@@ -16,202 +90,183 @@ class CreateEventCommand(commands.Cog):
     @app_commands.default_permissions(administrator=True)
     async def create_event(self, interaction: discord.Interaction):
         """Start the event creation process via DM"""
-        user = interaction.user
         try:
-            await user.send("Let's create a new event! What would you like to name it?")
+            await self.bot.conversations.begin(CreateEventConversation(self, interaction.user, interaction.guild.id))
         except discord.Forbidden:
-            await interaction.response.send_message("I can't send you a DM. Please check your privacy settings.")
+            await interaction.response.send_message(self.bot.text(interaction.guild.id, 'event-create-dm_forbidden'))
+            return
+        await interaction.response.send_message(self.bot.text(interaction.guild.id, 'event-create-check_dms'), ephemeral=True)
+
+    @app_commands.command(name='create_event_form', description="Create a new event by filling in a single form")
+    @app_commands.default_permissions(administrator=True)
+    async def create_event_form(self, interaction: discord.Interaction):
+        """Create an event in one round trip through a modal"""
+        await interaction.response.send_modal(CreateEventModal(self))
+
+    async def create_from_form(self, interaction: discord.Interaction, name, description, start_date, template_name):
+        """Validate and create an event submitted through CreateEventModal"""
+        try:
+            start_date = parse_start_date(start_date)
+            if template_name and template_name not in self.bot.templates:
+                raise ValueError(f"Template '{template_name}' not found")
+        except ValueError as e:
+            await interaction.response.send_message(str(e), ephemeral=True)
             return
+        await self.bot.acknowledge(interaction, 'create_event_form')
+        try:
+            event_id = await self.store_event(
+                interaction.guild.id, interaction.user.id, name, description, start_date, template_name
+            )
+            await self.post_event(event_id, interaction.guild.id)
+            await interaction.followup.send(
+                self.bot.text(interaction.guild.id, 'event-create-success', event_id=event_id), ephemeral=True
+            )
+        except Exception as e:
+            logger.exception("Error in create_from_form: %s", e)
+            await interaction.followup.send(
+                self.bot.text(interaction.guild.id, 'event-create-error', error=e), ephemeral=True
+            )
+
+    async def store_event(self, guild_id, creator_id, name, description, start_date, template_name=None):
+        """Insert the event row and schedule it; returns the new event id"""
+        event_id = await self.db.create_event(
+            guild_id=guild_id,
+            creator_id=creator_id,
+            name=name,
+            description=description,
+            start_date=start_date,
+            template_name=template_name,
+            template_version=self.bot.templates[template_name].version if template_name else None
+        )
+        self.bot.scheduler.schedule_event(await self.db.get_event(event_id))
+        return event_id
 
-        def check(m):
-            return m.author == user and isinstance(m.channel, discord.DMChannel)
+    async def post_event(self, event_id, guild_id):
+        """Post the event to the guild's listening channel with signup buttons and a thread"""
+        channel = await self.bot.guild_settings.get_listening_channel(guild_id)
+        if not channel:
+            return None
+        event = await self.db.get_event(event_id)
+        event_message = await self.bot.render_event_message(event_id)
+        view = EventSignupView(self, event, self.bot.templates)
+        message = await channel.send(content=event_message, view=view)
+        # Record the message before anything else can fail, so it is never posted twice
+        await self.db.store_event_message(event_id, guild_id, channel.id, message.id)
 
+        # Create a thread for the event
         try:
-            name_msg = await self.bot.wait_for('message', check=check, timeout=60.0)
-            name = name_msg.content
-            await user.send("Please provide a description for the event.")
-            description_msg = await self.bot.wait_for('message', check=check, timeout=60.0)
-            description = description_msg.content
-            await user.send("When will the event start? (Format: YYYY-MM-DD HH:MM)")
-            start_date_msg = await self.bot.wait_for('message', check=check, timeout=60.0)
-            start_date = start_date_msg.content
-            await user.send("Do you want to use a template for this event? (yes/no)")
-            template_choice_msg = await self.bot.wait_for('message', check=check, timeout=60.0)
-            template_choice = template_choice_msg.content.lower()
-            template_name = None
-            if template_choice == 'yes':
-                await user.send("Please provide the template name.")
-                template_name_msg = await self.bot.wait_for('message', check=check, timeout=60.0)
-                template_name = template_name_msg.content
+            thread = await message.create_thread(name=event['name'])
+        except discord.HTTPException as e:
+            logger.warning("Could not create a thread for event %s: %s", event_id, e)
+            return message
+        await self.db.store_event_message(event_id, guild_id, channel.id, message.id, thread.id)
+        return message
 
-            try:
-                start_date = datetime.strptime(start_date, '%Y-%m-%d %H:%M')
-            except ValueError:
-                await user.send("Invalid date format. Please use YYYY-MM-DD HH:MM")
-                return
+    async def cog_load(self):
+        self.bot.router.register('signup', self.handle_signup)
+        self.bot.router.register('cancel', self.handle_cancel)
 
-            if template_name and template_name not in self.bot.templates:
-                await user.send(f"Template '{template_name}' not found")
-                return
+    async def cog_unload(self):
+        self.bot.router.unregister('signup')
+        self.bot.router.unregister('cancel')
 
-            event_id = self.db.create_event(
-                guild_id=interaction.guild.id,
-                creator_id=interaction.user.id,
-                name=name,
-                description=description,
-                start_date=start_date,
-                template_name=template_name
-            )
-            await user.send(f"Event created successfully! Event ID: {event_id}")
-
-            # Post the event to the channel with interactive buttons
-            settings = self.db.get_guild_settings(interaction.guild.id)
-            if settings and 'listening_channel' in settings:
-                channel = self.bot.get_channel(settings['listening_channel'])
-                if channel:
-                    event_message = await self.format_event_message(event_id)
-                    view = EventSignupView(self, event_id, self.bot.templates)
-                    message = await channel.send(content=event_message, view=view)
-
-                    # Create a thread for the event
-                    thread = await message.create_thread(name=name)
-
-        except asyncio.TimeoutError:
-            await user.send("Event creation timed out. Please try again.")
-
-    async def format_event_message(self, event_id: int) -> str:
-        """Format event information as a text message"""
-        event = self.db.get_event(event_id)
-        if not event:
-            raise ValueError("Event not found")
-        
-        message_parts = [
-            f"📅 **{event['name']}**\n",
-            f"{event['description']}\n",
-            f"🕒 Start: {event['start_date'].strftime('%Y-%m-%d %H:%M')}\n"
-        ]
-
-        participants = self.db.get_participants(event_id)
-        
-        if event['template_name'] and event['template_name'] in self.bot.templates:
-            template = self.bot.templates[event['template_name']]
-            message_parts.append("\n**Roles:**")
-            
-            for role_name, role_info in template['roles'].items():
-                role_participants = [p for p in participants if p['role_name'] == role_name]
-                participant_list = [f"<@{p['user_id']}>" for p in role_participants]
-                remaining = role_info['limit'] - len(role_participants)
-                
-                message_parts.append(
-                    f"\n{role_info['emoji']} {role_name} ({len(role_participants)}/{role_info['limit']})"
-                )
-                if participant_list:
-                    message_parts.append("→ " + ", ".join(participant_list))
-                else:
-                    message_parts.append("→ No participants")
-        else:
-            message_parts.append(f"\n**Participants ({len(participants)}):**")
-            if participants:
-                participant_list = [f"<@{p['user_id']}>" for p in participants]
-                message_parts.append("→ " + ", ".join(participant_list))
-            else:
-                message_parts.append("→ No participants yet")
-
-        message_parts.append(f"\n📝 Event ID: {event_id} | Status: {event['status']}")
-        
-        return "\n".join(message_parts)
-
-    async def handle_signup(self, interaction: discord.Interaction, event_id: int, role_name: str):
+    async def handle_signup(self, interaction: discord.Interaction, event_id: str, role_name: str):
+        """Sign the user up; the interaction must already be deferred"""
         try:
-            user_id = interaction.user.id
-            participants = self.db.get_participants(event_id)
-            if any(p['user_id'] == user_id for p in participants):
-                await interaction.response.send_message(
-                    "You are already signed up for this event. Cancel your current signup first.",
+            event_id = int(event_id)
+            _, _, position = await self.add_participant(event_id, interaction.user.id, role_name)
+            if position is not None:
+                await interaction.followup.send(
+                    f"{role_name} is full. You are #{position} on the waitlist and will be signed up "
+                    f"automatically when a spot opens.",
                     ephemeral=True
                 )
                 return
-
-            event = self.db.get_event(event_id)
-            if not event:
-                raise ValueError("Event not found")
-            if event['status'] != 'open':
-                raise ValueError("Event is not open for registration")
-                
-            template = self.bot.templates.get(event['template_name'])
-            if template:
-                if role_name not in template['roles']:
-                    raise ValueError(f"Invalid role: {role_name}")
-                current_participants = self.db.get_participants(event_id)
-                role_count = len([p for p in current_participants if p['role_name'] == role_name])
-                if role_count >= template['roles'][role_name]['limit']:
-                    raise ValueError(f"Role {role_name} is full")
-                    
-            await self.add_participant(event_id, user_id, role_name)
-            event_message = await self.format_event_message(event_id)
-            await interaction.message.edit(content=event_message)
-            await interaction.response.send_message(
+            self.bot.message_updater.request_update(event_id, interaction.message)
+            await interaction.followup.send(
                 f"You have successfully signed up as {role_name}.",
                 ephemeral=True
             )
         except ValueError as e:
-            await interaction.response.send_message(str(e), ephemeral=True)
+            await interaction.followup.send(str(e), ephemeral=True)
+        except DatabaseTimeoutError as e:
+            logger.warning("Signup for event %s timed out: %s", event_id, e)
+            await self._send_timeout(interaction, event_id, e, "your signup")
         except Exception as e:
-            print(f"Error in handle_signup: {e}")
-            await interaction.response.send_message(
+            logger.exception("Error in handle_signup: %s", e)
+            await interaction.followup.send(
                 "An error occurred while signing up.",
                 ephemeral=True
             )
 
-    async def handle_cancel(self, interaction: discord.Interaction):
+    async def handle_cancel(self, interaction: discord.Interaction, event_id: str):
+        """Cancel the user's signup; the interaction must already be deferred"""
         try:
-            event_id = int(interaction.data['custom_id'].split('_')[1])
-            user_id = interaction.user.id
-            participants = self.db.get_participants(event_id)
-            if not any(p['user_id'] == user_id for p in participants):
-                await interaction.response.send_message(
-                    "You are not signed up for this event.",
-                    ephemeral=True
-                )
+            event_id = int(event_id)
+            try:
+                event, _, promoted = await self.remove_participant(event_id, interaction.user.id)
+            except NotSignedUpError:
+                await self.db.leave_waitlist(event_id, interaction.user.id)
+                await interaction.followup.send("You have left the waitlist.", ephemeral=True)
                 return
-                
-            await self.remove_participant(event_id, user_id)
-            event_message = await self.format_event_message(event_id)
-            await interaction.message.edit(content=event_message)
-            await interaction.response.send_message(
+            # One re-render covers the cancellation and every promotion it caused
+            self.bot.message_updater.request_update(event_id, interaction.message)
+            if promoted:
+                # Promotions of one cancellation are all for the cancelled role
+                self.bot.notifier.notify(
+                    [participant['user_id'] for participant in promoted],
+                    f"A spot opened up: you are now signed up as {promoted[0]['role_name']} for '{event['name']}'."
+                )
+            await interaction.followup.send(
                 "You have successfully canceled your sign up.",
                 ephemeral=True
             )
+        except ValueError as e:
+            await interaction.followup.send(str(e), ephemeral=True)
+        except DatabaseTimeoutError as e:
+            logger.warning("Cancellation for event %s timed out: %s", event_id, e)
+            await self._send_timeout(interaction, event_id, e, "your cancellation")
         except Exception as e:
-            print(f"Error in handle_cancel: {e}")
-            await interaction.response.send_message(
+            logger.exception("Error in handle_cancel: %s", e)
+            await interaction.followup.send(
                 "An error occurred while canceling your sign up.",
                 ephemeral=True
             )
 
+    async def _send_timeout(self, interaction, event_id, error, change):
+        if error.maybe_committed:
+            # The write may have landed: re-render so the event message shows whether it did
+            self.bot.message_updater.request_update(event_id, interaction.message)
+            await interaction.followup.send(
+                f"The server is busy and could not confirm {change}. Check the event message in a moment.",
+                ephemeral=True
+            )
+            return
+        await interaction.followup.send(
+            f"The server is busy and {change} was not saved. Please try again.",
+            ephemeral=True
+        )
+
     async def add_participant(self, event_id: int, user_id: int, role_name: str):
-        """Add a participant to an event"""
-        event = self.db.get_event(event_id)
-        if not event:
-            raise ValueError("Event not found")
-        if event['status'] != 'open':
-            raise ValueError("Event is not open for registration")
-        template = self.bot.templates.get(event['template_name'])
-        if template:
-            if role_name not in template['roles']:
+        """Sign a user up, or put them on the role's waitlist when it is full.
+
+        Returns (event, participants, position); position is None for a signup.
+        """
+        def role_limit(event):
+            template = self.bot.templates.for_event(event)
+            if not template:
+                return None
+            if role_name not in template.capacities:
                 raise ValueError(f"Invalid role: {role_name}")
-            current_participants = self.db.get_participants(event_id)
-            role_count = len([p for p in current_participants if p['role_name'] == role_name])
-            if role_count >= template['roles'][role_name]['limit']:
-                raise ValueError(f"Role {role_name} is full")
-        self.db.add_participant(event_id, user_id, role_name)
+            return template.capacities[role_name]
+        return await self.db.signup_or_waitlist(event_id, user_id, role_name, role_limit)
 
     async def remove_participant(self, event_id: int, user_id: int):
-        """Remove a participant from an event"""
-        event = self.db.get_event(event_id)
-        if not event:
-            raise ValueError("Event not found")
-        self.db.remove_participant(event_id, user_id)
+        """Remove a participant, promoting from the waitlist; returns (event, participants, promoted)"""
+        def capacities(event):
+            template = self.bot.templates.for_event(event)
+            return template.capacities if template else None
+        return await self.db.cancel_participant(event_id, user_id, capacities)
 
 async def setup(bot):
     await bot.add_cog(CreateEventCommand(bot))
\ No newline at end of file
@@ -1,6 +1,7 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
+from commands.list_events import event_id_autocomplete
 
 class DeleteEventCommand(commands.Cog):
     def __init__(self, bot):
@@ -8,24 +9,30 @@ class DeleteEventCommand(commands.Cog):
         self.db = bot.db
 
     @app_commands.command(name='delete_event', description='Delete an event')
+    @app_commands.autocomplete(event_id=event_id_autocomplete)
     @app_commands.default_permissions(administrator=True)
     async def delete_event_command(self, interaction: discord.Interaction, event_id: int):
-        event = self.db.get_event(event_id)
+        guild_id = interaction.guild.id
+        event = await self.db.get_event(event_id)
         if not event:
-            await interaction.response.send_message("Event not found.")
+            await interaction.response.send_message(self.bot.text(guild_id, 'errors-not_found'))
             return
         if interaction.user.id != event['creator_id'] and interaction.user.id != self.bot.owner_id:
-            await interaction.response.send_message("You do not have permission to delete this event.")
+            await interaction.response.send_message(self.bot.text(guild_id, 'errors-no_permission'))
             return
         await self.delete_event(event_id)
-        await interaction.response.send_message(f"Event {event_id} has been deleted.")
+        await interaction.response.send_message(self.bot.text(guild_id, 'event-delete-success', event_id=event_id))
 
     async def delete_event(self, event_id: int):
         """Delete an event"""
-        event = self.db.get_event(event_id)
+        event = await self.db.get_event(event_id)
         if not event:
             raise ValueError("Event not found")
-        self.db.delete_event(event_id)
+        await self.db.delete_event(event_id)
+        self.bot.scheduler.unschedule(event_id)
+        self.bot.renderer.forget(event_id)
+        if event.get('message_id'):
+            self.bot.message_updater.forget(event['message_id'])
 
 async def setup(bot):
     await bot.add_cog(DeleteEventCommand(bot))
@@ -2,7 +2,12 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 from datetime import datetime
+import logging
 from events.views import EventSignupView
+from events.notifications import interaction_progress
+from commands.list_events import event_id_autocomplete
+
+logger = logging.getLogger(__name__)
 
 class EditEventCommand(commands.Cog):
     def __init__(self, bot):
@@ -10,16 +15,18 @@ class EditEventCommand(commands.Cog):
         self.db = bot.db
 
     @app_commands.command(name='edit_event', description='Edit an existing event')
+    @app_commands.autocomplete(event_id=event_id_autocomplete)
     @app_commands.default_permissions(administrator=True)
-    async def edit_event_command(self, interaction: discord.Interaction, event_id: int, field: str, value: str):
+    async def edit_event_command(self, interaction: discord.Interaction, event_id: int, field: str, value: str, notify: bool = False):
+        guild_id = interaction.guild.id
         try:
-            event = self.db.get_event(event_id)
+            event = await self.db.get_event(event_id)
             if not event:
-                await interaction.response.send_message("Event not found.", ephemeral=True)
+                await interaction.response.send_message(self.bot.text(guild_id, 'errors-not_found'), ephemeral=True)
                 return
             
             if interaction.user.id != event['creator_id'] and interaction.user.id != self.bot.owner_id:
-                await interaction.response.send_message("You do not have permission to edit this event.", ephemeral=True)
+                await interaction.response.send_message(self.bot.text(guild_id, 'errors-no_permission'), ephemeral=True)
                 return
 
             if field == 'name':
@@ -31,109 +38,75 @@ class EditEventCommand(commands.Cog):
                     start_date = datetime.strptime(value, '%Y-%m-%d %H:%M')
                     await self.edit_event(event_id, start_date=start_date)
                 except ValueError:
-                    await interaction.response.send_message("Invalid date format. Please use YYYY-MM-DD HH:MM", ephemeral=True)
+                    await interaction.response.send_message(self.bot.text(guild_id, 'errors-invalid_date'), ephemeral=True)
                     return
             else:
-                await interaction.response.send_message("Invalid field. Please try again.", ephemeral=True)
-                return
-
-            settings = self.db.get_guild_settings(interaction.guild.id)
-            if not settings or 'listening_channel' not in settings:
-                await interaction.response.send_message("Listening channel not set for this guild.", ephemeral=True)
+                await interaction.response.send_message(self.bot.text(guild_id, 'event-edit-invalid_field'), ephemeral=True)
                 return
 
-            channel = self.bot.get_channel(settings['listening_channel'])
-            if not channel:
-                await interaction.response.send_message("Listening channel not found.", ephemeral=True)
-                return
+            new_content = await self.bot.render_event_message(event_id)
+            # Create new view and preserve the signup functionality
+            view = EventSignupView(self.bot.get_cog('CreateEventCommand'), event, self.bot.templates)
 
-            message = None
-            message_id = self.db.get_event_message_id(event_id)
-            
-            if message_id:
+            message = await self.bot.get_event_message(event_id)
+            if message:
                 try:
-                    message = await channel.fetch_message(message_id)
+                    await message.edit(content=new_content, view=view)
+                    self.bot.message_updater.record_content(message.id, new_content)
                 except discord.NotFound:
-                    message = await self.find_event_message(channel, event_id)
-            else:
-                message = await self.find_event_message(channel, event_id)
+                    message = None
 
-            new_content = await self.format_event_message(event_id)
-            
             if message:
-                self.db.store_event_message_id(event_id, message.id)
-                # Create new view and preserve the signup functionality
-                view = EventSignupView(self.bot.get_cog('CreateEventCommand'), event_id, self.bot.templates)
-                await message.edit(content=new_content, view=view)
-                await interaction.response.send_message("Event updated successfully!", ephemeral=True)
+                await interaction.response.send_message(self.bot.text(guild_id, 'event-edit-success'), ephemeral=True)
             else:
-                # Create new message with view
-                view = EventSignupView(self.bot.get_cog('CreateEventCommand'), event_id, self.bot.templates)
+                settings = await self.bot.guild_settings.get(interaction.guild.id)
+                if not settings or not settings.get('listening_channel'):
+                    await interaction.response.send_message(self.bot.text(guild_id, 'errors-no_listening_channel'), ephemeral=True)
+                    return
+
+                channel = await self.bot.guild_settings.get_listening_channel(interaction.guild.id)
+                if not channel:
+                    await interaction.response.send_message(self.bot.text(guild_id, 'errors-listening_channel_missing'), ephemeral=True)
+                    return
+
+                # The indexed message is gone (or was never recorded): post a new one
                 new_message = await channel.send(content=new_content, view=view)
-                self.db.store_event_message_id(event_id, new_message.id)
-                await interaction.response.send_message("Created a new event message.", ephemeral=True)
+                await self.db.store_event_message(event_id, interaction.guild.id, channel.id, new_message.id)
+                await interaction.response.send_message(self.bot.text(guild_id, 'event-edit-reposted'), ephemeral=True)
+
+            if notify:
+                await self.notify_participants(event_id, on_progress=interaction_progress(
+                    interaction, self.bot.text(guild_id, 'event-edit-notifying')
+                ))
 
         except Exception as e:
-            await interaction.response.send_message(f"An error occurred: {str(e)}", ephemeral=True)
+            logger.exception("Error in edit_event: %s", e)
+            content = self.bot.text(guild_id, 'event-edit-error', error=e)
+            # The edit may have been answered already, e.g. before notifying participants failed
+            if interaction.response.is_done():
+                await interaction.followup.send(content, ephemeral=True)
+            else:
+                await interaction.response.send_message(content, ephemeral=True)
 
     async def edit_event(self, event_id: int, **kwargs):
-        event = self.db.get_event(event_id)
-        if not event:
-            raise ValueError("Event not found")
-        self.db.update_event(event_id, **kwargs)
-
-    async def format_event_message(self, event_id: int) -> str:
-        """Format event information as a text message"""
-        event = self.db.get_event(event_id)
+        event = await self.db.get_event(event_id)
         if not event:
             raise ValueError("Event not found")
-        
-        message_parts = [
-            f"📅 **{event['name']}**\n",
-            f"{event['description']}\n",
-            f"🕒 Start: {event['start_date'].strftime('%Y-%m-%d %H:%M')}\n"
-        ]
+        await self.db.update_event(event_id, **kwargs)
+        if 'start_date' in kwargs:
+            # Reminders and the auto-close follow the new start time
+            await self.db.reset_scheduled_actions(event_id)
+            self.bot.scheduler.schedule_event(await self.db.get_event(event_id))
 
-        participants = self.db.get_participants(event_id)
-        
-        if event['template_name'] and event['template_name'] in self.bot.templates:
-            template = self.bot.templates[event['template_name']]
-            message_parts.append("\n**Roles:**")
-            
-            for role_name, role_info in template['roles'].items():
-                role_participants = [p for p in participants if p['role_name'] == role_name]
-                participant_list = [f"<@{p['user_id']}>" for p in role_participants]
-                remaining = role_info['limit'] - len(role_participants)
-                
-                message_parts.append(
-                    f"\n{role_info['emoji']} {role_name} ({len(role_participants)}/{role_info['limit']})"
-                )
-                if participant_list:
-                    message_parts.append("→ " + ", ".join(participant_list))
-                else:
-                    message_parts.append("→ No participants")
-        else:
-            message_parts.append(f"\n**Participants ({len(participants)}):**")
-            if participants:
-                participant_list = [f"<@{p['user_id']}>" for p in participants]
-                message_parts.append("→ " + ", ".join(participant_list))
-            else:
-                message_parts.append("→ No participants yet")
-
-        message_parts.append(f"\n📝 Event ID: {event_id} | Status: {event['status']}")
-        
-        return "\n".join(message_parts)
-
-    async def find_event_message(self, channel, event_id):
-        try:
-            async for message in channel.history(limit=100):
-                if f"Event ID: {event_id}" in message.content:
-                    return message
-            return None
-        except discord.Forbidden:
-            raise ValueError("Bot doesn't have permission to read message history")
-        except Exception as e:
-            raise ValueError(f"Error searching for event message: {str(e)}")
+    async def notify_participants(self, event_id: int, on_progress=None):
+        """DM every participant that the event changed; returns the background task"""
+        event, participants = await self.db.get_roster(event_id)
+        if participants:
+            return self.bot.notifier.notify(
+                [p['user_id'] for p in participants],
+                self.bot.text(event['guild_id'], 'event-edit-notification', name=event['name']),
+                on_progress=on_progress
+            )
 
 async def setup(bot):
     await bot.add_cog(EditEventCommand(bot))
\ No newline at end of file
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import tempfile
+import discord
+from discord.ext import commands
+from discord import app_commands
+import logging
+from database.transfer import FORMATS, TransferError, export_filenames, export_files, format_of, import_files
+from events.renderer import MESSAGE_LIMIT
+from utils.permissions import is_admin
+
+logger = logging.getLogger(__name__)
+
+class EventTransferCommands(commands.Cog):
+    """Export and import a guild's events and rosters as CSV or JSON Lines attachments"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.db = bot.db
+        # A transfer holds one database worker until it finishes; never let them take the whole pool
+        self._transfer = asyncio.Lock()
+
+    @app_commands.command(name='export_events', description="Download this server's events and signups")
+    @app_commands.check(is_admin)
+    @app_commands.choices(format=[app_commands.Choice(name=fmt.upper(), value=fmt) for fmt in FORMATS])
+    async def export_events(self, interaction: discord.Interaction, format: app_commands.Choice[str] = None):
+        """Attach events and participants files, streamed from the database"""
+        fmt = format.value if format else 'csv'
+        if self._transfer.locked():
+            await interaction.response.send_message("Another export or import is running, try again later.", ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        guild = interaction.guild
+        try:
+            async with self._transfer:
+                with tempfile.TemporaryDirectory(prefix='eventbot-export-') as directory:
+                    await self._export(interaction, directory, fmt)
+        except Exception as e:
+            logger.exception("Export of guild %s failed: %s", guild.id, e)
+            await interaction.followup.send(f"Export failed: {e}"[:MESSAGE_LIMIT], ephemeral=True)
+
+    async def _export(self, interaction, directory, fmt):
+        guild = interaction.guild
+        paths = [os.path.join(directory, name) for name in export_filenames(guild.id, fmt)]
+        events, participants = await export_files(self.db, guild.id, *paths, fmt)
+        size = sum(os.path.getsize(path) for path in paths)
+        logger.info("Exported %d events and %d participants of guild %s (%d bytes)", events, participants, guild.id, size)
+        if size > guild.filesize_limit:
+            await interaction.followup.send(
+                f"The export is {size / 1024 / 1024:.1f} MB, more than this server's upload limit. "
+                f"Run `python -m database.transfer export --guild {guild.id}` on the bot's host instead.",
+                ephemeral=True
+            )
+            return
+        await interaction.followup.send(
+            f"Exported {events} events and {participants} participants.",
+            files=[discord.File(path) for path in paths],
+            ephemeral=True
+        )
+
+    @app_commands.command(name='import_events', description='Add events and signups from an export to this server')
+    @app_commands.check(is_admin)
+    @app_commands.describe(
+        events="events file of an export (.csv or .jsonl)",
+        participants="participants file of the same export"
+    )
+    async def import_events(self, interaction: discord.Interaction, events: discord.Attachment,
+                            participants: discord.Attachment = None):
+        """Validate the files and insert their rows in batched transactions"""
+        attachments = [attachment for attachment in (events, participants) if attachment]
+        try:
+            for attachment in attachments:
+                format_of(attachment.filename)
+        except ValueError as e:
+            await interaction.response.send_message(str(e), ephemeral=True)
+            return
+        if self._transfer.locked():
+            await interaction.response.send_message("Another export or import is running, try again later.", ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        try:
+            async with self._transfer:
+                with tempfile.TemporaryDirectory(prefix='eventbot-import-') as directory:
+                    paths = []
+                    for index, attachment in enumerate(attachments):
+                        # The index keeps the two files apart even when both have the same name
+                        path = os.path.join(directory, f"{index}-{os.path.basename(attachment.filename)}")
+                        await attachment.save(path)
+                        paths.append(path)
+                    report = await import_files(self.db, interaction.guild.id, *paths)
+        except TransferError as e:
+            logger.warning("Import into guild %s failed: %s", interaction.guild.id, e, exc_info=e.__cause__)
+            await interaction.followup.send(str(e)[:MESSAGE_LIMIT], ephemeral=True)
+            return
+        except Exception as e:
+            logger.exception("Import into guild %s failed: %s", interaction.guild.id, e)
+            await interaction.followup.send(f"Import failed: {e}"[:MESSAGE_LIMIT], ephemeral=True)
+            return
+        logger.info("%s imported %d events into guild %s", interaction.user, report.events, interaction.guild.id)
+        await interaction.followup.send(report.summary()[:MESSAGE_LIMIT], ephemeral=True)
+
+async def setup(bot):
+    await bot.add_cog(EventTransferCommands(bot))
@@ -0,0 +1,66 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+from events.views import EventListView
+
+PAGE_SIZE = 10
+# Discord shows at most 25 autocomplete choices
+MAX_CHOICES = 25
+
+async def event_id_autocomplete(interaction: discord.Interaction, current: str):
+    """Suggest the guild's newest events matching the typed id or part of the name.
+
+    Served from DatabaseManager's recent-events cache, so keystrokes do not
+    reach the database.
+    """
+    if interaction.guild is None:
+        return []
+    events = await interaction.client.db.get_recent_events(interaction.guild.id)
+    current = current.strip().lstrip('#').lower()
+    choices = []
+    for event in events:
+        if current and not (str(event['id']).startswith(current) or current in event['name'].lower()):
+            continue
+        label = f"#{event['id']} {event['name']} - {event['start_date'].strftime('%Y-%m-%d %H:%M')} ({event['status']})"
+        choices.append(app_commands.Choice(name=label[:100], value=event['id']))
+        if len(choices) == MAX_CHOICES:
+            break
+    return choices
+
+class EventListCommand(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.db = bot.db
+
+    async def _send_pages(self, interaction, title, status=None, words=None):
+        view = EventListView(self.db, interaction, title, status=status, words=words, page_size=PAGE_SIZE)
+        await view.load()
+        if not view.has_more:
+            # A single page needs no buttons
+            view.stop()
+            await interaction.response.send_message(view.render(), ephemeral=True)
+            return
+        await interaction.response.send_message(view.render(), view=view, ephemeral=True)
+
+    @app_commands.command(name='list_events', description="List this server's events by start date")
+    @app_commands.choices(status=[
+        app_commands.Choice(name='Open', value='open'),
+        app_commands.Choice(name='Closed', value='closed')
+    ])
+    async def list_events(self, interaction: discord.Interaction, status: app_commands.Choice[str] = None):
+        """Page through open (or closed) events, oldest start first"""
+        status = status.value if status else 'open'
+        await self._send_pages(interaction, f"{status.capitalize()} events", status=status)
+
+    @app_commands.command(name='search_events', description="Find this server's events by name or description")
+    @app_commands.describe(query="Words the event's name or description contains")
+    async def search_events(self, interaction: discord.Interaction, query: str):
+        """Page through events matching every word of the query"""
+        words = self.db.search_words(query)
+        if not words:
+            await interaction.response.send_message("Search for at least one word.", ephemeral=True)
+            return
+        await self._send_pages(interaction, f"Events matching '{' '.join(words)}'", words=words)
+
+async def setup(bot):
+    await bot.add_cog(EventListCommand(bot))
@@ -1,6 +1,8 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
+from events.notifications import interaction_progress
+from commands.list_events import event_id_autocomplete
 
 class OpenEventCommand(commands.Cog):
     def __init__(self, bot):
@@ -8,24 +10,38 @@ class OpenEventCommand(commands.Cog):
         self.db = bot.db
 
     @app_commands.command(name='open_event', description='Reopen a closed event')
+    @app_commands.autocomplete(event_id=event_id_autocomplete)
     @app_commands.default_permissions(administrator=True)
-    async def open_event_command(self, interaction: discord.Interaction, event_id: int):
-        event = self.db.get_event(event_id)
+    async def open_event_command(self, interaction: discord.Interaction, event_id: int, notify: bool = False):
+        guild_id = interaction.guild.id
+        event = await self.db.get_event(event_id)
         if not event:
-            await interaction.response.send_message("Event not found.")
+            await interaction.response.send_message(self.bot.text(guild_id, 'errors-not_found'))
             return
         if interaction.user.id != event['creator_id'] and interaction.user.id != self.bot.owner_id:
-            await interaction.response.send_message("You do not have permission to open this event.")
+            await interaction.response.send_message(self.bot.text(guild_id, 'errors-no_permission'))
             return
-        await self.open_event(event_id)
-        await interaction.response.send_message(f"Event {event_id} has been reopened.")
+        await interaction.response.send_message(self.bot.text(guild_id, 'event-open-success', event_id=event_id))
+        await self.open_event(event_id, notify=notify, on_progress=interaction_progress(
+            interaction, self.bot.text(guild_id, 'event-open-notifying', event_id=event_id)
+        ))
 
-    async def open_event(self, event_id: int):
-        """Reopen a closed event"""
-        event = self.db.get_event(event_id)
+    async def open_event(self, event_id: int, notify: bool = False, on_progress=None):
+        """Reopen a closed event; notifications are sent in the background and the task is returned"""
+        event = await self.db.get_event(event_id)
         if not event:
             raise ValueError("Event not found")
-        self.db.update_event(event_id, status='open')
+        await self.db.update_event(event_id, status='open')
+        self.bot.scheduler.schedule_event(await self.db.get_event(event_id))
+        await self.bot.refresh_event_message(event_id)
+        if notify:
+            participants = await self.db.get_participants(event_id)
+            if participants:
+                return self.bot.notifier.notify(
+                    [p['user_id'] for p in participants],
+                    self.bot.text(event['guild_id'], 'event-open-notification', name=event['name']),
+                    on_progress=on_progress
+                )
 
 async def setup(bot):
     await bot.add_cog(OpenEventCommand(bot))
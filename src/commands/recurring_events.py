@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+import discord
+from discord.ext import commands
+from discord import app_commands
+import logging
+from commands.create_event import MAX_NAME_LENGTH, parse_start_date
+from events.recurrence import RULE_PRESETS, occurrences, parse_rule
+
+logger = logging.getLogger(__name__)
+
+class RecurringEventsCommand(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.db = bot.db
+
+    @app_commands.command(name='create_series', description="Create an event that repeats on a schedule")
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.describe(
+        start_date="First occurrence (YYYY-MM-DD HH:MM)",
+        repeat="How often the event repeats",
+        rule="RRULE for a custom repeat, e.g. FREQ=WEEKLY;BYDAY=TU,TH",
+        template_name="Template for the generated events"
+    )
+    @app_commands.choices(repeat=[
+        app_commands.Choice(name='Weekly', value='weekly'),
+        app_commands.Choice(name='Every two weeks', value='biweekly'),
+        app_commands.Choice(name='Custom rule', value='custom')
+    ])
+    async def create_series(self, interaction: discord.Interaction, name: str, start_date: str,
+                            repeat: app_commands.Choice[str], description: str = '', rule: str = None,
+                            template_name: str = None):
+        """Store a recurrence rule; its events are generated a rolling window ahead"""
+        try:
+            if not name or len(name) > MAX_NAME_LENGTH:
+                raise ValueError(f"Event names must be 1-{MAX_NAME_LENGTH} characters.")
+            dtstart = parse_start_date(start_date)
+            if repeat.value == 'custom':
+                if not rule:
+                    raise ValueError("A custom repeat needs a rule, e.g. FREQ=WEEKLY;BYDAY=TU,TH")
+                rule = rule.strip()
+            else:
+                rule = RULE_PRESETS[repeat.value]
+            parse_rule(rule, dtstart)
+            if template_name and template_name not in self.bot.templates:
+                raise ValueError(f"Template '{template_name}' not found")
+        except ValueError as e:
+            await interaction.response.send_message(str(e), ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        try:
+            series_id = await self.db.create_series(
+                interaction.guild.id, interaction.user.id, name, description, rule, dtstart, template_name
+            )
+        except Exception as e:
+            logger.exception("Error in create_series: %s", e)
+            await interaction.followup.send(f"Error creating series: {e}", ephemeral=True)
+            return
+        try:
+            # Generate the first window now instead of at the next periodic pass
+            generated = await self.bot.series.expand()
+        except Exception as e:
+            logger.exception("Error expanding series %s: %s", series_id, e)
+            await interaction.followup.send(
+                f"Series {series_id} created, but its events could not be generated yet ({e}). "
+                f"They will be generated at the next periodic pass.",
+                ephemeral=True
+            )
+            return
+        after = max(datetime.now(), dtstart - timedelta(seconds=1))
+        upcoming = occurrences({'rule': rule, 'dtstart': dtstart}, after, datetime.max, limit=3)
+        await interaction.followup.send(
+            f"Series {series_id} created; {generated} events generated. Next: "
+            + (', '.join(start.strftime('%Y-%m-%d %H:%M') for start in upcoming) or 'none'),
+            ephemeral=True
+        )
+
+    @app_commands.command(name='stop_series', description="Stop generating new events for a series")
+    @app_commands.default_permissions(administrator=True)
+    async def stop_series(self, interaction: discord.Interaction, series_id: int):
+        """Events already generated stay; no new ones are created"""
+        series = await self.db.get_series(series_id)
+        if not series or series['guild_id'] != interaction.guild.id:
+            await interaction.response.send_message("Series not found.", ephemeral=True)
+            return
+        await self.db.stop_series(series_id)
+        logger.info("Series %s stopped by %s", series_id, interaction.user)
+        await interaction.response.send_message(
+            f"Series {series_id} stopped. Events already generated are kept.", ephemeral=True
+        )
+
+async def setup(bot):
+    await bot.add_cog(RecurringEventsCommand(bot))
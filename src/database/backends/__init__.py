@@ -0,0 +1,14 @@
+from database.backends.base import StorageBackend
+
+def create_backend(config):
+    """Build the storage backend named by the database section of config.yml"""
+    name = config.get('backend', 'mysql')
+    if name == 'mysql':
+        from database.backends.mysql import MySQLBackend
+        return MySQLBackend(config)
+    if name == 'sqlite':
+        from database.backends.sqlite import SQLiteBackend
+        return SQLiteBackend(config)
+    raise ValueError(f"Unknown database backend: {name}")
+
+__all__ = ['StorageBackend', 'create_backend']
@@ -0,0 +1,82 @@
+class StorageBackend:
+    """Connections and SQL dialect for one database engine.
+
+    DatabaseManager issues every query through a backend. Queries use the
+    %s placeholder style; a backend whose driver expects another style
+    converts it. The few statements the engines spell differently are
+    built by the methods below.
+
+    Connections returned by get_connection() follow mysql-connector's
+    pooled connection: cursor(dictionary=False), start_transaction(),
+    commit(), rollback(), and close() to hand the connection back.
+    """
+
+    dialect = None
+    # Driver exception classes DatabaseManager needs to tell apart
+    errors = ()
+    integrity_errors = ()
+    disconnect_errors = ()
+    # Appended to the SELECT that locks an event row inside a transaction
+    lock_clause = ''
+
+    def __init__(self, config):
+        self.config = config
+        self.pool_size = config.get('pool_size', 5)
+
+    @property
+    def connected(self):
+        raise NotImplementedError
+
+    def connect(self):
+        """Open the connections and bring the schema up to date"""
+        raise NotImplementedError
+
+    def get_connection(self):
+        raise NotImplementedError
+
+    def limit(self, connection, seconds):
+        """Make the driver or server abort statements on a checked-out connection after `seconds`.
+
+        The clock starts here, once a worker holds the connection, so time
+        spent queueing for one does not count. None lifts the limit for
+        bulk work until the connection is handed back.
+        """
+
+    def is_timeout(self, error):
+        """Whether a driver error means the statement was stopped by the limit set with limit()"""
+        return False
+
+    def commit_unknown(self, connection):
+        """Whether the connection's last commit() failed without knowing if the server applied it"""
+        return False
+
+    def close(self):
+        raise NotImplementedError
+
+    def streaming_cursor(self, connection):
+        """A dictionary cursor whose fetchmany() reads rows as the server sends them.
+
+        Used for exports: the client never holds more than one fetchmany()
+        batch, however large the result is.
+        """
+        return connection.cursor(dictionary=True)
+
+    @staticmethod
+    def _columns(columns):
+        return ', '.join(columns), ', '.join(['%s'] * len(columns))
+
+    def upsert(self, table, columns, keys):
+        """INSERT that updates the non-key columns when a row with the same keys exists"""
+        raise NotImplementedError
+
+    def insert_ignore(self, table, columns):
+        """INSERT that silently skips rows whose keys already exist"""
+        raise NotImplementedError
+
+    def match_words(self, words):
+        """A condition on events aliased e, true when name or description has every word as a prefix.
+
+        Returns (condition, parameter); the condition uses the full-text
+        index and takes the parameter as its one placeholder.
+        """
+        raise NotImplementedError
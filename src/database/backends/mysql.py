@@ -0,0 +1,152 @@
+import os
+import mysql.connector
+from mysql.connector import Error, IntegrityError, InterfaceError, OperationalError, errorcode
+from mysql.connector.errors import ReadTimeoutError, WriteTimeoutError
+from mysql.connector.pooling import MySQLConnectionPool
+from database.backends.base import StorageBackend
+from database.migrations import run_migrations
+
+# The server's own limits should fire first; the socket timeout only catches a server that stopped answering
+SOCKET_TIMEOUT_MARGIN = 5
+# MariaDB's max_statement_time error; MySQL has no name for it in errorcode
+ER_STATEMENT_TIMEOUT = 1969
+TIMEOUT_ERRNOS = {errorcode.ER_QUERY_TIMEOUT, errorcode.ER_LOCK_WAIT_TIMEOUT, ER_STATEMENT_TIMEOUT}
+
+class PooledConnection:
+    """A pooled connection that keeps its session timeouts between checkouts.
+
+    The pool's session reset would put the timeout variables back to the
+    server defaults, so it is off; instead a checkout that leaves a
+    transaction open (every read, with autocommit off) is rolled back when
+    the connection is handed back.
+    """
+
+    def __init__(self, pooled, backend):
+        self._pooled = pooled
+        self._backend = backend
+        self.unlimited = False
+        self.commit_unknown = False
+
+    def __getattr__(self, name):
+        return getattr(self._pooled, name)
+
+    def commit(self):
+        try:
+            self._pooled.commit()
+        except (ReadTimeoutError, WriteTimeoutError, InterfaceError, OperationalError):
+            # The COMMIT may have reached the server before the connection failed
+            self.commit_unknown = True
+            raise
+
+    def close(self):
+        try:
+            if self._pooled.is_connected():
+                if self._pooled.in_transaction:
+                    self._pooled.rollback()
+                if self.unlimited:
+                    cursor = self._pooled.cursor()
+                    cursor.execute(self._backend.session_limits)
+                    cursor.close()
+        except Error:
+            # A broken connection is reconnected, limits included, on its next checkout
+            pass
+        finally:
+            self._pooled.close()
+
+class MySQLBackend(StorageBackend):
+    """A mysql-connector connection pool against a MySQL or MariaDB server"""
+
+    dialect = 'mysql'
+    errors = (Error,)
+    integrity_errors = (IntegrityError,)
+    disconnect_errors = (InterfaceError, OperationalError)
+    lock_clause = ' FOR UPDATE'
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.pool = None
+        self.query_timeout = config.get('query_timeout', 10)
+        self.mariadb = False
+
+    @property
+    def connected(self):
+        return self.pool is not None
+
+    def _statement_limit(self, seconds):
+        # MySQL counts milliseconds and only limits SELECTs; MariaDB counts seconds and limits every statement
+        if self.mariadb:
+            return f"max_statement_time = {seconds}"
+        return f"max_execution_time = {int(seconds * 1000)}"
+
+    @property
+    def session_limits(self):
+        """The SET that every pooled connection runs when it connects"""
+        return (
+            f"SET SESSION {self._statement_limit(self.query_timeout)}, "
+            f"innodb_lock_wait_timeout = {max(1, int(self.query_timeout))}"
+        )
+
+    def connect(self):
+        settings = dict(
+            host=self.config['host'],
+            port=self.config['port'],
+            database=self.config['database'],
+            user=self.config['user'],
+            password=os.getenv('DATABASE_PASSWORD'),
+            connection_timeout=self.config.get('connect_timeout', 10)
+        )
+        # Migrations may run far longer than a query is allowed to, so they get an unlimited connection of their own
+        connection = mysql.connector.connect(**settings)
+        try:
+            self.mariadb = 'mariadb' in connection.get_server_info().lower()
+            run_migrations(connection, self.dialect)
+        finally:
+            connection.close()
+        socket_timeout = int(self.query_timeout + SOCKET_TIMEOUT_MARGIN)
+        self.pool = MySQLConnectionPool(
+            pool_name='eventbot',
+            pool_size=self.pool_size,
+            pool_reset_session=False,
+            read_timeout=socket_timeout,
+            write_timeout=socket_timeout,
+            init_command=self.session_limits,
+            **settings
+        )
+
+    def get_connection(self):
+        return PooledConnection(self.pool.get_connection(), self)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool._remove_connections()
+            self.pool = None
+
+    def limit(self, connection, seconds):
+        # Every connection starts limited by init_command; only bulk work lifts it, until the checkout ends
+        if seconds is None and not connection.unlimited:
+            cursor = connection.cursor()
+            cursor.execute(f"SET SESSION {self._statement_limit(0)}")
+            cursor.close()
+            connection.unlimited = True
+
+    def is_timeout(self, error):
+        return isinstance(error, (ReadTimeoutError, WriteTimeoutError)) or getattr(error, 'errno', None) in TIMEOUT_ERRNOS
+
+    def commit_unknown(self, connection):
+        return connection.commit_unknown
+
+    def streaming_cursor(self, connection):
+        # Unbuffered: rows stay on the server until fetched instead of being read into memory on execute()
+        return connection.cursor(dictionary=True, buffered=False)
+
+    def upsert(self, table, columns, keys):
+        names, placeholders = self._columns(columns)
+        updates = ', '.join(f"{column} = VALUES({column})" for column in columns if column not in keys)
+        return f"INSERT INTO {table} ({names}) VALUES ({placeholders}) ON DUPLICATE KEY UPDATE {updates}"
+
+    def insert_ignore(self, table, columns):
+        names, placeholders = self._columns(columns)
+        return f"INSERT IGNORE INTO {table} ({names}) VALUES ({placeholders})"
+
+    def match_words(self, words):
+        return 'MATCH (e.name, e.description) AGAINST (%s IN BOOLEAN MODE)', ' '.join(f"+{word}*" for word in words)
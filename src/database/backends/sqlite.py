@@ -0,0 +1,174 @@
+from datetime import datetime
+import os
+import queue
+import sqlite3
+import time
+from database.backends.base import StorageBackend
+from database.migrations import run_migrations
+
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_converter('DATETIME', lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter('TIMESTAMP', lambda value: datetime.fromisoformat(value.decode()))
+
+_statements = {}
+# Virtual machine steps between two checks of a connection's deadline
+PROGRESS_STEPS = 1000
+
+def _qmark(query):
+    """Convert %s placeholders to the ? style sqlite3 expects"""
+    statement = _statements.get(query)
+    if statement is None:
+        statement = _statements[query] = query.replace('%s', '?')
+    return statement
+
+class SQLiteCursor:
+    def __init__(self, connection, dictionary=False):
+        self._cursor = connection.raw.cursor()
+        self._dictionary = dictionary
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, query, params=()):
+        self._cursor.execute(_qmark(query), tuple(params))
+
+    def executemany(self, query, rows):
+        self._cursor.executemany(_qmark(query), [tuple(row) for row in rows])
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+class SQLiteConnection:
+    """One pooled sqlite3 connection, used by one worker thread at a time"""
+
+    cursor_class = SQLiteCursor
+
+    def __init__(self, backend, path, busy_timeout):
+        self._backend = backend
+        self.raw = sqlite3.connect(
+            path, timeout=busy_timeout, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES
+        )
+        self.raw.execute('PRAGMA foreign_keys = ON')
+        self.raw.execute('PRAGMA synchronous = NORMAL')
+        # Lock waits are bounded by busy_timeout; this interrupts statements that run too long
+        self.deadline = None
+        self.raw.set_progress_handler(self._past_deadline, PROGRESS_STEPS)
+
+    def _past_deadline(self):
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def cursor(self, dictionary=False):
+        return self.cursor_class(self, dictionary)
+
+    def start_transaction(self):
+        # Take the write lock up front: this is what SELECT ... FOR UPDATE
+        # gives the MySQL backend, one writer per database instead of per row
+        self.raw.execute('BEGIN IMMEDIATE')
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        self.deadline = None
+        if self.raw.in_transaction:
+            self.raw.rollback()
+        self._backend._idle.put(self)
+
+class SQLiteBackend(StorageBackend):
+    """An embedded SQLite database file in WAL mode.
+
+    WAL lets readers proceed while one writer commits. Queries still block,
+    so DatabaseManager runs them on its worker threads like any other
+    backend; each worker checks out its own connection.
+    """
+
+    dialect = 'sqlite'
+    errors = (sqlite3.Error,)
+    integrity_errors = (sqlite3.IntegrityError,)
+    disconnect_errors = ()
+    connection_class = SQLiteConnection
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.path = config.get('sqlite_path', 'data/eventbot.sqlite3')
+        self.busy_timeout = config.get('query_timeout', 10)
+        self._connections = []
+        self._idle = queue.Queue()
+
+    @property
+    def connected(self):
+        return bool(self._connections)
+
+    def connect(self):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        first = self.connection_class(self, self.path, self.busy_timeout)
+        # The journal mode is stored in the database file; it can only be
+        # switched while no other connection is open
+        first.raw.execute('PRAGMA journal_mode = WAL').fetchone()
+        run_migrations(first, self.dialect)
+        connections = [first] + [
+            self.connection_class(self, self.path, self.busy_timeout) for _ in range(self.pool_size - 1)
+        ]
+        for connection in connections:
+            self._idle.put(connection)
+        self._connections = connections
+
+    def get_connection(self):
+        return self._idle.get()
+
+    def limit(self, connection, seconds):
+        connection.deadline = time.monotonic() + seconds if seconds is not None else None
+
+    def is_timeout(self, error):
+        # 'interrupted' comes from the deadline, 'database is locked' from busy_timeout
+        return isinstance(error, sqlite3.OperationalError) and (
+            str(error) == 'interrupted' or str(error).startswith('database is locked')
+        )
+
+    def close(self):
+        for connection in self._connections:
+            connection.raw.close()
+        self._connections = []
+        self._idle = queue.Queue()
+
+    def upsert(self, table, columns, keys):
+        names, placeholders = self._columns(columns)
+        updates = ', '.join(f"{column} = excluded.{column}" for column in columns if column not in keys)
+        return (
+            f"INSERT INTO {table} ({names}) VALUES ({placeholders}) "
+            f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates}"
+        )
+
+    def insert_ignore(self, table, columns):
+        names, placeholders = self._columns(columns)
+        return f"INSERT OR IGNORE INTO {table} ({names}) VALUES ({placeholders})"
+
+    def match_words(self, words):
+        return (
+            'e.id IN (SELECT rowid FROM events_fts WHERE events_fts MATCH %s)',
+            ' '.join(f'"{word}"*' for word in words)
+        )
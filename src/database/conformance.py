@@ -0,0 +1,361 @@
+"""Behaviour every storage backend must share, checked through DatabaseManager.
+
+Run from the repository root against a scratch database:
+
+    PYTHONPATH=src python -m database.conformance --backend sqlite
+    PYTHONPATH=src python -m database.conformance --backend mysql --database eventbot_conformance
+
+The sqlite run uses a temporary file. The mysql run uses the connection
+settings from config.yml with the given database name. It creates rows in
+that database and removes only the events it created, so never point it
+at a live database.
+"""
+import argparse
+import asyncio
+from datetime import datetime
+import io
+import os
+import sys
+import tempfile
+import yaml
+from database.db_manager import EXPORT_EVENT_COLUMNS, EXPORT_PARTICIPANT_COLUMNS, DatabaseManager
+from database.transfer import ImportReport, RowWriter, read_events, read_participants
+from events.templates import Template
+
+CHECKS = []
+
+def check(function):
+    CHECKS.append(function)
+    return function
+
+class Context:
+    """A DatabaseManager plus the guild id and cleanup list one check works with"""
+
+    def __init__(self, db, guild_id):
+        self.db = db
+        self.guild_id = guild_id
+        self.events = []
+
+    async def event(self, status='open', template_name=None, template_version=None):
+        event_id = await self.db.create_event(
+            guild_id=self.guild_id, creator_id=1, name='Conformance', description='check',
+            start_date=datetime(2030, 1, 2, 20, 30), template_name=template_name, template_version=template_version
+        )
+        self.events.append(event_id)
+        if status != 'open':
+            await self.db.update_event(event_id, status=status)
+        return event_id
+
+    def uncached(self):
+        """Drop the cache so the next reads go to the database"""
+        self.db.cache.clear()
+
+async def expect_rejection(coroutine, message):
+    try:
+        await coroutine
+    except ValueError as e:
+        assert message in str(e), f"expected {message!r}, got {str(e)!r}"
+    else:
+        raise AssertionError(f"expected rejection {message!r}")
+
+@check
+async def event_round_trip(ctx):
+    event_id = await ctx.event()
+    ctx.uncached()
+    event = await ctx.db.get_event(event_id)
+    assert event['guild_id'] == ctx.guild_id
+    assert event['status'] == 'open'
+    assert isinstance(event['start_date'], datetime) and event['start_date'] == datetime(2030, 1, 2, 20, 30)
+    await ctx.db.update_event(event_id, name='Renamed', status='closed')
+    ctx.uncached()
+    event = await ctx.db.get_event(event_id)
+    assert (event['name'], event['status']) == ('Renamed', 'closed')
+
+@check
+async def signup_rules(ctx):
+    event_id = await ctx.event()
+    limit = lambda event: 2
+    event, participants = await ctx.db.signup_participant(event_id, 10, 'Tank', limit)
+    assert [p['user_id'] for p in participants] == [10]
+    ctx.uncached()
+    await expect_rejection(ctx.db.signup_participant(event_id, 10, 'Tank', limit), 'already signed up')
+    await ctx.db.signup_participant(event_id, 11, 'Tank', limit)
+    ctx.uncached()
+    await expect_rejection(ctx.db.signup_participant(event_id, 12, 'Tank', limit), 'is full')
+    await ctx.db.cancel_participant(event_id, 10)
+    ctx.uncached()
+    await expect_rejection(ctx.db.cancel_participant(event_id, 10), 'not signed up')
+    participants = await ctx.db.get_participants(event_id)
+    assert [(p['user_id'], p['role_name']) for p in participants] == [(11, 'Tank')]
+    assert isinstance(participants[0]['signup_date'], datetime)
+
+@check
+async def waitlist_promotion(ctx):
+    event_id = await ctx.event()
+    limit = lambda event: 1
+    capacities = lambda event: {'Tank': 1}
+    await ctx.db.signup_participant(event_id, 10, 'Tank', limit)
+    await expect_rejection(ctx.db.signup_participant(event_id, 11, 'Tank', limit), 'is full')
+    assert (await ctx.db.signup_or_waitlist(event_id, 11, 'Tank', limit))[2] == 1
+    assert (await ctx.db.signup_or_waitlist(event_id, 12, 'Tank', limit))[2] == 2
+    assert (await ctx.db.signup_or_waitlist(event_id, 13, 'Tank', limit))[2] == 3
+    await expect_rejection(ctx.db.signup_or_waitlist(event_id, 12, 'Tank', limit), '#2 on the Tank waitlist')
+    await ctx.db.leave_waitlist(event_id, 12)
+    ctx.uncached()
+    await expect_rejection(ctx.db.leave_waitlist(event_id, 12), 'not signed up')
+    event, participants, promoted = await ctx.db.cancel_participant(event_id, 10, capacities)
+    assert [p['user_id'] for p in promoted] == [11]
+    assert [(p['user_id'], p['role_name']) for p in participants] == [(11, 'Tank')]
+    # 13 moved up to first in line when 12 left
+    await expect_rejection(ctx.db.signup_or_waitlist(event_id, 13, 'Tank', limit), '#1 on the Tank waitlist')
+    ctx.uncached()
+    assert [p['user_id'] for p in await ctx.db.get_participants(event_id)] == [11]
+
+@check
+async def signup_closed_event(ctx):
+    event_id = await ctx.event(status='closed')
+    ctx.uncached()
+    await expect_rejection(ctx.db.signup_participant(event_id, 10, 'Tank'), 'not open')
+    await expect_rejection(ctx.db.signup_participant(2 ** 31 - 1, 10, 'Tank'), 'not found')
+
+@check
+async def concurrent_signups_respect_limit(ctx):
+    event_id = await ctx.event()
+    results = await asyncio.gather(
+        *(ctx.db.signup_participant(event_id, user_id, 'DPS', lambda event: 5) for user_id in range(100, 130)),
+        return_exceptions=True
+    )
+    assert sum(1 for result in results if not isinstance(result, Exception)) == 5
+    assert all(isinstance(result, (tuple, ValueError)) for result in results)
+    ctx.uncached()
+    assert len(await ctx.db.get_participants(event_id)) == 5
+
+@check
+async def stale_cached_roster_is_reread(ctx):
+    event_id = await ctx.event()
+    limit = lambda event: 2
+    await ctx.db.signup_participant(event_id, 10, 'Tank', limit)
+    # Another process signs 11 up: the database moves on, this cache does not hear of it
+    await ctx.db._run(
+        ctx.db._write_roster, event_id,
+        'INSERT INTO participants (event_id, user_id, role_name) VALUES (%s, %s, %s)', (event_id, 11, 'Tank')
+    )
+    assert [p['user_id'] for p in ctx.db.cache.peek(event_id)[1]] == [10]
+    await expect_rejection(ctx.db.signup_participant(event_id, 12, 'Tank', limit), 'is full')
+    event, participants = await ctx.db.signup_participant(event_id, 12, 'Healer', limit)
+    assert [p['user_id'] for p in participants] == [10, 11, 12]
+    # The click above left a current snapshot behind; the next one is served from it
+    event, participants, promoted = await ctx.db.cancel_participant(event_id, 12)
+    assert [p['user_id'] for p in participants] == [10, 11] and promoted == []
+    ctx.uncached()
+    assert [p['user_id'] for p in await ctx.db.get_participants(event_id)] == [10, 11]
+
+@check
+async def delete_cascades(ctx):
+    event_id = await ctx.event()
+    await ctx.db.signup_participant(event_id, 10, 'Tank')
+    await ctx.db.store_event_message(event_id, ctx.guild_id, 5, event_id * 1000 + 1, 6)
+    await ctx.db.delete_event(event_id)
+    assert await ctx.db.get_event(event_id) is None
+    assert await ctx.db.get_participants(event_id) == []
+    assert await ctx.db.get_event_message(event_id) is None
+
+@check
+async def event_message_index(ctx):
+    first, second = await ctx.event(), await ctx.event()
+    assert await ctx.db.get_unindexed_event_ids(ctx.guild_id) == {first, second}
+    await ctx.db.store_event_message(first, ctx.guild_id, 5, first * 1000 + 1, None)
+    # Storing again moves the message; the row is updated, not duplicated
+    await ctx.db.store_event_messages([(first, ctx.guild_id, 7, first * 1000 + 2, 8)])
+    location = await ctx.db.get_event_message(first)
+    assert (location['channel_id'], location['message_id'], location['thread_id']) == (7, first * 1000 + 2, 8)
+    assert await ctx.db.get_unindexed_event_ids(ctx.guild_id) == {second}
+    ctx.uncached()
+    assert (await ctx.db.get_event(first))['message_id'] == first * 1000 + 2
+    open_ids = {event['id'] for event in await ctx.db.get_open_events()}
+    assert first in open_ids and second not in open_ids
+
+@check
+async def guild_settings_upserts(ctx):
+    assert await ctx.db.get_guild_settings(ctx.guild_id) is None
+    await ctx.db.update_guild_settings(ctx.guild_id, 42)
+    await ctx.db.update_guild_language(ctx.guild_id, 'de')
+    await ctx.db.update_guild_settings(ctx.guild_id, 43)
+    settings = await ctx.db.get_guild_settings(ctx.guild_id)
+    assert (settings['listening_channel'], settings['language']) == (43, 'de')
+    assert any(row['guild_id'] == ctx.guild_id for row in await ctx.db.get_all_guild_settings())
+
+@check
+async def template_revisions(ctx):
+    name = f"conformance_{ctx.guild_id}"
+    template = Template(name, {'roles': {'Tank': {'limit': 2, 'emoji': 'T'}}})
+    await ctx.db.store_template_revisions([template])
+    await ctx.db.store_template_revisions([template])
+    await ctx.event(template_name=name, template_version=template.version)
+    pinned = [row for row in await ctx.db.get_pinned_template_revisions() if row['template_name'] == name]
+    assert [(row['version'], row['body']) for row in pinned] == [(template.version, template.data)]
+
+@check
+async def archive_moves_history(ctx):
+    closed, never_closed = await ctx.event(status='closed'), await ctx.event()
+    await ctx.db.signup_participant(never_closed, 11, 'Tank')
+    await ctx.db.update_event(closed, status='open')
+    await ctx.db.signup_participant(closed, 10, 'Tank')
+    await ctx.db.update_event(closed, status='closed')
+    await ctx.db.store_event_message(closed, ctx.guild_id, 5, closed * 1000 + 1, None)
+    # Events start on 2030-01-02: an earlier cutoff keeps both, a later one archives both, open or not
+    await ctx.db.archive_events(datetime(2030, 1, 1), batch_size=1)
+    history = await ctx.db.get_guild_history(ctx.guild_id)
+    assert {(row['id'], bool(row['archived'])) for row in history} == {(closed, False), (never_closed, False)}
+    moved = await ctx.db.archive_events(datetime(2031, 1, 1), batch_size=1)
+    assert moved >= 2
+    assert await ctx.db.get_event(closed) is None
+    assert await ctx.db.get_event(never_closed) is None
+    assert await ctx.db.get_event_message(closed) is None
+    event, participants = await ctx.db.get_event_history(closed)
+    assert event['archived'] and event['guild_id'] == ctx.guild_id
+    assert event['start_date'] == datetime(2030, 1, 2, 20, 30)
+    assert [(p['user_id'], p['role_name']) for p in participants] == [(10, 'Tank')]
+    event, participants = await ctx.db.get_event_history(never_closed)
+    assert event['archived'] and event['status'] == 'open'
+    assert [(p['user_id'], p['role_name']) for p in participants] == [(11, 'Tank')]
+    history = await ctx.db.get_guild_history(ctx.guild_id)
+    assert {(row['id'], bool(row['archived'])) for row in history} == {(closed, True), (never_closed, True)}
+
+@check
+async def series_events_insert_once(ctx):
+    series_id = await ctx.db.create_series(ctx.guild_id, 1, 'Weekly', 'check', 'FREQ=WEEKLY', datetime(2030, 1, 1, 20, 0))
+    starts = [datetime(2030, 1, 1, 20, 0), datetime(2030, 1, 8, 20, 0)]
+    rows = [(ctx.guild_id, 1, 'Weekly', 'check', start, None, None, series_id) for start in starts]
+    horizons = [(datetime(2030, 1, 10), series_id)]
+    assert await ctx.db.create_series_events(rows, horizons) == 2
+    assert await ctx.db.create_series_events(rows, horizons) == 0
+    generated = [e for e in await ctx.db.get_unposted_series_events(datetime(2029, 1, 1)) if e['series_id'] == series_id]
+    ctx.events.extend(event['id'] for event in generated)
+    assert [event['start_date'] for event in generated] == starts
+    assert (await ctx.db.get_series(series_id))['generated_until'] == datetime(2030, 1, 10)
+    assert series_id not in {s['id'] for s in await ctx.db.get_due_series(datetime(2030, 1, 5))}
+    await ctx.db.stop_series(series_id)
+    assert series_id not in {s['id'] for s in await ctx.db.get_due_series(datetime(2031, 1, 1))}
+    await ctx.db._run(ctx.db._write, 'DELETE FROM event_series WHERE id = %s', (series_id,))
+
+@check
+async def transfer_round_trip(ctx):
+    template = Template('raid', {'roles': {'Tank': {'limit': 2, 'emoji': 'T'}, 'Healer': {'limit': 2, 'emoji': 'H'}}})
+    event_id = await ctx.event(template_name=template.name, template_version=template.version)
+    await ctx.db.signup_participant(event_id, 10, 'Tank')
+    await ctx.db.signup_participant(event_id, 11, 'Healer')
+    events, participants = io.StringIO(), io.StringIO()
+    counts = await ctx.db.export_guild(
+        ctx.guild_id, RowWriter(events, EXPORT_EVENT_COLUMNS, 'csv'),
+        RowWriter(participants, EXPORT_PARTICIPANT_COLUMNS, 'csv'), batch_size=1
+    )
+    assert counts == (1, 2)
+    events.seek(0)
+    # A repeated signup and one for an unknown event are skipped, not fatal
+    participants.write(participants.getvalue().splitlines()[1] + '\r\n' + f"{event_id + 1000},12,Tank,\r\n")
+    participants.seek(0)
+    report = ImportReport()
+    imported = await ctx.db.import_guild(
+        ctx.guild_id + 1, read_events(events, 'csv', report), read_participants(participants, 'csv', report), batch_size=1
+    )
+    assert imported == (1, 2, 1)
+    (copy,) = await ctx.db._run(ctx.db._fetch_all, 'SELECT * FROM events WHERE guild_id = %s', (ctx.guild_id + 1,))
+    ctx.events.append(copy['id'])
+    original = await ctx.db.get_event(event_id)
+    assert copy['id'] != event_id
+    columns = ('name', 'start_date', 'status', 'template_name', 'template_version')
+    assert {key: copy[key] for key in columns} == {key: original[key] for key in columns}
+    assert copy['template_version'] == template.version
+    assert sorted((p['user_id'], p['role_name']) for p in await ctx.db.get_participants(copy['id'])) == \
+        [(10, 'Tank'), (11, 'Healer')]
+
+@check
+async def keyset_pages_and_search(ctx):
+    names = ['Molten Core', 'Blackwing Lair', 'Molten Core reclear', 'Onyxia', 'Zul Gurub']
+    for index, name in enumerate(names):
+        # Two events share each start time, so pages must break ties on id
+        event_id = await ctx.db.create_event(
+            ctx.guild_id, 1, name, 'weekly raid', datetime(2030, 1, 1 + index // 2, 20, 0)
+        )
+        ctx.events.append(event_id)
+    await ctx.db.update_event(ctx.events[3], status='closed')
+    seen, after = [], None
+    while True:
+        page, more = await ctx.db.list_events(ctx.guild_id, status='open', after=after, limit=2)
+        seen.extend(event['id'] for event in page)
+        if not more:
+            break
+        after = (page[-1]['start_date'], page[-1]['id'])
+    assert seen == [ctx.events[i] for i in (0, 1, 2, 4)]
+    found, _ = await ctx.db.list_events(ctx.guild_id, words=ctx.db.search_words('molt'))
+    assert [event['id'] for event in found] == [ctx.events[0], ctx.events[2]]
+    found, _ = await ctx.db.list_events(ctx.guild_id, words=ctx.db.search_words('core, reclear!'))
+    assert [event['id'] for event in found] == [ctx.events[2]]
+    # The index follows renames and deletes
+    await ctx.db.update_event(ctx.events[4], name="Zul'Aman")
+    assert (await ctx.db.list_events(ctx.guild_id, words=['gurub']))[0] == []
+    assert [e['id'] for e in (await ctx.db.list_events(ctx.guild_id, words=['aman']))[0]] == [ctx.events[4]]
+    recent = await ctx.db.get_recent_events(ctx.guild_id)
+    assert [event['id'] for event in recent] == ctx.events[::-1]
+    hits = ctx.db.recent_events.hits
+    assert await ctx.db.get_recent_events(ctx.guild_id) == recent
+    assert ctx.db.recent_events.hits == hits + 1
+    await ctx.db.delete_event(ctx.events[0])
+    assert [event['id'] for event in await ctx.db.get_recent_events(ctx.guild_id)] == ctx.events[:0:-1]
+    assert (await ctx.db.list_events(ctx.guild_id, words=['molten']))[0][0]['id'] == ctx.events[2]
+
+async def cleanup(ctx):
+    for event_id in ctx.events:
+        await ctx.db.delete_event(event_id)
+        # Cascades to the archived participants
+        await ctx.db._run(ctx.db._write, 'DELETE FROM events_archive WHERE id = %s', (event_id,))
+
+async def run_checks(db, guild_base=800000000000000000):
+    """Run every check against db; returns a list of (name, error or None)"""
+    await db.connect()
+    results = []
+    for index, function in enumerate(CHECKS):
+        ctx = Context(db, guild_base + index)
+        try:
+            await function(ctx)
+            results.append((function.__name__, None))
+        except Exception as e:
+            results.append((function.__name__, e))
+        finally:
+            await cleanup(ctx)
+            db.cache.clear()
+    return results
+
+def load_config(backend, database=None):
+    with open('config/config.yml', 'r', encoding='utf-8-sig') as file:
+        config = dict(yaml.safe_load(file)['database'])
+    config['backend'] = backend
+    if database:
+        config['database'] = database
+    return config
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Storage backend conformance checks')
+    parser.add_argument('--backend', choices=['sqlite', 'mysql'], default='sqlite')
+    parser.add_argument('--database', help='scratch MySQL database to run against (required for mysql)')
+    options = parser.parse_args(argv)
+    if options.backend == 'mysql' and not options.database:
+        parser.error('--database is required for the mysql backend')
+    with tempfile.TemporaryDirectory(prefix='eventbot-conformance-') as directory:
+        config = load_config(options.backend, options.database)
+        config['sqlite_path'] = os.path.join(directory, 'conformance.sqlite3')
+        db = DatabaseManager(config)
+        try:
+            results = asyncio.run(run_checks(db))
+        finally:
+            db.close()
+    failed = 0
+    for name, error in results:
+        print(f"{'FAIL' if error else 'ok  '} {name}" + (f": {error!r}" if error else ''))
+        failed += error is not None
+    print(f"{len(results) - failed}/{len(results)} checks passed on {options.backend}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,167 +1,940 @@
-﻿import mysql.connector
-from mysql.connector import Error
+﻿import asyncio
+import json
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 import yaml
-import os
 from dotenv import load_dotenv
+from database.backends import create_backend
+from database.event_cache import EventCache, RecentEvents
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    'eventbot_db_query_seconds', 'Database operation latency, including the wait for a pooled connection',
+    ['query']
+)
+DB_ERRORS = REGISTRY.counter('eventbot_db_errors_total', 'Database operations that raised', ['query', 'error'])
+DB_RECONNECTS = REGISTRY.counter('eventbot_db_reconnects_total', 'Database operations retried after a dropped connection')
+
+_SEARCH_WORD = re.compile(r'\w+')
+_QUERY_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE)\s+(\w+)', re.IGNORECASE)
+_query_labels = {}
+
+def _query_label(operation, args):
+    """A low-cardinality name for an operation: verb_table for raw SQL, else the operation's name"""
+    if args and isinstance(args[0], str):
+        query = args[0]
+        label = _query_labels.get(query)
+        if label is None:
+            table = _QUERY_TABLE.search(query)
+            label = query.split(None, 1)[0].lower() + (f"_{table.group(1)}" if table else '')
+            _query_labels[query] = label
+        return label
+    return operation.__name__.lstrip('_')
+
+def _batches(rows, size):
+    """Split an iterable into lists of at most size items without reading it all"""
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+class RoleFullError(ValueError):
+    """The requested role has no free slot"""
+
+class NotSignedUpError(ValueError):
+    """The user has no signup (or waitlist entry) to cancel"""
+
+class DatabaseTimeoutError(TimeoutError):
+    """The database stopped an operation that ran past query_timeout.
+
+    Everything the operation did was rolled back, unless maybe_committed
+    is set: then the connection failed inside COMMIT, and the write may
+    have been applied after all.
+    """
+
+    def __init__(self, message, maybe_committed=False):
+        super().__init__(message)
+        self.maybe_committed = maybe_committed
+
+# Columns copied from the hot tables into events_archive / participants_archive
+ARCHIVE_EVENT_COLUMNS = (
+    'id, guild_id, creator_id, name, description, start_date, status, '
+    'template_name, template_version, message_id, created_at, series_id'
+)
+ARCHIVE_PARTICIPANT_COLUMNS = 'id, event_id, user_id, role_name, signup_date'
+
+# Columns written by export_guild; guild and message ids stay in the database
+EXPORT_EVENT_COLUMNS = (
+    'id', 'creator_id', 'name', 'description', 'start_date', 'status',
+    'template_name', 'template_version', 'created_at'
+)
+EXPORT_PARTICIPANT_COLUMNS = ('event_id', 'user_id', 'role_name', 'signup_date')
 
 class DatabaseManager:
-    def __init__(self):
+    """Awaitable access to the event database.
+
+    Queries run on the connections of a storage backend (MySQL or SQLite,
+    chosen by `backend` in config.yml) inside a dedicated thread pool, so
+    no coroutine ever blocks the event loop on a round trip. Event rows and
+    rosters are served from a write-through EventCache.
+    """
+
+    def __init__(self, config=None, backend=None):
         load_dotenv()
-        self.config = self._load_config()
-        self.connection = None
-        self.connect()
+        self.config = config if config is not None else self._load_config()
+        self.backend = backend or create_backend(self.config)
+        self.pool_size = self.backend.pool_size
+        self.query_timeout = self.config.get('query_timeout', 10)
+        self.cache = EventCache(self.config.get('cache_size', 1000))
+        self.recent_events = RecentEvents(ttl=self.config.get('recent_events_ttl', 60))
+        self._listeners = []
+        self._connect_lock = threading.Lock()
+        # event id -> [asyncio.Lock, users]; see _cache_roster
+        self._roster_locks = {}
+        # One worker per pooled connection: the pool can never be exhausted
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix='db')
 
     def _load_config(self):
         with open('config/config.yml', 'r') as file:
             return yaml.safe_load(file)['database']
 
-    def connect(self):
+    def add_listener(self, callback):
+        """callback(kind, key) runs after every write that other processes' caches must forget.
+
+        kind is 'event' (key is an event id) or 'guild' (key is a guild id).
+        """
+        self._listeners.append(callback)
+
+    def _changed(self, kind, key):
+        for callback in self._listeners:
+            callback(kind, key)
+
+    async def connect(self):
+        """Open the backend's connections and bring the schema up to date"""
         try:
-            self.connection = mysql.connector.connect(
-                host=self.config['host'],
-                port=self.config['port'],
-                database=self.config['database'],
-                user=self.config['user'],
-                password=os.getenv('DATABASE_PASSWORD')
-            )
-            if self.connection.is_connected():
-                self._create_tables()
-        except Error as e:
-            print(f"Error connecting to MySQL Database: {e}")
-
-    def _create_tables(self):
-        cursor = self.connection.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS events (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                guild_id BIGINT NOT NULL,
-                creator_id BIGINT NOT NULL,
-                name VARCHAR(100) NOT NULL,
-                description TEXT,
-                start_date DATETIME NOT NULL,
-                status VARCHAR(20) DEFAULT 'open',
-                template_name VARCHAR(50),
-                message_id BIGINT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS participants (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                event_id INT NOT NULL,
-                user_id BIGINT NOT NULL,
-                role_name VARCHAR(60) NOT NULL,
-                signup_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (event_id) REFERENCES events(id) ON DELETE CASCADE
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS participants (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                event_id INT NOT NULL,
-                user_id BIGINT NOT NULL,
-                role_name VARCHAR(60) NOT NULL,
-                signup_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (event_id) REFERENCES events(id) ON DELETE CASCADE
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS guild_settings (
-                guild_id BIGINT PRIMARY KEY,
-                listening_channel BIGINT
+            await self._run(self._ping)
+        except self.backend.errors + (DatabaseTimeoutError,) as e:
+            logger.error("Error connecting to the %s database: %s", self.backend.dialect, e)
+
+    @staticmethod
+    def _ping(connection):
+        return None
+
+    async def _run(self, operation, *args, bulk=False):
+        """Run operation(connection, *args) on a pooled connection off the event loop.
+
+        A dropped connection is retried once; the pool reconnects stale
+        connections on checkout and is rebuilt when it could not be created.
+        query_timeout is enforced by the driver and server from the moment a
+        worker holds a connection (see StorageBackend.limit), so time queued
+        behind other operations does not count and a stopped statement is
+        really stopped; it surfaces as DatabaseTimeoutError and is never
+        retried. Bulk operations (exports, imports) run without the limit
+        and are not retried either, since they consume files and iterators
+        only once.
+        """
+        loop = asyncio.get_running_loop()
+        label = _query_label(operation, args)
+        started = time.perf_counter()
+        try:
+            for attempt in range(1 if bulk else 2):
+                try:
+                    return await loop.run_in_executor(self._executor, self._call, operation, bulk, *args)
+                except self.backend.disconnect_errors as e:
+                    if attempt or bulk:
+                        raise
+                    DB_RECONNECTS.inc()
+                    logger.warning("Lost connection to the %s database, reconnecting: %s", self.backend.dialect, e)
+        except ValueError:
+            # Rejections raised by transactions (full role, duplicate signup) are not errors
+            raise
+        except Exception as e:
+            DB_ERRORS.labels(label, type(e).__name__).inc()
+            raise
+        finally:
+            DB_QUERY_SECONDS.labels(label).observe(time.perf_counter() - started)
+
+    def _call(self, operation, bulk, *args):
+        if not self.backend.connected:
+            with self._connect_lock:
+                if not self.backend.connected:
+                    self.backend.connect()
+        connection = self.backend.get_connection()
+        try:
+            self.backend.limit(connection, None if bulk else self.query_timeout)
+            return operation(connection, *args)
+        except Exception as e:
+            maybe_committed = self.backend.commit_unknown(connection)
+            try:
+                connection.rollback()
+            except self.backend.errors:
+                pass
+            if maybe_committed or self.backend.is_timeout(e):
+                raise DatabaseTimeoutError(
+                    f"{_query_label(operation, args)} timed out: {e}", maybe_committed=maybe_committed
+                ) from e
+            raise
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _fetch_one(connection, query, params=()):
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute(query, params)
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _fetch_all(connection, query, params=()):
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _write(connection, query, params=()):
+        cursor = connection.cursor()
+        try:
+            cursor.execute(query, params)
+            connection.commit()
+            return cursor.lastrowid
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _write_many(connection, query, rows):
+        cursor = connection.cursor()
+        try:
+            cursor.executemany(query, rows)
+            connection.commit()
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    async def store_event_message(self, event_id, guild_id, channel_id, message_id, thread_id=None):
+        """Record where an event message was posted"""
+        await self.store_event_messages([(event_id, guild_id, channel_id, message_id, thread_id)])
+
+    async def store_event_messages(self, rows):
+        """Record many (event_id, guild_id, channel_id, message_id, thread_id) locations in one transaction"""
+        await self._run(self._store_event_messages, list(rows))
+        for event_id, _, _, message_id, _ in rows:
+            self.cache.update_event(event_id, message_id=message_id)
+            self._changed('event', event_id)
+
+    def _store_event_messages(self, connection, rows):
+        cursor = connection.cursor()
+        try:
+            cursor.executemany(self.backend.upsert(
+                'event_messages', ['event_id', 'guild_id', 'channel_id', 'message_id', 'thread_id'], ['event_id']
+            ), rows)
+            # events.message_id stays in step for the startup view restore
+            cursor.executemany(
+                'UPDATE events SET message_id = %s WHERE id = %s',
+                [(message_id, event_id) for event_id, _, _, message_id, _ in rows]
             )
-        ''')
-        self.connection.commit()
-        cursor.close()
-
-    def store_event_message_id(self, event_id: int, message_id: int):
-        cursor = self.connection.cursor()
-        cursor.execute('UPDATE events SET message_id = %s WHERE id = %s', (message_id, event_id))
-        self.connection.commit()
-        cursor.close()
-
-    def get_event_message_id(self, event_id: int):
-        cursor = self.connection.cursor(dictionary=True)
-        cursor.execute('SELECT message_id FROM events WHERE id = %s', (event_id,))
-        result = cursor.fetchone()
-        cursor.close()
-        return result['message_id'] if result and result['message_id'] else None
-
-    def create_event(self, guild_id, creator_id, name, description, start_date, template_name=None):
-        cursor = self.connection.cursor()
+            connection.commit()
+        finally:
+            cursor.close()
+
+    async def get_event_message(self, event_id):
+        """Return the event_messages row (channel_id, message_id, thread_id) of an event, or None"""
+        return await self._run(self._fetch_one, 'SELECT * FROM event_messages WHERE event_id = %s', (event_id,))
+
+    async def get_unindexed_event_ids(self, guild_id):
+        """Return the ids of a guild's events with no recorded message location"""
+        rows = await self._run(self._fetch_all, '''
+            SELECT e.id FROM events e
+            LEFT JOIN event_messages m ON m.event_id = e.id
+            WHERE e.guild_id = %s AND m.event_id IS NULL
+        ''', (guild_id,))
+        return {row['id'] for row in rows}
+
+    async def create_event(self, guild_id, creator_id, name, description, start_date, template_name=None, template_version=None):
         query = '''
-            INSERT INTO events (guild_id, creator_id, name, description, start_date, template_name)
-            VALUES (%s, %s, %s, %s, %s, %s)
+            INSERT INTO events (guild_id, creator_id, name, description, start_date, template_name, template_version)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
         '''
-        cursor.execute(query, (guild_id, creator_id, name, description, start_date, template_name))
-        self.connection.commit()
-        event_id = cursor.lastrowid
-        cursor.close()
+        event_id = await self._run(
+            self._write, query,
+            (guild_id, creator_id, name, description, start_date, template_name, template_version)
+        )
+        self.recent_events.invalidate_guild(guild_id)
         return event_id
 
-    def get_event(self, event_id):
-        cursor = self.connection.cursor(dictionary=True)
-        cursor.execute('SELECT * FROM events WHERE id = %s', (event_id,))
-        event = cursor.fetchone()
-        cursor.close()
+    async def create_series(self, guild_id, creator_id, name, description, rule, dtstart, template_name=None):
+        query = '''
+            INSERT INTO event_series (guild_id, creator_id, name, description, template_name, rule, dtstart)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        '''
+        return await self._run(
+            self._write, query, (guild_id, creator_id, name, description, template_name, rule, dtstart)
+        )
+
+    async def get_series(self, series_id):
+        return await self._run(self._fetch_one, 'SELECT * FROM event_series WHERE id = %s', (series_id,))
+
+    async def stop_series(self, series_id):
+        await self._run(self._write, "UPDATE event_series SET status = 'stopped' WHERE id = %s", (series_id,))
+
+    async def get_due_series(self, until):
+        """Return the active series whose events have not been generated up to until"""
+        return await self._run(self._fetch_all, '''
+            SELECT * FROM event_series
+            WHERE status = 'active' AND (generated_until IS NULL OR generated_until < %s)
+        ''', (until,))
+
+    async def create_series_events(self, events, horizons):
+        """Insert generated occurrences and move each series' window forward in one transaction.
+
+        events are (guild_id, creator_id, name, description, start_date,
+        template_name, template_version, series_id) rows, sent as a single
+        batched insert; an occurrence that already exists is skipped.
+        horizons are (generated_until, series_id) rows. Returns the number
+        of events inserted.
+        """
+        events = list(events)
+        inserted = await self._run(self._create_series_events, events, list(horizons))
+        if inserted:
+            for guild_id in {event[0] for event in events}:
+                self.recent_events.invalidate_guild(guild_id)
+        return inserted
+
+    def _create_series_events(self, connection, events, horizons):
+        cursor = connection.cursor()
+        try:
+            inserted = 0
+            if events:
+                cursor.executemany(self.backend.insert_ignore('events', [
+                    'guild_id', 'creator_id', 'name', 'description', 'start_date',
+                    'template_name', 'template_version', 'series_id'
+                ]), events)
+                inserted = cursor.rowcount
+            if horizons:
+                cursor.executemany('UPDATE event_series SET generated_until = %s WHERE id = %s', horizons)
+            connection.commit()
+            return inserted
+        finally:
+            cursor.close()
+
+    async def get_unposted_series_events(self, after):
+        """Return open generated events starting after `after` that have no posted message yet"""
+        return await self._run(self._fetch_all, '''
+            SELECT * FROM events
+            WHERE status = 'open' AND start_date > %s AND series_id IS NOT NULL AND message_id IS NULL
+            ORDER BY start_date
+        ''', (after,))
+
+    async def get_event(self, event_id):
+        event = self.cache.get_event(event_id)
+        if event is None:
+            generation = self.cache.start_read(event_id)
+            try:
+                event = await self._run(self._fetch_one, 'SELECT * FROM events WHERE id = %s', (event_id,))
+            finally:
+                unchanged = self.cache.finish_read(event_id, generation)
+            # A write that landed during the read already cached a newer row
+            if event and unchanged:
+                self.cache.put(event_id, event=event)
         return event
 
-    def update_event(self, event_id, **kwargs):
-        cursor = self.connection.cursor()
+    async def get_open_events(self):
+        """Return every open event that has a posted message, warming the cache"""
+        events = await self._run(
+            self._fetch_all,
+            "SELECT * FROM events WHERE status = 'open' AND message_id IS NOT NULL"
+        )
+        for event in events:
+            self.cache.put(event['id'], event=event)
+        return events
+
+    async def get_schedulable_events(self, until):
+        """Return open events starting no later than until, earliest first"""
+        return await self._run(
+            self._fetch_all,
+            "SELECT * FROM events WHERE status = 'open' AND start_date <= %s ORDER BY start_date",
+            (until,)
+        )
+
+    async def claim_scheduled_action(self, event_id, action):
+        """Record that a scheduled action fired; False if it already had"""
+        query = self.backend.insert_ignore('scheduled_actions', ['event_id', 'action'])
+        return await self._run(self._write_many, query, [(event_id, action)]) == 1
+
+    async def reset_scheduled_actions(self, event_id):
+        """Forget fired actions so a rescheduled event gets its reminders again"""
+        await self._run(self._write, 'DELETE FROM scheduled_actions WHERE event_id = %s', (event_id,))
+
+    async def update_event(self, event_id, **kwargs):
         set_clause = ', '.join(f"{k}=%s" for k in kwargs.keys())
-        query = f'UPDATE events SET {set_clause} WHERE id = %s'
+        # Status and template changes decide signups too: cached rosters must be read again
+        query = f'UPDATE events SET {set_clause}, revision = revision + 1 WHERE id = %s'
         values = list(kwargs.values()) + [event_id]
-        cursor.execute(query, values)
-        self.connection.commit()
-        cursor.close()
-
-    def delete_event(self, event_id):
-        cursor = self.connection.cursor()
-        cursor.execute('DELETE FROM events WHERE id = %s', (event_id,))
-        self.connection.commit()
-        cursor.close()
-
-    def add_participant(self, event_id, user_id, role_name):
-        cursor = self.connection.cursor()
+        await self._run(self._write, query, values)
+        self.cache.update_event(event_id, **kwargs)
+        self.recent_events.invalidate_event(event_id)
+        self._changed('event', event_id)
+
+    async def delete_event(self, event_id):
+        await self._run(self._write, 'DELETE FROM events WHERE id = %s', (event_id,))
+        self.cache.invalidate(event_id)
+        self.recent_events.invalidate_event(event_id)
+        self._changed('event', event_id)
+
+    async def archive_events(self, before, batch_size=500, pause=0.05):
+        """Move events that started before `before` to the archive tables.
+
+        The start date alone decides: most events are never closed by hand,
+        so an event still open long after its start is archived as it is,
+        keeping status 'open' in events_archive. Participants move with
+        their event. Each batch of at most batch_size events is one short
+        transaction, with a pause between batches so signups are never kept
+        waiting behind a long move. Returns the number of events archived.
+        """
+        moved = 0
+        while True:
+            event_ids = await self._run(self._archive_batch, before, batch_size)
+            for event_id in event_ids:
+                self.cache.invalidate(event_id)
+                self.recent_events.invalidate_event(event_id)
+                self._changed('event', event_id)
+            moved += len(event_ids)
+            if len(event_ids) < batch_size:
+                return moved
+            await asyncio.sleep(pause)
+
+    def _archive_batch(self, connection, before, batch_size):
+        connection.start_transaction()
+        cursor = connection.cursor()
+        try:
+            cursor.execute(
+                f"SELECT id FROM events WHERE start_date < %s ORDER BY id LIMIT %s{self.backend.lock_clause}",
+                (before, batch_size)
+            )
+            event_ids = [row[0] for row in cursor.fetchall()]
+            if event_ids:
+                placeholders = ', '.join(['%s'] * len(event_ids))
+                cursor.execute(
+                    f"INSERT INTO events_archive ({ARCHIVE_EVENT_COLUMNS}) "
+                    f"SELECT {ARCHIVE_EVENT_COLUMNS} FROM events WHERE id IN ({placeholders})",
+                    event_ids
+                )
+                cursor.execute(
+                    f"INSERT INTO participants_archive ({ARCHIVE_PARTICIPANT_COLUMNS}) "
+                    f"SELECT {ARCHIVE_PARTICIPANT_COLUMNS} FROM participants WHERE event_id IN ({placeholders})",
+                    event_ids
+                )
+                # Cascades to participants, event_messages and scheduled_actions
+                cursor.execute(f"DELETE FROM events WHERE id IN ({placeholders})", event_ids)
+            connection.commit()
+            return event_ids
+        finally:
+            cursor.close()
+
+    async def get_event_history(self, event_id):
+        """Return (event, participants) of a live or archived event; event['archived'] says which"""
+        event, participants = await self.get_roster(event_id)
+        if event:
+            return {**event, 'archived': False}, participants
+        event = await self._run(self._fetch_one, 'SELECT * FROM events_archive WHERE id = %s', (event_id,))
+        if not event:
+            return None, []
+        participants = await self._run(
+            self._fetch_all, 'SELECT * FROM participants_archive WHERE event_id = %s ORDER BY id', (event_id,)
+        )
+        return {**event, 'archived': True}, participants
+
+    async def get_guild_history(self, guild_id, limit=25):
+        """Return a guild's most recent events, live and archived, newest first"""
+        return await self._run(self._fetch_all, '''
+            SELECT id, name, start_date, status, 0 AS archived FROM events WHERE guild_id = %s
+            UNION ALL
+            SELECT id, name, start_date, status, 1 AS archived FROM events_archive WHERE guild_id = %s
+            ORDER BY start_date DESC
+            LIMIT %s
+        ''', (guild_id, guild_id, limit))
+
+    @staticmethod
+    def search_words(text):
+        """The words of a search query as list_events expects them; punctuation is dropped"""
+        return _SEARCH_WORD.findall(text or '')
+
+    async def list_events(self, guild_id, status=None, words=None, after=None, limit=10):
+        """One page of a guild's events, ordered by (start_date, id).
+
+        after is the (start_date, id) of the last event on the previous
+        page. Pages seek past it on the (guild_id, status, start_date, id)
+        index rather than skipping rows with OFFSET, so the hundredth page
+        costs what the first one does. words (see search_words) keeps only
+        events whose name or description contain every word as a prefix,
+        using the full-text index. Returns (events, whether more follow).
+        """
+        conditions, params = ['e.guild_id = %s'], [guild_id]
+        if status:
+            conditions.append('e.status = %s')
+            params.append(status)
+        if words:
+            condition, term = self.backend.match_words(words)
+            conditions.append(condition)
+            params.append(term)
+        if after:
+            conditions.append('e.start_date >= %s AND (e.start_date > %s OR e.id > %s)')
+            params.extend((after[0], after[0], after[1]))
+        rows = await self._run(self._fetch_all, f"""
+            SELECT e.id, e.name, e.start_date, e.status FROM events e
+            WHERE {' AND '.join(conditions)}
+            ORDER BY e.start_date, e.id
+            LIMIT %s
+        """, params + [limit + 1])
+        return rows[:limit], len(rows) > limit
+
+    async def get_recent_events(self, guild_id):
+        """The guild's newest events (id, name, start_date, status), served from memory when possible"""
+        events = self.recent_events.get(guild_id)
+        if events is None:
+            events = await self._run(
+                self._fetch_all,
+                'SELECT id, name, start_date, status FROM events WHERE guild_id = %s ORDER BY id DESC LIMIT %s',
+                (guild_id, self.recent_events.size)
+            )
+            self.recent_events.put(guild_id, events)
+        return events
+
+    async def export_guild(self, guild_id, events, participants, batch_size=1000):
+        """Stream a guild's events and participants into two writers; returns (events, participants) written.
+
+        Each writer gets one dict per row via write(row). Rows are read
+        through the backend's streaming cursor batch_size at a time, so
+        memory use does not grow with the size of the guild.
+        """
+        return await self._run(self._export_guild, guild_id, events, participants, batch_size, bulk=True)
+
+    def _export_guild(self, connection, guild_id, events, participants, batch_size):
+        exports = (
+            (events, f"SELECT {', '.join(EXPORT_EVENT_COLUMNS)} FROM events WHERE guild_id = %s ORDER BY id"),
+            (participants, f'''
+                SELECT {', '.join('p.' + column for column in EXPORT_PARTICIPANT_COLUMNS)}
+                FROM participants p JOIN events e ON e.id = p.event_id
+                WHERE e.guild_id = %s
+            ''')
+        )
+        counts = []
+        for writer, query in exports:
+            cursor = self.backend.streaming_cursor(connection)
+            count = 0
+            try:
+                cursor.execute(query, (guild_id,))
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        writer.write(row)
+                    count += len(rows)
+            finally:
+                cursor.close()
+            counts.append(count)
+        return tuple(counts)
+
+    async def import_guild(self, guild_id, events, participants, batch_size=1000):
+        """Insert exported rows into a guild, batch_size rows per transaction.
+
+        events yields (exported id, (creator_id, name, description,
+        start_date, status, template_name, template_version, created_at))
+        and participants yields (exported event id, user_id, role_name,
+        signup_date); both are consumed once, on the database thread.
+        Events get new ids and their participants follow them. Returns
+        (events imported, participants imported, participants skipped
+        because their event was not imported).
+        """
+        try:
+            return await self._run(self._import_guild, guild_id, events, participants, batch_size, bulk=True)
+        finally:
+            # Batches committed before a failure are in the guild too
+            self.recent_events.invalidate_guild(guild_id)
+
+    def _import_guild(self, connection, guild_id, events, participants, batch_size):
+        event_ids = {}
+        imported = orphaned = 0
+        insert_participants = self.backend.insert_ignore(
+            'participants', ['event_id', 'user_id', 'role_name', 'signup_date']
+        )
+        cursor = connection.cursor()
+        try:
+            for batch in _batches(events, batch_size):
+                connection.start_transaction()
+                ids = []
+                for exported_id, values in batch:
+                    # One statement per event: each new id is needed for the event's participants
+                    cursor.execute('''
+                        INSERT INTO events (guild_id, creator_id, name, description, start_date, status,
+                                            template_name, template_version, created_at)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    ''', (guild_id,) + tuple(values))
+                    ids.append((exported_id, cursor.lastrowid))
+                connection.commit()
+                event_ids.update(ids)
+            for batch in _batches(participants, batch_size):
+                rows = [
+                    (event_ids[event_id], user_id, role_name, signup_date)
+                    for event_id, user_id, role_name, signup_date in batch if event_id in event_ids
+                ]
+                orphaned += len(batch) - len(rows)
+                if not rows:
+                    continue
+                connection.start_transaction()
+                # A user signed up twice for one event keeps the first signup
+                cursor.executemany(insert_participants, rows)
+                imported += cursor.rowcount
+                connection.commit()
+        finally:
+            cursor.close()
+        return len(event_ids), imported, orphaned
+
+    async def add_participant(self, event_id, user_id, role_name):
         query = '''
             INSERT INTO participants (event_id, user_id, role_name)
             VALUES (%s, %s, %s)
         '''
-        cursor.execute(query, (event_id, user_id, role_name))
-        self.connection.commit()
-        cursor.close()
-
-    def remove_participant(self, event_id, user_id):
-        cursor = self.connection.cursor()
-        cursor.execute('DELETE FROM participants WHERE event_id = %s AND user_id = %s', (event_id, user_id))
-        self.connection.commit()
-        cursor.close()
-
-    def get_participants(self, event_id):
-        cursor = self.connection.cursor(dictionary=True)
-        cursor.execute('SELECT * FROM participants WHERE event_id = %s', (event_id,))
+        await self._run(self._write_roster, event_id, query, (event_id, user_id, role_name))
+        self.cache.invalidate(event_id, participants_only=True)
+        self._changed('event', event_id)
+
+    async def remove_participant(self, event_id, user_id):
+        await self._run(
+            self._write_roster, event_id, 'DELETE FROM participants WHERE event_id = %s AND user_id = %s', (event_id, user_id)
+        )
+        self.cache.invalidate(event_id, participants_only=True)
+        self._changed('event', event_id)
+
+    @staticmethod
+    def _write_roster(connection, event_id, query, params):
+        """Run one roster write outside the signup transactions, bumping the event's revision with it"""
+        connection.start_transaction()
+        cursor = connection.cursor()
+        try:
+            cursor.execute(query, params)
+            cursor.execute('UPDATE events SET revision = revision + 1 WHERE id = %s', (event_id,))
+            connection.commit()
+        finally:
+            cursor.close()
+
+    async def signup_participant(self, event_id, user_id, role_name, role_limit=None):
+        """Sign a user up in one transaction and return the updated (event, participants).
+
+        role_limit(event) resolves the capacity of role_name for the locked
+        event row (None for unlimited) and may raise ValueError for an
+        invalid role. Rejections are raised as ValueError; the common ones
+        (closed, duplicate, full) are answered from the cache without a query.
+        A full role raises RoleFullError.
+        """
+        self._check_cached_signup(event_id, user_id, role_name, role_limit, False)
+        event, participants, _ = await self._cache_roster(
+            event_id, self._signup, event_id, user_id, role_name, role_limit, False
+        )
+        return event, participants
+
+    async def signup_or_waitlist(self, event_id, user_id, role_name, role_limit=None):
+        """Like signup_participant, but a full role puts the user on its waitlist.
+
+        Returns (event, participants, position): position is None when the
+        user was signed up, else their 1-based place in the role's waitlist.
+        Joining a waitlist replaces any other waitlist entry the user has for
+        the event, and a signup removes it.
+        """
+        self._check_cached_signup(event_id, user_id, role_name, role_limit, True)
+        return await self._cache_roster(event_id, self._signup, event_id, user_id, role_name, role_limit, True)
+
+    async def cancel_participant(self, event_id, user_id, capacities=None):
+        """Remove a signup and promote from the waitlist in one transaction.
+
+        capacities(event) returns {role_name: limit} for the locked event
+        row, or None when no role is limited. Every slot of the cancelled
+        role that is free afterwards goes to the first users waiting for it.
+        Returns (event, participants, promoted), promoted being the new
+        participant rows. Raises NotSignedUpError when the user has no signup.
+        """
+        event, participants = self.cache.peek(event_id)
+        if participants is not None and not any(p['user_id'] == user_id for p in participants):
+            raise NotSignedUpError("You are not signed up for this event.")
+        return await self._cache_roster(event_id, self._cancel, event_id, user_id, capacities)
+
+    async def leave_waitlist(self, event_id, user_id):
+        """Take the user off the event's waitlist; raises NotSignedUpError when they are not on it"""
+        waitlist = self.cache.peek_waitlist(event_id)
+        if waitlist is not None and not any(w['user_id'] == user_id for w in waitlist):
+            raise NotSignedUpError("You are not signed up for this event.")
+        event, participants, _ = await self._cache_roster(event_id, self._leave_waitlist, event_id, user_id)
+        return event, participants
+
+    async def get_roster(self, event_id):
+        """Return (event, participants), reading only what the cache is missing"""
+        event = await self.get_event(event_id)
+        if not event:
+            return None, []
+        return event, await self.get_participants(event_id)
+
+    async def _cache_roster(self, event_id, transaction, *args):
+        """Run a roster transaction returning (event, participants, waitlist, result) and cache its state.
+
+        The transaction gets the cached snapshot of the event, if any, for
+        _lock_event to verify instead of reading the roster again. Roster
+        transactions of one event queue here, in this process, so each one
+        starts from the snapshot its predecessor cached; concurrent clicks
+        would otherwise all carry the same snapshot, and all but the first
+        would find it outdated.
+        """
+        lock = self._roster_locks.setdefault(event_id, [asyncio.Lock(), 0])
+        lock[1] += 1
+        try:
+            async with lock[0]:
+                snapshot = self.cache.peek_roster(event_id)
+                try:
+                    event, participants, waitlist, result = await self._run(transaction, snapshot, *args)
+                except ValueError:
+                    # The database disagreed with the cache (or the event is gone)
+                    self.cache.invalidate(event_id)
+                    raise
+                except DatabaseTimeoutError as e:
+                    # The roster is unknown until it is read again; peers must forget a write that may have landed
+                    self.cache.invalidate(event_id)
+                    if e.maybe_committed:
+                        self._changed('event', event_id)
+                    raise
+                self.cache.put(
+                    event_id, event=event, participants=participants, waitlist=waitlist, revision=event['revision']
+                )
+        finally:
+            lock[1] -= 1
+            if not lock[1]:
+                del self._roster_locks[event_id]
+        self._changed('event', event_id)
+        return event, participants, result
+
+    def _check_cached_signup(self, event_id, user_id, role_name, role_limit, use_waitlist):
+        event, participants = self.cache.peek(event_id)
+        if event is None or participants is None:
+            return
+        waitlist = self.cache.peek_waitlist(event_id)
+        self._check_signup(event, participants, waitlist, user_id, role_name, role_limit, use_waitlist)
+
+    @staticmethod
+    def _waitlist_position(waitlist, user_id, role_name):
+        queue = [w['user_id'] for w in waitlist if w['role_name'] == role_name]
+        return queue.index(user_id) + 1 if user_id in queue else None
+
+    @classmethod
+    def _check_signup(cls, event, participants, waitlist, user_id, role_name, role_limit, use_waitlist):
+        """Raise the rejection for this signup, if any; returns True when the role is full.
+
+        waitlist may be None when it is not known (cached rosters only).
+        """
+        if event['status'] != 'open':
+            raise ValueError("Event is not open for registration")
+        if any(p['user_id'] == user_id for p in participants):
+            raise ValueError("You are already signed up for this event. Cancel your current signup first.")
+        if waitlist is not None:
+            position = cls._waitlist_position(waitlist, user_id, role_name)
+            if position is not None:
+                raise ValueError(f"You are already #{position} on the {role_name} waitlist.")
+        limit = role_limit(event) if role_limit else None
+        full = limit is not None and sum(1 for p in participants if p['role_name'] == role_name) >= limit
+        if full and not use_waitlist:
+            raise RoleFullError(f"Role {role_name} is full")
+        return full
+
+    def _lock_event(self, cursor, event_id, snapshot):
+        """Lock the event row and return its (event, participants, waitlist), bumping its revision.
+
+        Locking the event row serializes every roster change of that event.
+        Every such change, and every update_event, bumps events.revision, so
+        when the cached snapshot's revision is still the row's, the cache
+        is exactly what the database holds: the conditional UPDATE takes the
+        lock and proves it in one statement, and the click reads nothing.
+        Otherwise the row is locked and the roster read as before.
+        """
+        if snapshot is not None:
+            event, participants, waitlist, revision = snapshot
+            cursor.execute(
+                'UPDATE events SET revision = revision + 1 WHERE id = %s AND revision = %s', (event_id, revision)
+            )
+            if cursor.rowcount == 1:
+                return {**event, 'revision': revision + 1}, participants, waitlist
+        cursor.execute(f'SELECT * FROM events WHERE id = %s{self.backend.lock_clause}', (event_id,))
+        event = cursor.fetchone()
+        if not event:
+            raise ValueError("Event not found")
+        cursor.execute('SELECT * FROM participants WHERE event_id = %s ORDER BY id', (event_id,))
         participants = cursor.fetchall()
-        cursor.close()
+        cursor.execute('SELECT * FROM waitlist WHERE event_id = %s ORDER BY id', (event_id,))
+        waitlist = cursor.fetchall()
+        cursor.execute('UPDATE events SET revision = revision + 1 WHERE id = %s', (event_id,))
+        event['revision'] += 1
+        return event, participants, waitlist
+
+    def _insert_participant(self, cursor, event_id, user_id, role_name):
+        cursor.execute(
+            'INSERT INTO participants (event_id, user_id, role_name) VALUES (%s, %s, %s)',
+            (event_id, user_id, role_name)
+        )
+        return {
+            'id': cursor.lastrowid,
+            'event_id': event_id,
+            'user_id': user_id,
+            'role_name': role_name,
+            'signup_date': datetime.now()
+        }
+
+    def _signup(self, connection, snapshot, event_id, user_id, role_name, role_limit, use_waitlist):
+        connection.start_transaction()
+        cursor = connection.cursor(dictionary=True)
+        try:
+            event, participants, waitlist = self._lock_event(cursor, event_id, snapshot)
+            full = self._check_signup(event, participants, waitlist, user_id, role_name, role_limit, use_waitlist)
+            if any(w['user_id'] == user_id for w in waitlist):
+                # Waiting for another role: a signup or a new place in line replaces it
+                cursor.execute('DELETE FROM waitlist WHERE event_id = %s AND user_id = %s', (event_id, user_id))
+                waitlist = [w for w in waitlist if w['user_id'] != user_id]
+            position = None
+            if full:
+                cursor.execute(
+                    'INSERT INTO waitlist (event_id, user_id, role_name) VALUES (%s, %s, %s)',
+                    (event_id, user_id, role_name)
+                )
+                waitlist.append({
+                    'id': cursor.lastrowid,
+                    'event_id': event_id,
+                    'user_id': user_id,
+                    'role_name': role_name,
+                    'joined_at': datetime.now()
+                })
+                position = self._waitlist_position(waitlist, user_id, role_name)
+            else:
+                try:
+                    participants.append(self._insert_participant(cursor, event_id, user_id, role_name))
+                except self.backend.integrity_errors:
+                    raise ValueError("You are already signed up for this event. Cancel your current signup first.")
+            connection.commit()
+            return event, participants, waitlist, position
+        finally:
+            cursor.close()
+
+    def _cancel(self, connection, snapshot, event_id, user_id, capacities):
+        connection.start_transaction()
+        cursor = connection.cursor(dictionary=True)
+        try:
+            event, participants, waitlist = self._lock_event(cursor, event_id, snapshot)
+            cancelled = next((p for p in participants if p['user_id'] == user_id), None)
+            if cancelled is None:
+                raise NotSignedUpError("You are not signed up for this event.")
+            cursor.execute('DELETE FROM participants WHERE event_id = %s AND user_id = %s', (event_id, user_id))
+            remaining = [p for p in participants if p['user_id'] != user_id]
+            promoted = self._promote(cursor, event, remaining, waitlist, cancelled['role_name'], capacities)
+            connection.commit()
+            promoted_ids = {p['user_id'] for p in promoted}
+            return event, remaining, [w for w in waitlist if w['user_id'] not in promoted_ids], promoted
+        finally:
+            cursor.close()
+
+    def _promote(self, cursor, event, participants, waitlist, role_name, capacities):
+        """Move the first waiting users of role_name into its free slots; appends to participants"""
+        if event['status'] != 'open':
+            return []
+        limits = capacities(event) if capacities else None
+        limit = limits.get(role_name) if limits else None
+        taken = sum(1 for p in participants if p['role_name'] == role_name)
+        queue = [w for w in waitlist if w['role_name'] == role_name]
+        if limit is not None:
+            queue = queue[:max(0, limit - taken)]
+        promoted = []
+        for entry in queue:
+            cursor.execute('DELETE FROM waitlist WHERE id = %s', (entry['id'],))
+            participant = self._insert_participant(cursor, event['id'], entry['user_id'], role_name)
+            participants.append(participant)
+            promoted.append(participant)
+        return promoted
+
+    def _leave_waitlist(self, connection, snapshot, event_id, user_id):
+        connection.start_transaction()
+        cursor = connection.cursor(dictionary=True)
+        try:
+            event, participants, waitlist = self._lock_event(cursor, event_id, snapshot)
+            if not any(w['user_id'] == user_id for w in waitlist):
+                raise NotSignedUpError("You are not signed up for this event.")
+            cursor.execute('DELETE FROM waitlist WHERE event_id = %s AND user_id = %s', (event_id, user_id))
+            connection.commit()
+            return event, participants, [w for w in waitlist if w['user_id'] != user_id], None
+        finally:
+            cursor.close()
+
+    async def get_participants(self, event_id):
+        participants = self.cache.get_participants(event_id)
+        if participants is None:
+            generation = self.cache.start_read(event_id)
+            try:
+                participants = await self._run(self._fetch_all, 'SELECT * FROM participants WHERE event_id = %s ORDER BY id', (event_id,))
+            finally:
+                unchanged = self.cache.finish_read(event_id, generation)
+            # A signup committed during the read already cached a newer roster
+            if unchanged:
+                self.cache.put(event_id, participants=participants)
         return participants
 
-    def update_guild_settings(self, guild_id, listening_channel):
-        cursor = self.connection.cursor()
-        query = '''
-            INSERT INTO guild_settings (guild_id, listening_channel)
-            VALUES (%s, %s)
-            ON DUPLICATE KEY UPDATE listening_channel = VALUES(listening_channel)
-        '''
-        cursor.execute(query, (guild_id, listening_channel))
-        self.connection.commit()
-        cursor.close()
+    async def update_guild_settings(self, guild_id, listening_channel):
+        query = self.backend.upsert('guild_settings', ['guild_id', 'listening_channel'], ['guild_id'])
+        await self._run(self._write, query, (guild_id, listening_channel))
+        self._changed('guild', guild_id)
+
+    async def store_template_revisions(self, templates):
+        """Persist template revisions so events pinned to them survive template edits"""
+        rows = [(t.name, t.version, json.dumps(t.data)) for t in templates]
+        if rows:
+            query = self.backend.insert_ignore('template_revisions', ['template_name', 'version', 'body'])
+            await self._run(self._write_many, query, rows)
+
+    async def get_pinned_template_revisions(self):
+        """Return the stored revisions that open events are pinned to"""
+        rows = await self._run(self._fetch_all, '''
+            SELECT DISTINCT r.template_name, r.version, r.body
+            FROM template_revisions r
+            JOIN events e ON e.template_name = r.template_name AND e.template_version = r.version
+            WHERE e.status = 'open'
+        ''')
+        for row in rows:
+            row['body'] = json.loads(row['body'])
+        return rows
+
+    async def update_guild_language(self, guild_id, language):
+        query = self.backend.upsert('guild_settings', ['guild_id', 'language'], ['guild_id'])
+        await self._run(self._write, query, (guild_id, language))
+        self._changed('guild', guild_id)
+
+    async def get_all_guild_settings(self):
+        return await self._run(self._fetch_all, 'SELECT * FROM guild_settings')
+
+    async def get_guild_settings(self, guild_id):
+        return await self._run(self._fetch_one, 'SELECT * FROM guild_settings WHERE guild_id = %s', (guild_id,))
 
-    def get_guild_settings(self, guild_id):
-        cursor = self.connection.cursor(dictionary=True)
-        cursor.execute('SELECT * FROM guild_settings WHERE guild_id = %s', (guild_id,))
-        settings = cursor.fetchone()
-        cursor.close()
-        return settings
+    def close(self):
+        """Release the worker threads and every pooled connection"""
+        self._executor.shutdown(wait=True)
+        self.backend.close()
+        self.cache = EventCache(self.config.get('cache_size', 1000))
+        self.recent_events = RecentEvents(ttl=self.config.get('recent_events_ttl', 60))
 
     def __del__(self):
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
+        if self.backend.connected:
+            self.backend.close()
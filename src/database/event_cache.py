@@ -0,0 +1,219 @@
+from collections import OrderedDict
+import time
+
+class EventCache:
+    """Bounded in-process cache of event rows, rosters and waitlists keyed by event id.
+
+    Entries are kept in least-recently-used order. When the cache is full,
+    the least recently used event that is no longer open is evicted first,
+    so active signups stay resident.
+
+    A roster transaction stores the event row, roster and waitlist together
+    with the event's revision (see DatabaseManager._lock_event); any other
+    store or invalidation of the roster forgets that revision, so
+    peek_roster only offers snapshots a transaction can verify.
+
+    A read that fills a miss from the database brackets itself with
+    start_read/finish_read. Every store or invalidation of the event in
+    between bumps its generation, and finish_read then reports that the
+    read result is older than what the cache learned meanwhile.
+    """
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        # event id -> [reads in flight, generation]; only events being read have one
+        self._reads = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, event_id, field):
+        entry = self._entries.get(event_id)
+        if entry is None or entry[field] is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(event_id)
+        self.hits += 1
+        return entry[field]
+
+    def get_event(self, event_id):
+        return self._lookup(event_id, 'event')
+
+    def get_participants(self, event_id):
+        return self._lookup(event_id, 'participants')
+
+    def peek(self, event_id):
+        """Return (event, participants) without touching counters or LRU order"""
+        entry = self._entries.get(event_id)
+        if entry is None:
+            return None, None
+        return entry['event'], entry['participants']
+
+    def peek_waitlist(self, event_id):
+        """Return the cached waitlist, or None when it is not known"""
+        entry = self._entries.get(event_id)
+        return entry['waitlist'] if entry is not None else None
+
+    def peek_roster(self, event_id):
+        """Return copies of (event, participants, waitlist, revision) stored by a roster transaction, or None"""
+        entry = self._entries.get(event_id)
+        if entry is None or entry['revision'] is None:
+            return None
+        return dict(entry['event']), list(entry['participants']), list(entry['waitlist']), entry['revision']
+
+    def start_read(self, event_id):
+        """Note a database read for event_id; returns the generation to hand to finish_read"""
+        reads = self._reads.setdefault(event_id, [0, 0])
+        reads[0] += 1
+        return reads[1]
+
+    def finish_read(self, event_id, generation):
+        """End a read; False when the event was stored or invalidated while it was in flight"""
+        reads = self._reads[event_id]
+        reads[0] -= 1
+        if not reads[0]:
+            del self._reads[event_id]
+        return reads[1] == generation
+
+    def _changed(self, event_id):
+        reads = self._reads.get(event_id)
+        if reads is not None:
+            reads[1] += 1
+
+    def put(self, event_id, event=None, participants=None, waitlist=None, revision=None):
+        """Store the event row, roster and/or waitlist, keeping whatever is not given.
+
+        revision marks all three as one snapshot of that event revision;
+        a roster or waitlist stored without it is not a verifiable snapshot.
+        """
+        self._changed(event_id)
+        entry = self._entries.get(event_id)
+        if entry is None:
+            entry = {'event': None, 'participants': None, 'waitlist': None, 'revision': None}
+            self._entries[event_id] = entry
+        if participants is not None or waitlist is not None:
+            entry['revision'] = revision
+        if event is not None:
+            entry['event'] = event
+        if participants is not None:
+            entry['participants'] = list(participants)
+        if waitlist is not None:
+            entry['waitlist'] = list(waitlist)
+        self._entries.move_to_end(event_id)
+        while len(self._entries) > self.max_size:
+            self._evict()
+
+    def update_event(self, event_id, **fields):
+        """Patch a cached event row in place after a write"""
+        self._changed(event_id)
+        entry = self._entries.get(event_id)
+        if entry is not None and entry['event'] is not None:
+            entry['event'] = {**entry['event'], **fields}
+            # The write may have bumped the revision in the database
+            entry['revision'] = None
+
+    def invalidate(self, event_id, participants_only=False):
+        self._changed(event_id)
+        if participants_only:
+            entry = self._entries.get(event_id)
+            if entry is not None:
+                entry['participants'] = None
+                entry['waitlist'] = None
+                entry['revision'] = None
+            return
+        self._entries.pop(event_id, None)
+
+    def clear(self):
+        for reads in self._reads.values():
+            reads[1] += 1
+        self._entries.clear()
+
+    def _evict(self):
+        victim = None
+        for event_id, entry in self._entries.items():
+            if entry['event'] is None or entry['event']['status'] != 'open':
+                victim = event_id
+                break
+        if victim is None:
+            victim = next(iter(self._entries))
+        del self._entries[victim]
+        self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': self.hits / lookups if lookups else 0.0
+        }
+
+class RecentEvents:
+    """The newest events of each guild, kept for event_id autocomplete.
+
+    A guild's list is loaded on its first lookup and served from memory
+    until it is `ttl` seconds old or this process writes one of its events,
+    so autocomplete keystrokes query the database at most once per guild
+    per ttl. Writes made by other processes show up when the list expires.
+    """
+
+    def __init__(self, size=100, ttl=60.0, max_guilds=1000):
+        self.size = size
+        self.ttl = ttl
+        self.max_guilds = max_guilds
+        self._guilds = OrderedDict()
+        self._guild_of = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._guilds)
+
+    def get(self, guild_id):
+        """The cached list of a guild, newest first, or None when it must be loaded"""
+        entry = self._guilds.get(guild_id)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            self.misses += 1
+            return None
+        self._guilds.move_to_end(guild_id)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, guild_id, events):
+        self.invalidate_guild(guild_id)
+        self._guilds[guild_id] = (time.monotonic(), list(events))
+        for event in events:
+            self._guild_of[event['id']] = guild_id
+        while len(self._guilds) > self.max_guilds:
+            self.invalidate_guild(next(iter(self._guilds)))
+
+    def invalidate_guild(self, guild_id):
+        entry = self._guilds.pop(guild_id, None)
+        if entry is not None:
+            for event in entry[1]:
+                self._guild_of.pop(event['id'], None)
+
+    def invalidate_event(self, event_id):
+        """Drop the list that shows this event, after it was renamed, closed or deleted"""
+        guild_id = self._guild_of.get(event_id)
+        if guild_id is not None:
+            self.invalidate_guild(guild_id)
+
+    def clear(self):
+        self._guilds.clear()
+        self._guild_of.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'guilds': len(self._guilds),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,496 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class Migration:
+    """One ordered schema change, written once per SQL dialect.
+
+    mysql(cursor) and sqlite(cursor) must each be safe to run twice; both
+    dialects share version numbers so schema_version means the same thing.
+    """
+
+    def __init__(self, version, description, mysql, sqlite):
+        self.version = version
+        self.description = description
+        self.mysql = mysql
+        self.sqlite = sqlite
+
+    def apply(self, cursor, dialect):
+        getattr(self, dialect)(cursor)
+
+def _index_exists(cursor, table, index_name):
+    cursor.execute('''
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        LIMIT 1
+    ''', (table, index_name))
+    return cursor.fetchone() is not None
+
+def _column_exists(cursor, table, column):
+    cursor.execute('''
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        LIMIT 1
+    ''', (table, column))
+    return cursor.fetchone() is not None
+
+def _add_index(cursor, table, index_name, columns, unique=False):
+    if _index_exists(cursor, table, index_name):
+        return
+    kind = 'UNIQUE INDEX' if unique else 'INDEX'
+    cursor.execute(f"ALTER TABLE {table} ADD {kind} {index_name} ({', '.join(columns)})")
+
+def _create_base_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS events (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            guild_id BIGINT NOT NULL,
+            creator_id BIGINT NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            description TEXT,
+            start_date DATETIME NOT NULL,
+            status VARCHAR(20) DEFAULT 'open',
+            template_name VARCHAR(50),
+            message_id BIGINT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS participants (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            event_id INT NOT NULL,
+            user_id BIGINT NOT NULL,
+            role_name VARCHAR(60) NOT NULL,
+            signup_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (event_id) REFERENCES events(id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS guild_settings (
+            guild_id BIGINT PRIMARY KEY,
+            listening_channel BIGINT
+        )
+    ''')
+
+def _unique_participant_per_event(cursor):
+    # Older schemas allowed double signups; keep the earliest row of each pair
+    cursor.execute('''
+        DELETE newer FROM participants newer
+        JOIN participants older
+            ON newer.event_id = older.event_id
+            AND newer.user_id = older.user_id
+            AND newer.id > older.id
+    ''')
+    _add_index(cursor, 'participants', 'uq_participants_event_user', ['event_id', 'user_id'], unique=True)
+
+def _event_access_indexes(cursor):
+    _add_index(cursor, 'participants', 'idx_participants_event_role', ['event_id', 'role_name'])
+    _add_index(cursor, 'events', 'idx_events_guild_status_start', ['guild_id', 'status', 'start_date'])
+    _add_index(cursor, 'events', 'idx_events_status_start', ['status', 'start_date'])
+
+def _event_message_index(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS event_messages (
+            event_id INT PRIMARY KEY,
+            guild_id BIGINT NOT NULL,
+            channel_id BIGINT NOT NULL,
+            message_id BIGINT NOT NULL,
+            thread_id BIGINT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE KEY uq_event_messages_message (message_id),
+            KEY idx_event_messages_guild (guild_id),
+            FOREIGN KEY (event_id) REFERENCES events(id) ON DELETE CASCADE
+        )
+    ''')
+
+def _template_revisions(cursor):
+    if not _column_exists(cursor, 'events', 'template_version'):
+        cursor.execute('ALTER TABLE events ADD COLUMN template_version VARCHAR(40) AFTER template_name')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS template_revisions (
+            template_name VARCHAR(50) NOT NULL,
+            version VARCHAR(40) NOT NULL,
+            body JSON NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (template_name, version)
+        )
+    ''')
+
+def _guild_language(cursor):
+    if not _column_exists(cursor, 'guild_settings', 'language'):
+        cursor.execute('ALTER TABLE guild_settings ADD COLUMN language VARCHAR(10)')
+
+def _scheduled_actions(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scheduled_actions (
+            event_id INT NOT NULL,
+            action VARCHAR(20) NOT NULL,
+            fired_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (event_id, action),
+            FOREIGN KEY (event_id) REFERENCES events(id) ON DELETE CASCADE
+        )
+    ''')
+
+def _event_archive(cursor):
+    # Same columns as the hot tables, without auto-increment: rows keep their ids
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS events_archive (
+            id INT PRIMARY KEY,
+            guild_id BIGINT NOT NULL,
+            creator_id BIGINT NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            description TEXT,
+            start_date DATETIME NOT NULL,
+            status VARCHAR(20),
+            template_name VARCHAR(50),
+            template_version VARCHAR(40),
+            message_id BIGINT,
+            created_at TIMESTAMP NULL,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            KEY idx_events_archive_guild_start (guild_id, start_date)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS participants_archive (
+            id INT PRIMARY KEY,
+            event_id INT NOT NULL,
+            user_id BIGINT NOT NULL,
+            role_name VARCHAR(60) NOT NULL,
+            signup_date TIMESTAMP NULL,
+            KEY idx_participants_archive_event (event_id),
+            KEY idx_participants_archive_user (user_id),
+            FOREIGN KEY (event_id) REFERENCES events_archive(id) ON DELETE CASCADE
+        )
+    ''')
+
+def _waitlist(cursor):
+    # The auto-increment id is the FIFO order within each (event, role)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS waitlist (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            event_id INT NOT NULL,
+            user_id BIGINT NOT NULL,
+            role_name VARCHAR(60) NOT NULL,
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE KEY uq_waitlist_event_user (event_id, user_id),
+            KEY idx_waitlist_event_role (event_id, role_name, id),
+            FOREIGN KEY (event_id) REFERENCES events(id) ON DELETE CASCADE
+        )
+    ''')
+
+def _event_series(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS event_series (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            guild_id BIGINT NOT NULL,
+            creator_id BIGINT NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            description TEXT,
+            template_name VARCHAR(50),
+            rule VARCHAR(500) NOT NULL,
+            dtstart DATETIME NOT NULL,
+            generated_until DATETIME,
+            status VARCHAR(20) DEFAULT 'active',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            KEY idx_event_series_status_generated (status, generated_until)
+        )
+    ''')
+    for table in ('events', 'events_archive'):
+        if not _column_exists(cursor, table, 'series_id'):
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN series_id INT')
+    # One event per occurrence, so regenerating a window inserts nothing twice
+    _add_index(cursor, 'events', 'uq_events_series_start', ['series_id', 'start_date'], unique=True)
+
+def _event_search(cursor):
+    # InnoDB already appends the primary key to secondary indexes; naming id
+    # spells out the (start_date, id) order keyset pagination seeks on
+    _add_index(cursor, 'events', 'idx_events_guild_status_start_id', ['guild_id', 'status', 'start_date', 'id'])
+    if _index_exists(cursor, 'events', 'idx_events_guild_status_start'):
+        cursor.execute('ALTER TABLE events DROP INDEX idx_events_guild_status_start')
+    if not _index_exists(cursor, 'events', 'ft_events_name_description'):
+        cursor.execute('ALTER TABLE events ADD FULLTEXT INDEX ft_events_name_description (name, description)')
+
+def _roster_revision(cursor):
+    # Bumped by every write that can change a signup's outcome; see DatabaseManager._lock_event
+    if not _column_exists(cursor, 'events', 'revision'):
+        cursor.execute('ALTER TABLE events ADD COLUMN revision INT NOT NULL DEFAULT 0')
+
+# SQLite spellings of the same migrations
+
+def _sqlite_column_exists(cursor, table, column):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return any(row[1] == column for row in cursor.fetchall())
+
+def _sqlite_create_base_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id BIGINT NOT NULL,
+            creator_id BIGINT NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            description TEXT,
+            start_date DATETIME NOT NULL,
+            status VARCHAR(20) DEFAULT 'open',
+            template_name VARCHAR(50),
+            message_id BIGINT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS participants (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_id INT NOT NULL REFERENCES events(id) ON DELETE CASCADE,
+            user_id BIGINT NOT NULL,
+            role_name VARCHAR(60) NOT NULL,
+            signup_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS guild_settings (
+            guild_id BIGINT PRIMARY KEY,
+            listening_channel BIGINT
+        )
+    ''')
+
+def _sqlite_unique_participant_per_event(cursor):
+    cursor.execute('''
+        DELETE FROM participants
+        WHERE id NOT IN (SELECT MIN(id) FROM participants GROUP BY event_id, user_id)
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS uq_participants_event_user ON participants (event_id, user_id)')
+
+def _sqlite_event_access_indexes(cursor):
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_participants_event_role ON participants (event_id, role_name)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_guild_status_start ON events (guild_id, status, start_date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_status_start ON events (status, start_date)')
+
+def _sqlite_event_message_index(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS event_messages (
+            event_id INT PRIMARY KEY REFERENCES events(id) ON DELETE CASCADE,
+            guild_id BIGINT NOT NULL,
+            channel_id BIGINT NOT NULL,
+            message_id BIGINT NOT NULL,
+            thread_id BIGINT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS uq_event_messages_message ON event_messages (message_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_event_messages_guild ON event_messages (guild_id)')
+
+def _sqlite_template_revisions(cursor):
+    if not _sqlite_column_exists(cursor, 'events', 'template_version'):
+        cursor.execute('ALTER TABLE events ADD COLUMN template_version VARCHAR(40)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS template_revisions (
+            template_name VARCHAR(50) NOT NULL,
+            version VARCHAR(40) NOT NULL,
+            body TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (template_name, version)
+        )
+    ''')
+
+def _sqlite_guild_language(cursor):
+    if not _sqlite_column_exists(cursor, 'guild_settings', 'language'):
+        cursor.execute('ALTER TABLE guild_settings ADD COLUMN language VARCHAR(10)')
+
+def _sqlite_scheduled_actions(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scheduled_actions (
+            event_id INT NOT NULL REFERENCES events(id) ON DELETE CASCADE,
+            action VARCHAR(20) NOT NULL,
+            fired_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (event_id, action)
+        )
+    ''')
+
+def _sqlite_event_archive(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS events_archive (
+            id INTEGER PRIMARY KEY,
+            guild_id BIGINT NOT NULL,
+            creator_id BIGINT NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            description TEXT,
+            start_date DATETIME NOT NULL,
+            status VARCHAR(20),
+            template_name VARCHAR(50),
+            template_version VARCHAR(40),
+            message_id BIGINT,
+            created_at TIMESTAMP,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS participants_archive (
+            id INTEGER PRIMARY KEY,
+            event_id INT NOT NULL REFERENCES events_archive(id) ON DELETE CASCADE,
+            user_id BIGINT NOT NULL,
+            role_name VARCHAR(60) NOT NULL,
+            signup_date TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_archive_guild_start ON events_archive (guild_id, start_date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_participants_archive_event ON participants_archive (event_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_participants_archive_user ON participants_archive (user_id)')
+
+def _sqlite_waitlist(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS waitlist (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_id INT NOT NULL REFERENCES events(id) ON DELETE CASCADE,
+            user_id BIGINT NOT NULL,
+            role_name VARCHAR(60) NOT NULL,
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS uq_waitlist_event_user ON waitlist (event_id, user_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_waitlist_event_role ON waitlist (event_id, role_name, id)')
+
+def _sqlite_event_series(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS event_series (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id BIGINT NOT NULL,
+            creator_id BIGINT NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            description TEXT,
+            template_name VARCHAR(50),
+            rule VARCHAR(500) NOT NULL,
+            dtstart DATETIME NOT NULL,
+            generated_until DATETIME,
+            status VARCHAR(20) DEFAULT 'active',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_event_series_status_generated ON event_series (status, generated_until)'
+    )
+    for table in ('events', 'events_archive'):
+        if not _sqlite_column_exists(cursor, table, 'series_id'):
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN series_id INT')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS uq_events_series_start ON events (series_id, start_date)')
+
+def _sqlite_event_search(cursor):
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_events_guild_status_start_id ON events (guild_id, status, start_date, id)'
+    )
+    cursor.execute('DROP INDEX IF EXISTS idx_events_guild_status_start')
+    # An external-content FTS5 table: it indexes events' text without storing a copy
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS events_fts
+        USING fts5(name, description, content='events', content_rowid='id')
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS events_fts_insert AFTER INSERT ON events BEGIN
+            INSERT INTO events_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS events_fts_delete AFTER DELETE ON events BEGIN
+            INSERT INTO events_fts (events_fts, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS events_fts_update AFTER UPDATE OF name, description ON events BEGIN
+            INSERT INTO events_fts (events_fts, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO events_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+        END
+    ''')
+    cursor.execute("INSERT INTO events_fts (events_fts) VALUES ('rebuild')")
+
+def _sqlite_roster_revision(cursor):
+    if not _sqlite_column_exists(cursor, 'events', 'revision'):
+        cursor.execute('ALTER TABLE events ADD COLUMN revision INT NOT NULL DEFAULT 0')
+
+MIGRATIONS = [
+    Migration(1, 'create base tables', _create_base_tables, _sqlite_create_base_tables),
+    Migration(2, 'unique signup per user and event', _unique_participant_per_event, _sqlite_unique_participant_per_event),
+    Migration(3, 'per-event and per-guild access indexes', _event_access_indexes, _sqlite_event_access_indexes),
+    Migration(4, 'event message index', _event_message_index, _sqlite_event_message_index),
+    Migration(5, 'pinned template revisions', _template_revisions, _sqlite_template_revisions),
+    Migration(6, 'per-guild language', _guild_language, _sqlite_guild_language),
+    Migration(7, 'fired reminders and auto-closes', _scheduled_actions, _sqlite_scheduled_actions),
+    Migration(8, 'archive tables for past events', _event_archive, _sqlite_event_archive),
+    Migration(9, 'per-role waitlist', _waitlist, _sqlite_waitlist),
+    Migration(10, 'recurring event series', _event_series, _sqlite_event_series),
+    Migration(11, 'event listing and full-text search indexes', _event_search, _sqlite_event_search),
+    Migration(12, 'event roster revision', _roster_revision, _sqlite_roster_revision),
+]
+
+# Seconds to wait for another process's migrations before giving up
+MIGRATION_LOCK_TIMEOUT = 60
+
+def _lock(connection, cursor, dialect):
+    # Serialize concurrent bot processes starting against the same database
+    if dialect == 'mysql':
+        cursor.execute("SELECT GET_LOCK('eventbot_migrations', %s)", (MIGRATION_LOCK_TIMEOUT,))
+        # 0 when another process held the lock for the whole timeout, NULL on an error
+        (locked,) = cursor.fetchone()
+        if locked != 1:
+            raise RuntimeError(
+                f"Could not take the migration lock within {MIGRATION_LOCK_TIMEOUT}s "
+                f"(GET_LOCK returned {locked}); another process may be migrating"
+            )
+    else:
+        connection.start_transaction()
+
+def _unlock(connection, cursor, dialect):
+    if dialect == 'mysql':
+        cursor.execute("SELECT RELEASE_LOCK('eventbot_migrations')")
+        cursor.fetchone()
+    else:
+        connection.commit()
+
+def run_migrations(connection, dialect='mysql', migrations=MIGRATIONS):
+    """Apply every migration newer than the recorded schema version, in order.
+
+    MySQL commits after each migration under a named lock, and raises
+    RuntimeError rather than migrate without it; SQLite applies the whole
+    run in one write transaction, since its DDL is transactional.
+    Returns a list of (version, seconds) for the migrations that ran.
+    """
+    cursor = connection.cursor()
+    applied = []
+    try:
+        _lock(connection, cursor, dialect)
+    except Exception:
+        cursor.close()
+        raise
+    try:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INT PRIMARY KEY,
+                description VARCHAR(200) NOT NULL,
+                duration_ms INT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('SELECT version FROM schema_version')
+        done = {row[0] for row in cursor.fetchall()}
+        for migration in sorted(migrations, key=lambda m: m.version):
+            if migration.version in done:
+                continue
+            started = time.perf_counter()
+            migration.apply(cursor, dialect)
+            elapsed = time.perf_counter() - started
+            cursor.execute(
+                'INSERT INTO schema_version (version, description, duration_ms) VALUES (%s, %s, %s)',
+                (migration.version, migration.description, int(elapsed * 1000))
+            )
+            if dialect == 'mysql':
+                connection.commit()
+            applied.append((migration.version, elapsed))
+            logger.info("Applied migration %s (%s) in %.1f ms", migration.version, migration.description, elapsed * 1000)
+    except Exception:
+        if dialect != 'mysql':
+            connection.rollback()
+        raise
+    finally:
+        _unlock(connection, cursor, dialect)
+        cursor.close()
+    return applied
@@ -0,0 +1,321 @@
+"""Export and import a guild's events and rosters as CSV or JSON Lines.
+
+An export is two files: the guild's events, and the participants of those
+events, which refer to them by the id they had in the exporting database.
+Import gives every event a new id in the target guild and moves its
+participants along, so an export can be loaded into any guild or database.
+Both directions stream: rows are written as the cursor reads them and
+inserted in batches as the file is read.
+
+Run from the repository root:
+
+    PYTHONPATH=src python -m database.transfer export --guild 1234 --format csv --output exports/
+    PYTHONPATH=src python -m database.transfer import --guild 1234 --events exports/events-1234.csv \\
+        --participants exports/participants-1234.csv
+"""
+import argparse
+import asyncio
+from contextlib import ExitStack
+import csv
+from datetime import datetime
+import json
+import logging
+import os
+import sys
+import time
+from database.db_manager import EXPORT_EVENT_COLUMNS, EXPORT_PARTICIPANT_COLUMNS, DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'jsonl')
+EVENT_STATUSES = ('open', 'closed')
+# Column sizes of the events and participants tables
+MAX_NAME_LENGTH = 100
+MAX_TEMPLATE_NAME_LENGTH = 50
+MAX_TEMPLATE_VERSION_LENGTH = 40
+MAX_ROLE_NAME_LENGTH = 60
+MAX_REPORTED_ERRORS = 10
+
+def format_of(filename):
+    """The transfer format of a file name (.csv or .jsonl); raises ValueError for anything else"""
+    extension = os.path.splitext(filename)[1].lower().lstrip('.')
+    if extension == 'json':
+        extension = 'jsonl'
+    if extension not in FORMATS:
+        raise ValueError(f"{filename}: expected a .csv or .jsonl file")
+    return extension
+
+def export_filenames(guild_id, fmt):
+    return f"events-{guild_id}.{fmt}", f"participants-{guild_id}.{fmt}"
+
+def _text(value):
+    return value.isoformat(' ') if isinstance(value, datetime) else value
+
+class RowWriter:
+    """Writes row dicts to an open text file as CSV (with a header) or JSON Lines"""
+
+    def __init__(self, file, columns, fmt):
+        self.file = file
+        self.columns = columns
+        self.fmt = fmt
+        self.rows = 0
+        if fmt == 'csv':
+            self._csv = csv.writer(file)
+            self._csv.writerow(columns)
+
+    def write(self, row):
+        values = [_text(row[column]) for column in self.columns]
+        if self.fmt == 'csv':
+            self._csv.writerow(['' if value is None else value for value in values])
+        else:
+            self.file.write(json.dumps(dict(zip(self.columns, values)), ensure_ascii=False) + '\n')
+        self.rows += 1
+
+class TransferError(Exception):
+    """An import or export stopped part way; the message says where"""
+
+class ImportReport:
+    """Counts what an import read, inserted and rejected, and how fast"""
+
+    def __init__(self):
+        # (file, line) of the last row read, to locate an error that stops the import
+        self.position = None
+        self.rows = 0
+        self.events = 0
+        self.participants = 0
+        self.errors = []
+        self.unlisted = 0
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def reject(self, source, line, reason):
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"{source} line {line}: {reason}")
+        else:
+            self.unlisted += 1
+
+    def failure(self, error):
+        """Describe an error that stopped the import, and where the files had been read to"""
+        if self.position is None:
+            return f"Import failed before any row was read: {error}"
+        source, line = self.position
+        if not line:
+            return f"Import failed reading the {source} file, before its first row: {error}"
+        return (
+            f"Import failed after reading {source} line {line}: {error}. "
+            f"Batches committed before the error were kept; the rest was not imported."
+        )
+
+    def finish(self, events, participants, orphaned):
+        self.events = events
+        self.participants = participants
+        if orphaned:
+            self.errors.append(f"participants: {orphaned} rows belong to events that were not imported")
+        self.seconds = time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    @property
+    def skipped(self):
+        """Rows not inserted: invalid, belonging to a skipped event, or a repeated signup"""
+        return self.rows - self.events - self.participants
+
+    def summary(self):
+        lines = [
+            f"Imported {self.events} events and {self.participants} participants from {self.rows} rows "
+            f"in {self.seconds:.1f}s ({self.rows_per_second:.0f} rows/s); {self.skipped} rows skipped."
+        ]
+        lines.extend(self.errors)
+        if self.unlisted:
+            lines.append(f"... and {self.unlisted} more rejected rows")
+        return '\n'.join(lines)
+
+def _rows(file, fmt, source, report):
+    """Yield (line number, row dict) from an export file; blank CSV cells become None"""
+    report.position = (source, 0)
+    if fmt == 'csv':
+        reader = csv.DictReader(file)
+        try:
+            for row in reader:
+                report.rows += 1
+                report.position = (source, reader.line_num)
+                yield reader.line_num, {key: value if value != '' else None for key, value in row.items()}
+        except csv.Error as e:
+            report.reject(source, reader.line_num, f"unreadable CSV, stopped here ({e})")
+        return
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        report.rows += 1
+        report.position = (source, number)
+        try:
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError("expected an object")
+        except ValueError as e:
+            report.reject(source, number, f"invalid JSON ({e})")
+            continue
+        yield number, row
+
+def _required(row, column):
+    value = row.get(column)
+    if value is None or value == '':
+        raise ValueError(f"{column} is missing")
+    return value
+
+def _datetime(value, column):
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f"{column} is not a date: {value!r}")
+
+def _event(row):
+    name = str(_required(row, 'name'))
+    if len(name) > MAX_NAME_LENGTH:
+        raise ValueError(f"name is longer than {MAX_NAME_LENGTH} characters")
+    status = row.get('status') or 'open'
+    if status not in EVENT_STATUSES:
+        raise ValueError(f"status must be one of {', '.join(EVENT_STATUSES)}")
+    template_name = row.get('template_name')
+    if template_name is not None and len(str(template_name)) > MAX_TEMPLATE_NAME_LENGTH:
+        raise ValueError(f"template_name is longer than {MAX_TEMPLATE_NAME_LENGTH} characters")
+    # A template version is the short content hash of the revision, not a number
+    template_version = row.get('template_version')
+    if template_version is not None:
+        template_version = str(template_version)
+        if len(template_version) > MAX_TEMPLATE_VERSION_LENGTH:
+            raise ValueError(f"template_version is longer than {MAX_TEMPLATE_VERSION_LENGTH} characters")
+    created_at = row.get('created_at')
+    return int(_required(row, 'id')), (
+        int(_required(row, 'creator_id')),
+        name,
+        row.get('description') or '',
+        _datetime(_required(row, 'start_date'), 'start_date'),
+        status,
+        template_name,
+        template_version,
+        _datetime(created_at, 'created_at') if created_at else datetime.now()
+    )
+
+def _participant(row):
+    role_name = str(_required(row, 'role_name'))
+    if len(role_name) > MAX_ROLE_NAME_LENGTH:
+        raise ValueError(f"role_name is longer than {MAX_ROLE_NAME_LENGTH} characters")
+    signup_date = row.get('signup_date')
+    return (
+        int(_required(row, 'event_id')),
+        int(_required(row, 'user_id')),
+        role_name,
+        _datetime(signup_date, 'signup_date') if signup_date else datetime.now()
+    )
+
+def read_events(file, fmt, report):
+    """Yield validated rows for DatabaseManager.import_guild; invalid rows go to report instead"""
+    seen = set()
+    for line, row in _rows(file, fmt, 'events', report):
+        try:
+            event = _event(row)
+        except (ValueError, TypeError) as e:
+            report.reject('events', line, e)
+            continue
+        if event[0] in seen:
+            report.reject('events', line, f"duplicate id {event[0]}")
+            continue
+        seen.add(event[0])
+        yield event
+
+def read_participants(file, fmt, report):
+    """Yield validated participant rows for DatabaseManager.import_guild; invalid rows go to report"""
+    for line, row in _rows(file, fmt, 'participants', report):
+        try:
+            yield _participant(row)
+        except (ValueError, TypeError) as e:
+            report.reject('participants', line, e)
+
+async def export_files(db, guild_id, events_path, participants_path, fmt, batch_size=1000):
+    """Export a guild into two files; returns (events, participants) written"""
+    with open(events_path, 'w', encoding='utf-8', newline='') as events_file, \
+            open(participants_path, 'w', encoding='utf-8', newline='') as participants_file:
+        return await db.export_guild(
+            guild_id,
+            RowWriter(events_file, EXPORT_EVENT_COLUMNS, fmt),
+            RowWriter(participants_file, EXPORT_PARTICIPANT_COLUMNS, fmt),
+            batch_size
+        )
+
+async def import_files(db, guild_id, events_path, participants_path=None, batch_size=1000):
+    """Import an export's files into a guild; returns the ImportReport.
+
+    An error that stops the import (an undecodable file, a row the database
+    refuses) is raised as TransferError naming the line read last.
+    """
+    report = ImportReport()
+    try:
+        counts = await _import(db, guild_id, events_path, participants_path, batch_size, report)
+    except Exception as e:
+        raise TransferError(report.failure(e)) from e
+    report.finish(*counts)
+    logger.info("Guild %s import: %s", guild_id, report.summary().splitlines()[0])
+    return report
+
+async def _import(db, guild_id, events_path, participants_path, batch_size, report):
+    with ExitStack() as files:
+        events = read_events(
+            files.enter_context(open(events_path, 'r', encoding='utf-8-sig', newline='')), format_of(events_path), report
+        )
+        participants = ()
+        if participants_path:
+            participants = read_participants(
+                files.enter_context(open(participants_path, 'r', encoding='utf-8-sig', newline='')),
+                format_of(participants_path), report
+            )
+        return await db.import_guild(guild_id, events, participants, batch_size)
+
+async def _main(options):
+    db = DatabaseManager()
+    try:
+        await db.connect()
+        if options.command == 'export':
+            os.makedirs(options.output, exist_ok=True)
+            paths = [os.path.join(options.output, name) for name in export_filenames(options.guild, options.format)]
+            started = time.perf_counter()
+            events, participants = await export_files(db, options.guild, *paths, options.format, options.batch_size)
+            seconds = time.perf_counter() - started
+            print(f"Exported {events} events and {participants} participants in {seconds:.1f}s "
+                  f"({(events + participants) / seconds if seconds else 0:.0f} rows/s) to {', '.join(paths)}")
+        else:
+            report = await import_files(db, options.guild, options.events, options.participants, options.batch_size)
+            print(report.summary())
+    finally:
+        db.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or import a guild's events and rosters")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export = subparsers.add_parser('export', help='write events-<guild> and participants-<guild> files')
+    export.add_argument('--guild', type=int, required=True)
+    export.add_argument('--format', choices=FORMATS, default='csv')
+    export.add_argument('--output', default='.', help='directory to write the files to')
+    load = subparsers.add_parser('import', help='add the events and participants of an export to a guild')
+    load.add_argument('--guild', type=int, required=True)
+    load.add_argument('--events', required=True)
+    load.add_argument('--participants')
+    for subparser in (export, load):
+        subparser.add_argument('--batch-size', type=int, default=1000, help='rows per fetch or transaction')
+    options = parser.parse_args(argv)
+    if options.command == 'import':
+        try:
+            for path in (options.events, options.participants):
+                if path:
+                    format_of(path)
+        except ValueError as e:
+            parser.error(str(e))
+    asyncio.run(_main(options))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
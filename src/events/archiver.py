@@ -0,0 +1,64 @@
+import asyncio
+from datetime import datetime, timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Let startup traffic settle before the first pass
+STARTUP_DELAY = 60.0
+
+class EventArchiver:
+    """Periodically moves past events out of the hot tables.
+
+    Every `interval`, events that started more than `after` ago, closed or
+    not, are moved with their participants to events_archive and
+    participants_archive, in batches of `batch_size` (see
+    DatabaseManager.archive_events). Archived events stay readable through
+    get_event_history and get_guild_history.
+    """
+
+    def __init__(self, bot, after=timedelta(days=30), batch_size=500, interval=timedelta(hours=6)):
+        self.bot = bot
+        self.after = after
+        self.batch_size = batch_size
+        self.interval = interval
+        self._task = None
+        self.runs = 0
+        self.archived = 0
+        self.last_run_seconds = 0.0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def run_once(self):
+        """Archive everything that is due now; returns the number of events moved"""
+        started = datetime.now()
+        moved = await self.bot.db.archive_events(started - self.after, self.batch_size)
+        self.runs += 1
+        self.archived += moved
+        self.last_run_seconds = (datetime.now() - started).total_seconds()
+        if moved:
+            logger.info("Archived %d events in %.1fs", moved, self.last_run_seconds)
+        return moved
+
+    async def _run(self):
+        await asyncio.sleep(STARTUP_DELAY)
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error("Error archiving events: %s", e)
+            await asyncio.sleep(self.interval.total_seconds())
+
+    def stats(self):
+        return {
+            'runs': self.runs,
+            'archived': self.archived,
+            'last_run_seconds': self.last_run_seconds
+        }
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+class TimeoutWheel:
+    """Hashed timing wheel: schedule, cancel and each tick are O(1) per key.
+
+    Keys land in the slot `ticks` ahead of the current position, with the
+    number of full turns still to wait when the delay exceeds one turn.
+    """
+
+    def __init__(self, resolution=1.0, slots=64):
+        self.resolution = resolution
+        self._slots = [{} for _ in range(slots)]
+        self._where = {}
+        self._position = 0
+
+    def __len__(self):
+        return len(self._where)
+
+    def schedule(self, key, delay):
+        """(Re)arm key to expire after delay seconds"""
+        self.cancel(key)
+        ticks = max(1, math.ceil(delay / self.resolution))
+        slot = (self._position + ticks) % len(self._slots)
+        self._slots[slot][key] = (ticks - 1) // len(self._slots)
+        self._where[key] = slot
+
+    def cancel(self, key):
+        slot = self._where.pop(key, None)
+        if slot is not None:
+            del self._slots[slot][key]
+
+    def advance(self):
+        """Move one tick forward and return the keys that expired"""
+        self._position = (self._position + 1) % len(self._slots)
+        slot = self._slots[self._position]
+        expired = [key for key, rounds in slot.items() if rounds == 0]
+        for key in list(slot):
+            if slot[key]:
+                slot[key] -= 1
+        for key in expired:
+            del slot[key]
+            del self._where[key]
+        return expired
+
+class Conversation:
+    """A multi-message exchange with one user in one channel, as an explicit state machine.
+
+    `step` names the question currently asked; prompts[step] is its text.
+    Each reply goes to on_<step>(content), which stores the answer and
+    returns the next step, or None when the conversation is complete. A
+    ValueError from a handler is sent back and the same step is asked again.
+    """
+
+    timeout = 60.0
+    first_step = None
+    prompts = {}
+
+    def __init__(self, user):
+        self.user = user
+        self.step = self.first_step
+        self.lock = asyncio.Lock()
+
+    async def begin(self):
+        """Ask the first question and return the id of the channel the answers come from"""
+        raise NotImplementedError
+
+    async def send(self, content):
+        raise NotImplementedError
+
+    async def finish(self):
+        raise NotImplementedError
+
+    async def expire(self):
+        pass
+
+    async def advance(self, content):
+        """Handle one reply; returns True when the conversation is over"""
+        try:
+            next_step = getattr(self, f"on_{self.step}")(content)
+        except ValueError as e:
+            await self.send(f"{e}\n{self.prompts[self.step]}")
+            return False
+        if next_step is None:
+            await self.finish()
+            return True
+        self.step = next_step
+        await self.send(self.prompts[next_step])
+        return False
+
+class ConversationDispatcher:
+    """Routes messages to the open conversation of their (author, channel).
+
+    One on_message listener serves every conversation with a dict lookup,
+    instead of one wait_for check per open wizard run against every
+    message. Idle conversations are expired by a TimeoutWheel ticked by a
+    single task.
+    """
+
+    def __init__(self, resolution=1.0, slots=128):
+        self._conversations = {}
+        self._wheel = TimeoutWheel(resolution, slots)
+        self._task = None
+        self.started = 0
+        self.completed = 0
+        self.expired = 0
+
+    def __len__(self):
+        return len(self._conversations)
+
+    async def begin(self, conversation):
+        """Start a conversation, replacing any the user has open in the same channel"""
+        channel_id = await conversation.begin()
+        key = (conversation.user.id, channel_id)
+        self._conversations[key] = conversation
+        self._wheel.schedule(key, conversation.timeout)
+        self.started += 1
+
+    def cancel(self, user_id, channel_id):
+        key = (user_id, channel_id)
+        self._wheel.cancel(key)
+        return self._conversations.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self._conversations
+
+    async def on_message(self, message):
+        await self.route(message.author.id, message.channel.id, message.content)
+
+    async def route(self, user_id, channel_id, content):
+        """Hand a reply to the conversation open for (user_id, channel_id), if any"""
+        key = (user_id, channel_id)
+        conversation = self._conversations.get(key)
+        if conversation is None:
+            return
+        async with conversation.lock:
+            if self._conversations.get(key) is not conversation:
+                return
+            self._wheel.schedule(key, conversation.timeout)
+            try:
+                done = await conversation.advance(content.strip())
+            except Exception as e:
+                logger.exception("Error in %s step %s: %s", type(conversation).__name__, conversation.step, e)
+                done = True
+                await self._notify(conversation.send, "Something went wrong. Please try again.")
+            if done:
+                self.cancel(*key)
+                self.completed += 1
+
+    async def _tick(self):
+        while True:
+            await asyncio.sleep(self._wheel.resolution)
+            for key in self._wheel.advance():
+                conversation = self._conversations.pop(key, None)
+                if conversation is not None:
+                    self.expired += 1
+                    asyncio.create_task(self._notify(conversation.expire))
+
+    @staticmethod
+    async def _notify(callback, *args):
+        try:
+            await callback(*args)
+        except Exception as e:
+            logger.warning("Error messaging a conversation: %s", e)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._tick())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self):
+        return {
+            'active': len(self._conversations),
+            'started': self.started,
+            'completed': self.completed,
+            'expired': self.expired
+        }
@@ -0,0 +1,124 @@
+import asyncio
+from collections import OrderedDict
+import hashlib
+import logging
+import discord
+
+logger = logging.getLogger(__name__)
+
+class EventMessageUpdater:
+    """Coalesces "event changed" notifications into paced message edits.
+
+    Requests for the same message within `delay` seconds collapse into one
+    edit carrying the latest render, and an edit whose content hash equals
+    what the message already shows is skipped entirely. Content hashes
+    are kept for the `max_messages` most recently edited messages; a
+    message that fell out only costs one edit that might have been skipped.
+    """
+
+    def __init__(self, render, delay=1.0, max_messages=1000):
+        self.render = render
+        self.delay = delay
+        self.max_messages = max_messages
+        self._pending = {}
+        self._tasks = {}
+        self._hashes = OrderedDict()
+        self._retry_after = {}
+        self.requested = 0
+        self.coalesced = 0
+        self.skipped = 0
+        self.sent = 0
+        self.failed = 0
+        self.rate_limited = 0
+
+    @staticmethod
+    def _digest(content):
+        return hashlib.sha1((content or '').encode('utf-8')).hexdigest()
+
+    def request_update(self, event_id, message):
+        """Schedule a re-render of event_id into message"""
+        self.requested += 1
+        if getattr(message, 'content', None) is not None and message.id not in self._hashes:
+            self._remember(message.id, self._digest(message.content))
+        self._pending[message.id] = (event_id, message)
+        if message.id in self._tasks:
+            self.coalesced += 1
+            return
+        self._tasks[message.id] = asyncio.create_task(self._flush(message.id))
+
+    async def _flush(self, message_id):
+        try:
+            while message_id in self._pending:
+                await asyncio.sleep(self._retry_after.pop(message_id, self.delay))
+                event_id, message = self._pending.pop(message_id)
+                try:
+                    content = await self.render(event_id)
+                except Exception as e:
+                    logger.error("Error rendering event %s: %s", event_id, e)
+                    self.failed += 1
+                    continue
+                digest = self._digest(content)
+                if self._hashes.get(message_id) == digest:
+                    self.skipped += 1
+                    continue
+                await self._edit(message, event_id, content, digest)
+        finally:
+            self._tasks.pop(message_id, None)
+
+    async def _edit(self, message, event_id, content, digest):
+        try:
+            await message.edit(content=content)
+        except discord.RateLimited as e:
+            self._backoff(message, event_id, e.retry_after)
+        except discord.HTTPException as e:
+            if e.status == 429:
+                self._backoff(message, event_id, self.delay * 2)
+                return
+            logger.error("Error editing message for event %s: %s", event_id, e)
+            self.failed += 1
+        else:
+            self._remember(message.id, digest)
+            self.sent += 1
+
+    def _backoff(self, message, event_id, retry_after):
+        # Requeue unless a newer request already replaced this one
+        self.rate_limited += 1
+        self._pending.setdefault(message.id, (event_id, message))
+        self._retry_after[message.id] = max(self.delay, retry_after)
+
+    def record_content(self, message_id, content):
+        """Note content written to a message outside the updater"""
+        self._remember(message_id, self._digest(content))
+
+    def _remember(self, message_id, digest):
+        self._hashes[message_id] = digest
+        self._hashes.move_to_end(message_id)
+        while len(self._hashes) > self.max_messages:
+            self._hashes.popitem(last=False)
+
+    def forget(self, message_id):
+        """Drop state for a message that was deleted"""
+        self._pending.pop(message_id, None)
+        self._hashes.pop(message_id, None)
+        self._retry_after.pop(message_id, None)
+        task = self._tasks.pop(message_id, None)
+        if task:
+            task.cancel()
+
+    def stop(self):
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+        self._pending.clear()
+
+    def stats(self):
+        return {
+            'requested': self.requested,
+            'coalesced': self.coalesced,
+            'skipped': self.skipped,
+            'sent': self.sent,
+            'failed': self.failed,
+            'rate_limited': self.rate_limited,
+            'pending': len(self._pending),
+            'tracked_messages': len(self._hashes)
+        }
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import discord
+
+logger = logging.getLogger(__name__)
+
+class NotificationResult:
+    """Progress and outcome of one bulk notification"""
+
+    def __init__(self, total):
+        self.total = total
+        self.sent = 0
+        self.forbidden = 0
+        self.failed = 0
+
+    @property
+    def done(self):
+        return self.sent + self.forbidden + self.failed
+
+    def summary(self):
+        return (
+            f"{self.done}/{self.total} processed: {self.sent} sent, "
+            f"{self.forbidden} with closed DMs, {self.failed} failed"
+        )
+
+class NotificationDispatcher:
+    """Sends DMs to many users in the background with bounded concurrency.
+
+    All notifications share one semaphore, so several large events closing
+    at once still stay within `concurrency` DMs in flight. Users missing
+    from the cache are fetched, and rate-limited or failed sends back off
+    and retry.
+    """
+
+    def __init__(self, bot, concurrency=5, max_attempts=3, progress_every=25):
+        self.bot = bot
+        self.max_attempts = max_attempts
+        self.progress_every = progress_every
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks = set()
+
+    def notify(self, user_ids, content, on_progress=None):
+        """Start notifying user_ids and return the task; on_progress(result) is awaited as it goes"""
+        task = asyncio.create_task(self._dispatch(list(dict.fromkeys(user_ids)), content, on_progress))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _dispatch(self, user_ids, content, on_progress):
+        result = NotificationResult(len(user_ids))
+
+        async def send(user_id):
+            await self._send(user_id, content, result)
+            if on_progress and result.done % self.progress_every == 0 and result.done < result.total:
+                await self._report(on_progress, result)
+
+        # A send that fails outside discord.HTTPException (a dropped connection, a timeout) only fails its own user
+        outcomes = await asyncio.gather(*(send(user_id) for user_id in user_ids), return_exceptions=True)
+        for user_id, outcome in zip(user_ids, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.warning("Error notifying user %s: %r", user_id, outcome)
+                result.failed += 1
+        if on_progress:
+            await self._report(on_progress, result)
+        return result
+
+    @staticmethod
+    async def _report(on_progress, result):
+        try:
+            await on_progress(result)
+        except Exception as e:
+            # Never counted against the sends: the DM itself already went out (or failed) by now
+            logger.warning("Error reporting notification progress: %s", e)
+
+    async def _send(self, user_id, content, result):
+        async with self._semaphore:
+            user = self.bot.get_user(user_id)
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    if user is None:
+                        user = await self.bot.fetch_user(user_id)
+                    await user.send(content)
+                    result.sent += 1
+                    return
+                except discord.Forbidden:
+                    result.forbidden += 1
+                    return
+                except discord.NotFound:
+                    result.failed += 1
+                    return
+                except discord.HTTPException as e:
+                    if attempt == self.max_attempts or not (e.status == 429 or e.status >= 500):
+                        logger.warning("Error notifying user %s: %s", user_id, e)
+                        result.failed += 1
+                        return
+                    await asyncio.sleep(self._retry_after(e, attempt))
+
+    @staticmethod
+    def _retry_after(error, attempt):
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after is None and error.response is not None:
+            retry_after = error.response.headers.get('Retry-After')
+        try:
+            return float(retry_after)
+        except (TypeError, ValueError):
+            return 2 ** attempt
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+
+def interaction_progress(interaction, title):
+    """Progress callback that keeps the original interaction response up to date"""
+    async def report(result):
+        await interaction.edit_original_response(content=f"{title}\n{result.summary()}")
+    return report
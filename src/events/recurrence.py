@@ -0,0 +1,203 @@
+import asyncio
+from collections import deque
+from datetime import datetime, timedelta
+import logging
+import re
+from dateutil.rrule import rrulestr
+
+logger = logging.getLogger(__name__)
+
+RULE_PRESETS = {
+    'weekly': 'FREQ=WEEKLY',
+    'biweekly': 'FREQ=WEEKLY;INTERVAL=2'
+}
+
+# Bounds one pass's batched insert; a series further behind catches up over the next passes
+MAX_OCCURRENCES_PER_RUN = 50
+# Every occurrence is a channel post, so a series may repeat at most daily
+SUB_DAILY_FREQUENCIES = {'HOURLY', 'MINUTELY', 'SECONDLY'}
+_FREQ = re.compile(r'\bFREQ\s*=\s*(\w+)', re.IGNORECASE)
+_TIME_PARTS = re.compile(r'\b(BYHOUR|BYMINUTE|BYSECOND)\s*=\s*([^;\s]+)', re.IGNORECASE)
+
+_rules = {}
+
+def _check_daily(rule):
+    for frequency in _FREQ.findall(rule):
+        if frequency.upper() in SUB_DAILY_FREQUENCIES:
+            raise ValueError(f"Invalid recurrence rule: FREQ={frequency.upper()} repeats more than once a day")
+    for part, values in _TIME_PARTS.findall(rule):
+        if ',' in values:
+            raise ValueError(f"Invalid recurrence rule: {part.upper()}={values} repeats more than once a day")
+
+def parse_rule(rule, dtstart):
+    """Return the dateutil rule for an RRULE string starting at dtstart.
+
+    Raises ValueError if the rule is invalid or repeats more than once a day.
+    """
+    key = (rule, dtstart)
+    parsed = _rules.get(key)
+    if parsed is None:
+        _check_daily(rule)
+        try:
+            parsed = rrulestr(rule, dtstart=dtstart)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Invalid recurrence rule: {e}")
+        _rules[key] = parsed
+    return parsed
+
+def occurrences(series, after, until, limit=MAX_OCCURRENCES_PER_RUN):
+    """Start times of a series strictly after `after` and up to until, at most limit of them"""
+    dates = []
+    for start in parse_rule(series['rule'], series['dtstart']).xafter(after):
+        if start > until or len(dates) >= limit:
+            break
+        dates.append(start)
+    return dates
+
+class PostPacer:
+    """Posts event messages in the background without bursting into Discord's rate limits.
+
+    Each guild posts to a single listening channel, so posts are queued
+    per guild and sent one at a time, `interval` seconds apart (Discord
+    allows about 5 messages per 5 seconds per channel, and every post is
+    also a thread creation). At most `concurrency` guilds post at once,
+    which keeps the bot well under the global request limit.
+    """
+
+    def __init__(self, post, interval=1.0, concurrency=10):
+        self._post = post
+        self.interval = interval
+        self._slots = asyncio.Semaphore(concurrency)
+        self._queues = {}
+        self._workers = {}
+        self._pending = set()
+        self.posted = 0
+        self.failed = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+    def submit(self, event):
+        """Queue an event for posting; an event already queued is not queued twice"""
+        if event['id'] in self._pending:
+            return
+        self._pending.add(event['id'])
+        self._queues.setdefault(event['guild_id'], deque()).append(event)
+        if event['guild_id'] not in self._workers:
+            self._workers[event['guild_id']] = asyncio.create_task(self._drain(event['guild_id']))
+
+    async def _drain(self, guild_id):
+        queue = self._queues[guild_id]
+        try:
+            while queue:
+                event = queue.popleft()
+                try:
+                    async with self._slots:
+                        await self._post(event)
+                    self.posted += 1
+                except Exception as e:
+                    self.failed += 1
+                    logger.warning("Error posting event %s: %s", event['id'], e)
+                finally:
+                    self._pending.discard(event['id'])
+                if queue:
+                    await asyncio.sleep(self.interval)
+        finally:
+            del self._queues[guild_id]
+            del self._workers[guild_id]
+
+    def stop(self):
+        for task in list(self._workers.values()):
+            task.cancel()
+
+    def stats(self):
+        return {
+            'queued': len(self._pending),
+            'posted': self.posted,
+            'failed': self.failed
+        }
+
+class SeriesExpander:
+    """Turns recurring series into events, a rolling `window` ahead.
+
+    Every `interval`, each active series of this process's guilds is
+    expanded from where it stopped last time up to now + window. All new
+    occurrences go to the database as one batched insert, together with
+    the new end of each series' window, and their messages are handed to
+    a PostPacer. Occurrences beyond the window are never materialized.
+    """
+
+    def __init__(self, bot, window=timedelta(days=14), interval=timedelta(hours=1), post_interval=1.0):
+        self.bot = bot
+        self.window = window
+        self.interval = interval
+        self.pacer = PostPacer(self._post, interval=post_interval)
+        self._task = None
+        self.runs = 0
+        self.generated = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.pacer.stop()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.expand()
+            except Exception as e:
+                logger.error("Error expanding event series: %s", e)
+            await asyncio.sleep(self.interval.total_seconds())
+
+    async def expand(self):
+        """Generate every due occurrence and queue the unposted ones; returns the number generated"""
+        now = datetime.now()
+        until = now + self.window
+        events, horizons = [], []
+        for series in await self.bot.db.get_due_series(until):
+            if not self.bot.owns_guild(series['guild_id']):
+                continue
+            after = max(series['generated_until'] or series['dtstart'] - timedelta(seconds=1), now)
+            try:
+                dates = occurrences(series, after, until)
+            except ValueError as e:
+                logger.warning("Skipping series %s: %s", series['id'], e)
+                continue
+            template_name = series['template_name']
+            template = self.bot.templates[template_name] if template_name and template_name in self.bot.templates else None
+            events.extend(
+                (series['guild_id'], series['creator_id'], series['name'], series['description'], start,
+                 series['template_name'], template.version if template else None, series['id'])
+                for start in dates
+            )
+            # A capped run resumes after its last occurrence on the next pass
+            horizons.append((dates[-1] if len(dates) == MAX_OCCURRENCES_PER_RUN else until, series['id']))
+        inserted = 0
+        if horizons:
+            inserted = await self.bot.db.create_series_events(events, horizons)
+        self.runs += 1
+        self.generated += inserted
+        if inserted:
+            logger.info("Generated %d recurring events up to %s", inserted, until.strftime('%Y-%m-%d %H:%M'))
+        # Also picks up posts that failed or were still queued when the bot stopped
+        for event in await self.bot.db.get_unposted_series_events(now):
+            if self.bot.owns_guild(event['guild_id']):
+                self.bot.scheduler.schedule_event(event)
+                self.pacer.submit(event)
+        return inserted
+
+    async def _post(self, event):
+        create_event_command = self.bot.get_cog('CreateEventCommand')
+        await create_event_command.post_event(event['id'], event['guild_id'])
+
+    def stats(self):
+        return {
+            'runs': self.runs,
+            'generated': self.generated,
+            **{f"posts_{key}": value for key, value in self.pacer.stats().items()}
+        }
@@ -0,0 +1,139 @@
+from collections import OrderedDict
+
+# Discord rejects message content longer than this
+MESSAGE_LIMIT = 2000
+
+class EventRenderer:
+    """Renders an event and its roster as message text.
+
+    Participants are grouped by role in a single pass, and each role section
+    is cached by its roster so that a signup only rebuilds the section of
+    the role that changed.
+    """
+
+    def __init__(self, templates, max_sections=5000):
+        self.templates = templates
+        self.max_sections = max_sections
+        self._sections = OrderedDict()
+        self.section_hits = 0
+        self.section_misses = 0
+
+    @staticmethod
+    def group_by_role(participants):
+        roles = {}
+        for participant in participants:
+            roles.setdefault(participant['role_name'], []).append(participant['user_id'])
+        return roles
+
+    def _roles(self, event):
+        template = self.templates.for_event(event)
+        return template.roles if template else None
+
+    @staticmethod
+    def _header(event):
+        return (
+            f"📅 **{event['name']}**\n\n"
+            f"{event['description']}\n\n"
+            f"🕒 Start: {event['start_date'].strftime('%Y-%m-%d %H:%M')}\n"
+        )
+
+    @staticmethod
+    def _footer(event):
+        return f"\n📝 Event ID: {event['id']} | Status: {event['status']}"
+
+    @staticmethod
+    def _mentions(user_ids, empty):
+        if not user_ids:
+            return f"→ {empty}"
+        return "→ " + ", ".join(f"<@{user_id}>" for user_id in user_ids)
+
+    def _section(self, event_id, role_name, role_info, user_ids):
+        key = (event_id, role_name)
+        signature = (role_info['emoji'], role_info['limit'], tuple(user_ids))
+        cached = self._sections.get(key)
+        if cached is not None and cached[0] == signature:
+            self._sections.move_to_end(key)
+            self.section_hits += 1
+            return cached[1]
+        self.section_misses += 1
+        text = (
+            f"\n{role_info['emoji']} {role_name} ({len(user_ids)}/{role_info['limit']})\n"
+            + self._mentions(user_ids, "No participants")
+        )
+        self._sections[key] = (signature, text)
+        self._sections.move_to_end(key)
+        while len(self._sections) > self.max_sections:
+            self._sections.popitem(last=False)
+        return text
+
+    def _sections_for(self, event, participants):
+        """Return the body as a list of (heading, user_ids, text) blocks"""
+        grouped = self.group_by_role(participants)
+        roles = self._roles(event)
+        if roles is None:
+            user_ids = [p['user_id'] for p in participants]
+            heading = f"\n**Participants ({len(participants)}):**"
+            return "", [(heading, user_ids, heading + "\n" + self._mentions(user_ids, "No participants yet"))]
+        blocks = []
+        for role_name, role_info in roles.items():
+            user_ids = grouped.get(role_name, [])
+            text = self._section(event['id'], role_name, role_info, user_ids)
+            heading = f"\n{role_info['emoji']} {role_name} ({len(user_ids)}/{role_info['limit']})"
+            blocks.append((heading, user_ids, text))
+        return "\n**Roles:**", blocks
+
+    def render_text(self, event, participants, limit=MESSAGE_LIMIT):
+        """Render the event as one message, shortening rosters to fit the limit"""
+        header = self._header(event)
+        footer = self._footer(event)
+        title, blocks = self._sections_for(event, participants)
+        lead = [header, title] if title else [header]
+        content = "\n".join(lead + [text for _, _, text in blocks] + [footer])
+        if len(content) <= limit:
+            return content
+        # Too long: share the remaining space between rosters and cut each one short
+        fixed = len("\n".join(lead + [heading + "\n" for heading, _, _ in blocks] + [footer]))
+        budgets = self._share(max(0, limit - fixed), [len(text) - len(heading) - 1 for heading, _, text in blocks])
+        parts = lead + [
+            heading + "\n" + self._truncated_mentions(user_ids, budget)
+            for (heading, user_ids, _), budget in zip(blocks, budgets)
+        ]
+        return "\n".join(parts + [footer])[:limit]
+
+    @staticmethod
+    def _share(space, needs):
+        """Split space so small rosters get all they need and large ones split the rest"""
+        budgets = [0] * len(needs)
+        for position, index in enumerate(sorted(range(len(needs)), key=needs.__getitem__)):
+            budgets[index] = min(needs[index], space // (len(needs) - position))
+            space -= budgets[index]
+        return budgets
+
+    @staticmethod
+    def _truncated_mentions(user_ids, budget):
+        if not user_ids:
+            return "→ No participants"
+        shown = []
+        used = 2
+        for index, user_id in enumerate(user_ids):
+            mention = f"<@{user_id}>"
+            cost = len(mention) + (2 if shown else 0)
+            # Leave room for the "… +N" marker unless this is the last mention
+            reserve = len(f" … +{len(user_ids) - index}") if index < len(user_ids) - 1 else 0
+            if used + cost + reserve > budget:
+                return "→ " + ", ".join(shown) + f" … +{len(user_ids) - index}"
+            shown.append(mention)
+            used += cost
+        return "→ " + ", ".join(shown)
+
+    def forget(self, event_id):
+        """Drop cached sections of a deleted event"""
+        for key in [key for key in self._sections if key[0] == event_id]:
+            del self._sections[key]
+
+    def stats(self):
+        return {
+            'sections': len(self._sections),
+            'section_hits': self.section_hits,
+            'section_misses': self.section_misses
+        }
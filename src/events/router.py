@@ -0,0 +1,50 @@
+from urllib.parse import quote, unquote
+
+# Bump when the layout of custom ids changes; older layouts stay routable
+CUSTOM_ID_VERSION = 'e1'
+CUSTOM_ID_DELIMITER = ':'
+CUSTOM_ID_LIMIT = 100
+
+def encode_custom_id(action, *args):
+    """Build a versioned custom_id; arguments are percent-encoded so they may contain any character"""
+    parts = [CUSTOM_ID_VERSION, action] + [quote(str(arg), safe='') for arg in args]
+    custom_id = CUSTOM_ID_DELIMITER.join(parts)
+    if len(custom_id) > CUSTOM_ID_LIMIT:
+        raise ValueError(f"custom_id for {action} is longer than {CUSTOM_ID_LIMIT} characters")
+    return custom_id
+
+def decode_custom_id(custom_id):
+    """Return (action, args) for a custom_id, or (None, None) if it is not one of ours"""
+    if custom_id.startswith(CUSTOM_ID_VERSION + CUSTOM_ID_DELIMITER):
+        _, action, *args = custom_id.split(CUSTOM_ID_DELIMITER)
+        return action, [unquote(arg) for arg in args]
+    # Legacy "signup_<event>_<role>" / "cancel_<event>" ids on messages posted before versioning
+    action, _, rest = custom_id.partition('_')
+    if action == 'signup':
+        event_id, _, role_name = rest.partition('_')
+        return action, [event_id, role_name]
+    if action == 'cancel':
+        return action, [rest]
+    return None, None
+
+class ComponentRouter:
+    """Maps custom_id actions straight to their handlers"""
+
+    def __init__(self):
+        self._routes = {}
+
+    def register(self, action, handler, defer=True):
+        """Route action to handler(interaction, *args); defer acknowledges before the handler runs"""
+        self._routes[action] = (handler, defer)
+
+    def unregister(self, action):
+        self._routes.pop(action, None)
+
+    def resolve(self, custom_id):
+        """Return (action, handler, defer, args) for custom_id, or None if nothing handles it"""
+        action, args = decode_custom_id(custom_id)
+        route = self._routes.get(action)
+        if route is None:
+            return None
+        handler, defer = route
+        return action, handler, defer, args
@@ -0,0 +1,191 @@
+import asyncio
+from datetime import datetime, timedelta
+import heapq
+import itertools
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Wake up at least this often so a changed system clock is noticed
+MAX_SLEEP = 300.0
+
+def _minutes(value):
+    """A reminder offset as a positive number of minutes; raises ValueError otherwise"""
+    try:
+        minutes = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{value!r} is not a number of minutes")
+    if not minutes > 0:
+        raise ValueError(f"{value!r} is not a positive number of minutes")
+    # Whole minutes keep the integer form already stored in scheduled_actions
+    return int(minutes) if minutes.is_integer() else minutes
+
+class EventScheduler:
+    """Start reminders and auto-close for open events, driven by one heap and one task.
+
+    Every pending action is a heap entry (when, seq, event_id, generation,
+    action). Rescheduling an event gives it a new generation, which turns
+    its old entries stale; they are dropped when they reach the top instead
+    of being searched for. The task sleeps until the earliest entry is due
+    or until an earlier entry is pushed.
+
+    Events are loaded `horizon` ahead with one query on (status, start_date),
+    and a refill entry reloads the next window before this one runs out.
+    Each action is claimed in the database before it fires, so a restart or
+    a second process never sends the same reminder twice.
+    """
+
+    def __init__(self, bot, reminder_offsets=(60,), auto_close=True, notify_on_close=False,
+                 horizon=timedelta(hours=24), missed_grace=timedelta(minutes=10)):
+        self.bot = bot
+        # Minutes before the start, largest first
+        offsets = set()
+        for offset in reminder_offsets:
+            try:
+                offsets.add(_minutes(offset))
+            except ValueError as e:
+                logger.error("Ignoring reminder offset: %s", e)
+        self.reminder_offsets = sorted(offsets, reverse=True)
+        self.auto_close = auto_close
+        self.notify_on_close = notify_on_close
+        self.horizon = horizon
+        self.missed_grace = missed_grace
+        self._heap = []
+        self._seq = itertools.count()
+        self._generations = {}
+        self._next_generation = itertools.count(1)
+        self._loaded_until = None
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.fired = 0
+        self.skipped = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    async def start(self):
+        if self._task is None:
+            await self._refill()
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def schedule_event(self, event):
+        """(Re)schedule every action of an event, replacing what was scheduled before"""
+        self.unschedule(event['id'])
+        if event['status'] != 'open' or self._loaded_until is None or event['start_date'] > self._loaded_until:
+            # Events beyond the loaded window are picked up by the next refill
+            return
+        generation = self._generations[event['id']] = next(self._next_generation)
+        start = event['start_date']
+        for minutes in self.reminder_offsets:
+            self._push(start - timedelta(minutes=minutes), event['id'], generation, f"reminder:{minutes}")
+        if self.auto_close:
+            self._push(start, event['id'], generation, 'close')
+
+    def unschedule(self, event_id):
+        self._generations.pop(event_id, None)
+
+    def _push(self, when, event_id, generation, action):
+        seq = next(self._seq)
+        heapq.heappush(self._heap, (when, seq, event_id, generation, action))
+        if self._heap[0][1] == seq:
+            # The new entry is the earliest one: cut the current sleep short
+            self._wakeup.set()
+
+    async def _refill(self):
+        now = datetime.now()
+        until = now + self.horizon
+        self._loaded_until = until
+        for event in await self.bot.db.get_schedulable_events(until):
+            # Each worker schedules the events of the guilds on its own shards
+            if event['id'] not in self._generations and self.bot.owns_guild(event['guild_id']):
+                self.schedule_event(event)
+        self._push(now + self.horizon / 2, None, None, 'refill')
+        logger.info("Scheduled %d pending actions until %s", len(self._heap), until.strftime('%Y-%m-%d %H:%M'))
+
+    async def _run(self):
+        while True:
+            now = datetime.now()
+            while self._heap and self._heap[0][0] <= now:
+                when, _, event_id, generation, action = heapq.heappop(self._heap)
+                try:
+                    await self._dispatch(when, now, event_id, generation, action)
+                except Exception as e:
+                    logger.exception("Error running %s for event %s: %s", action, event_id, e)
+            delay = MAX_SLEEP
+            if self._heap:
+                delay = min(delay, max(0.0, (self._heap[0][0] - datetime.now()).total_seconds()))
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _dispatch(self, when, now, event_id, generation, action):
+        if action == 'refill':
+            await self._refill()
+            return
+        if self._generations.get(event_id) != generation:
+            return
+        if action == 'close':
+            self._generations.pop(event_id, None)
+            await self._close(event_id)
+        elif now - when > self.missed_grace:
+            # The bot was down when this reminder was due; a later one may still go out
+            self.skipped += 1
+            logger.info("Skipping %s for event %s, due at %s", action, event_id, when.strftime('%Y-%m-%d %H:%M'))
+        else:
+            await self._remind(event_id, action)
+
+    async def _remind(self, event_id, action):
+        event, participants = await self.bot.db.get_roster(event_id)
+        if not event or event['status'] != 'open' or not participants:
+            return
+        try:
+            minutes = _minutes(action.split(':', 1)[1])
+        except (IndexError, ValueError) as e:
+            # Checked before the claim, so a fixed offset can still fire after a restart
+            self.skipped += 1
+            logger.error("Skipping %s for event %s: %s", action, event_id, e)
+            return
+        if not await self.bot.db.claim_scheduled_action(event_id, action):
+            return
+        self.fired += 1
+        self.bot.notifier.notify(
+            [p['user_id'] for p in participants],
+            f"Reminder: '{event['name']}' starts in {self._describe(minutes)} "
+            f"({event['start_date'].strftime('%Y-%m-%d %H:%M')})."
+        )
+
+    async def _close(self, event_id):
+        event = await self.bot.db.get_event(event_id)
+        if not event or event['status'] != 'open':
+            return
+        if not await self.bot.db.claim_scheduled_action(event_id, 'close'):
+            return
+        self.fired += 1
+        close_event_command = self.bot.get_cog('CloseEventCommand')
+        await close_event_command.close_event(event_id, notify=self.notify_on_close)
+        logger.info("Closed event %s at its start time", event_id)
+
+    @staticmethod
+    def _describe(minutes):
+        if minutes % 1440 == 0:
+            days = minutes // 1440
+            return f"{days} day{'s' if days != 1 else ''}"
+        if minutes % 60 == 0:
+            hours = minutes // 60
+            return f"{hours} hour{'s' if hours != 1 else ''}"
+        return f"{minutes} minute{'s' if minutes != 1 else ''}"
+
+    def stats(self):
+        return {
+            'pending': len(self._heap),
+            'events': len(self._generations),
+            'fired': self.fired,
+            'skipped': self.skipped
+        }
@@ -0,0 +1,187 @@
+import asyncio
+from collections.abc import Mapping
+import hashlib
+import json
+import logging
+import os
+from events.router import encode_custom_id
+
+logger = logging.getLogger(__name__)
+
+# Discord allows 5 rows of 5 buttons; one slot is kept for the Cancel button
+BUTTONS_PER_ROW = 5
+MAX_ROLES = 24
+MAX_ROLE_NAME = 60
+
+class TemplateError(ValueError):
+    pass
+
+def validate_template(name, data):
+    """Raise TemplateError listing every problem with a template definition"""
+    errors = []
+    if not isinstance(data, dict):
+        raise TemplateError(f"Template {name}: must be a JSON object")
+    if 'title' in data and not isinstance(data['title'], str):
+        errors.append("'title' must be a string")
+    if 'image_path' in data and not isinstance(data['image_path'], str):
+        errors.append("'image_path' must be a string")
+    roles = data.get('roles')
+    if not isinstance(roles, dict) or not roles:
+        errors.append("'roles' must be a non-empty object")
+        roles = {}
+    if len(roles) > MAX_ROLES:
+        errors.append(f"at most {MAX_ROLES} roles are supported")
+    for role_name, role_info in roles.items():
+        if not role_name.strip() or len(role_name) > MAX_ROLE_NAME:
+            errors.append(f"role name '{role_name}' must be 1-{MAX_ROLE_NAME} characters")
+        else:
+            try:
+                encode_custom_id('signup', 2 ** 31 - 1, role_name)
+            except ValueError:
+                errors.append(f"role name '{role_name}' is too long for a button")
+        if not isinstance(role_info, dict):
+            errors.append(f"role '{role_name}' must be an object")
+            continue
+        limit = role_info.get('limit')
+        if not isinstance(limit, int) or isinstance(limit, bool) or limit < 1:
+            errors.append(f"role '{role_name}' needs a positive integer 'limit'")
+        emoji = role_info.get('emoji')
+        if not isinstance(emoji, str) or not emoji:
+            errors.append(f"role '{role_name}' needs an 'emoji'")
+    if errors:
+        raise TemplateError(f"Template {name}: " + "; ".join(errors))
+
+class Template:
+    """A validated template revision with its role tables precomputed"""
+
+    def __init__(self, name, data, version=None):
+        validate_template(name, data)
+        self.name = name
+        self.data = data
+        self.version = version or hashlib.sha1(
+            json.dumps(data, sort_keys=True).encode('utf-8')
+        ).hexdigest()[:12]
+        self.title = data.get('title', name)
+        self.roles = data['roles']
+        self.role_order = list(self.roles)
+        self.role_index = {role_name: index for index, role_name in enumerate(self.role_order)}
+        self.capacities = {role_name: info['limit'] for role_name, info in self.roles.items()}
+        self.total_capacity = sum(self.capacities.values())
+        self.button_rows = [
+            self.role_order[start:start + BUTTONS_PER_ROW]
+            for start in range(0, len(self.role_order), BUTTONS_PER_ROW)
+        ]
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+class TemplateRegistry(Mapping):
+    """Current templates by name, plus every revision seen so events can pin one.
+
+    The directory is polled for changes; changed files are validated and the
+    whole name -> template table is swapped in one assignment, so readers
+    never see a half-loaded state. A file that fails validation keeps its
+    last good revision.
+    """
+
+    def __init__(self, directory='templates', poll_interval=5.0):
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self._templates = {}
+        self._revisions = {}
+        self._signatures = {}
+        self._listeners = []
+        self._task = None
+
+    def __getitem__(self, name):
+        return self._templates[name]
+
+    def __iter__(self):
+        return iter(self._templates)
+
+    def __len__(self):
+        return len(self._templates)
+
+    def add_listener(self, callback):
+        """callback(list_of_new_templates) runs after every reload that changed something"""
+        self._listeners.append(callback)
+
+    def add_revision(self, name, version, data):
+        """Register an older revision (e.g. restored from the database) for pinned events"""
+        if (name, version) not in self._revisions:
+            self._revisions[(name, version)] = Template(name, data, version)
+
+    def revision(self, name, version):
+        return self._revisions.get((name, version))
+
+    def for_event(self, event):
+        """Return the template revision an event was created with, or the current one"""
+        name = event.get('template_name')
+        if not name:
+            return None
+        version = event.get('template_version')
+        if version:
+            pinned = self._revisions.get((name, version))
+            if pinned is not None:
+                return pinned
+        return self._templates.get(name)
+
+    def load(self):
+        """Reload changed template files; returns the templates that changed"""
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        templates = dict(self._templates)
+        seen = set()
+        changed = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+            name = filename[:-5]  # Remove .json extension
+            path = os.path.join(self.directory, filename)
+            seen.add(name)
+            stat = os.stat(path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if self._signatures.get(name) == signature:
+                continue
+            self._signatures[name] = signature
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    template = Template(name, json.load(f))
+            except (json.JSONDecodeError, TemplateError) as e:
+                logger.error("Error loading template %s: %s", filename, e)
+                continue
+            if name in templates and templates[name].version == template.version:
+                continue
+            template = self._revisions.setdefault((name, template.version), template)
+            templates[name] = template
+            changed.append(template)
+            logger.info("Successfully loaded template: %s (version %s)", name, template.version)
+        for name in set(templates) - seen:
+            logger.info("Template removed: %s", name)
+            del templates[name]
+            self._signatures.pop(name, None)
+        self._templates = templates
+        if changed:
+            for callback in self._listeners:
+                callback(changed)
+        return changed
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                self.load()
+            except OSError as e:
+                logger.error("Error reloading templates: %s", e)
+
+    def start(self):
+        if self._task is None and self.poll_interval:
+            self._task = asyncio.create_task(self._watch())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
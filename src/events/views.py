@@ -1,31 +1,33 @@
 ﻿import discord
-from discord.ui import View, Button
+from discord.ui import View, Button, Modal, TextInput
+from events.router import encode_custom_id
 
 class EventSignupView(View):
-    def __init__(self, event_manager, event_id, templates, timeout=None):
+    def __init__(self, event_manager, event, templates, timeout=None):
         super().__init__(timeout=timeout)
         self.event_manager = event_manager
-        self.event_id = event_id
+        self.event_id = event['id']
         self.templates = templates
-        self._add_role_buttons()
+        self._add_role_buttons(event)
 
-    def _add_role_buttons(self):
-        event = self.event_manager.db.get_event(self.event_id)
+    def _add_role_buttons(self, event):
         if not event or not event['template_name']:
-            self.add_item(Button(label="Sign Up", custom_id=f"signup_{self.event_id}_participant"))
+            self.add_item(Button(label="Sign Up", custom_id=encode_custom_id('signup', self.event_id, 'participant')))
             return
-        template = self.templates.get(event['template_name'])
+        template = self.templates.for_event(event)
         if not template:
             return
-        for role_name, role_info in template['roles'].items():
-            button = Button(
-                label=f"{role_name}",
-                emoji=role_info['emoji'],
-                custom_id=f"signup_{self.event_id}_{role_name}"
-            )
-            self.add_item(button)
+        for row, role_names in enumerate(template.button_rows):
+            for role_name in role_names:
+                button = Button(
+                    label=f"{role_name}",
+                    emoji=template.roles[role_name]['emoji'],
+                    custom_id=encode_custom_id('signup', self.event_id, role_name),
+                    row=row
+                )
+                self.add_item(button)
         # Add Cancel button
-        self.add_item(Button(label="Cancel", custom_id=f"cancel_{self.event_id}", style=discord.ButtonStyle.danger))
+        self.add_item(Button(label="Cancel", custom_id=encode_custom_id('cancel', self.event_id), style=discord.ButtonStyle.danger))
 
 class EventManagementView(View):
     def __init__(self, event_manager, event_id, timeout=None):
@@ -33,4 +35,85 @@ class EventManagementView(View):
         self.event_manager = event_manager
         self.event_id = event_id
         # Add management buttons
-        self.add_item(Button(label="Edit", custom_id=f"edit_{event_id}", style=discord.ButtonStyle.primary))
+        self.add_item(Button(label="Edit", custom_id=encode_custom_id('edit', event_id), style=discord.ButtonStyle.primary))
+
+class CreateEventModal(Modal, title='Create event'):
+    event_name = TextInput(label='Name', max_length=100)
+    description = TextInput(label='Description', style=discord.TextStyle.paragraph, required=False, max_length=1000)
+    start_date = TextInput(label='Start (YYYY-MM-DD HH:MM)', placeholder='2025-01-31 20:00', max_length=16)
+    template_name = TextInput(label='Template (optional)', required=False, max_length=50)
+
+    def __init__(self, event_manager):
+        super().__init__()
+        self.event_manager = event_manager
+
+    async def on_submit(self, interaction: discord.Interaction):
+        await self.event_manager.create_from_form(
+            interaction,
+            self.event_name.value,
+            self.description.value,
+            self.start_date.value,
+            self.template_name.value.strip() or None
+        )
+
+class EventListView(View):
+    """Previous / Next buttons over the pages of an event listing or search.
+
+    Every page is one keyset query seeking past the last event of the page
+    before it; the view keeps the cursor each shown page started from, so
+    going back re-reads a page without an OFFSET scan.
+    """
+
+    def __init__(self, db, interaction, title, status=None, words=None, page_size=10, timeout=300):
+        super().__init__(timeout=timeout)
+        self.db = db
+        self.interaction = interaction
+        self.title = title
+        self.status = status
+        self.words = words
+        self.page_size = page_size
+        self._cursors = [None]
+        self.events = []
+        self.has_more = False
+
+    async def load(self):
+        self.events, self.has_more = await self.db.list_events(
+            self.interaction.guild.id, status=self.status, words=self.words,
+            after=self._cursors[-1], limit=self.page_size
+        )
+        self.previous.disabled = len(self._cursors) == 1
+        self.next.disabled = not self.has_more
+
+    def render(self):
+        if not self.events:
+            return f"{self.title}: no events found."
+        lines = [f"{self.title} (page {len(self._cursors)})"]
+        lines.extend(
+            f"#{event['id']} {event['name']} - {event['start_date'].strftime('%Y-%m-%d %H:%M')} ({event['status']})"
+            for event in self.events
+        )
+        return '\n'.join(lines)
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        return interaction.user.id == self.interaction.user.id
+
+    @discord.ui.button(label='Previous', style=discord.ButtonStyle.secondary)
+    async def previous(self, interaction: discord.Interaction, button: Button):
+        if len(self._cursors) > 1:
+            self._cursors.pop()
+        await self.load()
+        await interaction.response.edit_message(content=self.render(), view=self)
+
+    @discord.ui.button(label='Next', style=discord.ButtonStyle.primary)
+    async def next(self, interaction: discord.Interaction, button: Button):
+        if self.events:
+            last = self.events[-1]
+            self._cursors.append((last['start_date'], last['id']))
+        await self.load()
+        await interaction.response.edit_message(content=self.render(), view=self)
+
+    async def on_timeout(self):
+        try:
+            await self.interaction.edit_original_response(view=None)
+        except discord.HTTPException:
+            pass
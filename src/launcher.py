@@ -0,0 +1,94 @@
+"""Run the bot as several worker processes, each on its own range of shards.
+
+    python src/launcher.py
+
+sharding.shard_count and sharding.workers in config.yml decide the split;
+every shard id from 0 to shard_count - 1 must belong to exactly one
+worker. The launcher hosts the broker the workers exchange cache
+invalidations through and restarts a worker that exits.
+"""
+import asyncio
+import logging
+import multiprocessing
+import signal
+from main import main as run_worker
+from utils.broker import Broker
+from utils.config_loader import ConfigLoader
+from utils.logging_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+RESTART_DELAY = 5.0
+
+def validate_sharding(sharding):
+    """Raise ValueError unless the workers cover every shard exactly once"""
+    shard_count = sharding.get('shard_count')
+    workers = sharding.get('workers') or []
+    if not shard_count or not workers:
+        raise ValueError("sharding.shard_count and sharding.workers must be set to use the launcher")
+    assigned = [shard_id for shard_ids in workers for shard_id in shard_ids]
+    if sorted(assigned) != list(range(shard_count)):
+        raise ValueError(f"sharding.workers must assign each shard id 0-{shard_count - 1} exactly once")
+    return workers
+
+class Launcher:
+    def __init__(self, config):
+        self.sharding = config.get('sharding') or {}
+        self.workers = validate_sharding(self.sharding)
+        self.broker = Broker(self.sharding.get('broker_host', '127.0.0.1'), self.sharding.get('broker_port', 9200))
+        # Spawned workers start from a clean interpreter instead of a copy of this one
+        self._context = multiprocessing.get_context('spawn')
+        self._processes = {}
+        self._stopping = asyncio.Event()
+
+    def _spawn(self, worker):
+        process = self._context.Process(target=run_worker, args=(worker,), name=f"worker-{worker}")
+        process.start()
+        self._processes[worker] = process
+        logger.info("Started worker %d (pid %d) for shards %s", worker, process.pid, self.workers[worker])
+
+    async def _supervise(self, worker):
+        loop = asyncio.get_running_loop()
+        while not self._stopping.is_set():
+            process = self._processes[worker]
+            await loop.run_in_executor(None, process.join)
+            if self._stopping.is_set():
+                break
+            logger.warning("Worker %d exited with code %s; restarting in %.0fs", worker, process.exitcode, RESTART_DELAY)
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=RESTART_DELAY)
+            except asyncio.TimeoutError:
+                self._spawn(worker)
+
+    def stop(self):
+        self._stopping.set()
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+
+    async def run(self):
+        await self.broker.start()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, self.stop)
+            except NotImplementedError:
+                # Windows event loops have no signal handlers; Python's own run on the main thread
+                signal.signal(signum, lambda *_: loop.call_soon_threadsafe(self.stop))
+        try:
+            for worker in range(len(self.workers)):
+                self._spawn(worker)
+            await asyncio.gather(*(self._supervise(worker) for worker in range(len(self.workers))))
+        finally:
+            await self.broker.stop()
+
+def main():
+    config = ConfigLoader().load_config()
+    listener = setup_logging(config.get('logging', {}).get('level', 'INFO'))
+    try:
+        asyncio.run(Launcher(config).run())
+    finally:
+        listener.stop()
+
+if __name__ == '__main__':
+    main()
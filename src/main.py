@@ -1,70 +1,381 @@
-﻿import discord
+﻿import asyncio
+from datetime import timedelta
+import logging
+import time
+import discord
 from discord.ext import commands
 import yaml
 import os
-import json
 from dotenv import load_dotenv
 from database.db_manager import DatabaseManager
+from events.message_updater import EventMessageUpdater
+from events.notifications import NotificationDispatcher
+from events.renderer import EventRenderer
+from events.router import ComponentRouter
+from events.archiver import EventArchiver
+from events.recurrence import SeriesExpander
+from events.scheduler import EventScheduler
+from events.conversations import ConversationDispatcher
+from events.templates import TemplateRegistry
+from events.views import EventSignupView
+from utils.broker import BrokerClient
 from utils.config_loader import ConfigLoader
+from utils.discord_metrics import COMMAND_SECONDS, COMPONENT_SECONDS, count_rate_limits, instrument_http
+from utils.guild_settings import GuildSettingsCache
+from utils.latency import InteractionLatencyTracker
+from utils.localization import LocalizationManager
+from utils.logging_config import setup_logging
+from utils.metrics import REGISTRY, LoopLagMonitor, MetricsServer
+from utils.startup import CommandSyncState, StartupTimer, sync_if_changed
 
 load_dotenv()
 
-class EventBot(commands.Bot):
-    def __init__(self):
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = [
+    'commands.admin_commands',
+    'commands.create_event',
+    'commands.edit_event',
+    'commands.close_event',
+    'commands.open_event',
+    'commands.delete_event',
+    'commands.recurring_events',
+    'commands.event_transfer',
+    'commands.list_events'
+]
+
+class EventBot(commands.AutoShardedBot):
+    """The bot, running either every shard or, under launcher.py, one worker's shard range.
+
+    With `worker` set, the process runs the shard ids listed for it under
+    sharding.workers in config.yml and joins the other workers through the
+    broker: database writes are published so their caches stay coherent,
+    and DMs (which Discord only delivers to shard 0) are relayed to the
+    process whose wizard is waiting for them.
+    """
+
+    def __init__(self, worker=None):
         intents = discord.Intents.default()
         intents.message_content = True
         intents.members = True
-        super().__init__(command_prefix='%', intents=intents)
-        self.config = ConfigLoader().load_config()
+        startup = StartupTimer()
+        with startup.phase('config'):
+            config = ConfigLoader().load_config()
+        sharding = config.get('sharding') or {}
+        super().__init__(
+            command_prefix='%',
+            intents=intents,
+            shard_count=sharding.get('shard_count'),
+            shard_ids=sharding['workers'][worker] if worker is not None else None
+        )
+        self.config = config
+        self.worker = worker
+        self.startup = startup
+        self._setup_finished = None
+        self._commands_checked = False
+        self.command_sync = CommandSyncState(self.config['bot'].get('command_sync_file', 'data/command_tree.json'))
         self.db = DatabaseManager()
         self.listening_channel = None
-        self.templates = {}
-        self.load_templates()
-
-    def load_templates(self):
-        template_dir = 'templates'
-        if not os.path.exists(template_dir):
-            os.makedirs(template_dir)
-        for filename in os.listdir(template_dir):
-            if filename.endswith('.json'):
-                with open(os.path.join(template_dir, filename), 'r') as f:
-                    try:
-                        template_name = filename[:-5]  # Remove .json extension
-                        self.templates[template_name] = json.load(f)
-                        print(f"Successfully loaded template: {template_name}")
-                    except json.JSONDecodeError as e:
-                        print(f"Error loading template {filename}: {e}")
+        self.localization = LocalizationManager(self.config['bot'].get('default_language', 'en'))
+        self.localization.report_missing()
+        self.guild_settings = GuildSettingsCache(self)
+        template_config = self.config.get('templates', {})
+        self.templates = TemplateRegistry(
+            template_config.get('directory', 'templates'),
+            poll_interval=template_config.get('reload_interval', 5.0)
+        )
+        with self.startup.phase('templates'):
+            self.templates.load()
+        self.renderer = EventRenderer(self.templates)
+        self.message_updater = EventMessageUpdater(
+            self.render_event_message,
+            delay=self.config['bot'].get('message_edit_delay', 1.0),
+            # One event message per cached event
+            max_messages=self.db.cache.max_size
+        )
+        self.interaction_latency = InteractionLatencyTracker()
+        self.router = ComponentRouter()
+        self.notifier = NotificationDispatcher(self, concurrency=self.config['bot'].get('notification_concurrency', 5))
+        scheduler_config = self.config.get('scheduler', {})
+        self.scheduler = EventScheduler(
+            self,
+            reminder_offsets=scheduler_config.get('reminder_offsets', [60]),
+            auto_close=scheduler_config.get('auto_close', True),
+            notify_on_close=scheduler_config.get('notify_on_close', False),
+            horizon=timedelta(hours=scheduler_config.get('horizon_hours', 24)),
+            missed_grace=timedelta(minutes=scheduler_config.get('missed_reminder_grace', 10))
+        )
+        recurrence_config = self.config.get('recurrence', {})
+        self.series = SeriesExpander(
+            self,
+            window=timedelta(days=recurrence_config.get('window_days', 14)),
+            interval=timedelta(hours=recurrence_config.get('interval_hours', 1)),
+            post_interval=recurrence_config.get('post_interval', 1.0)
+        )
+        archive_config = self.config.get('archive', {})
+        self.archiver = None
+        # One worker is enough to archive for every shard
+        if archive_config.get('enabled', True) and worker in (None, 0):
+            self.archiver = EventArchiver(
+                self,
+                after=timedelta(days=archive_config.get('after_days', 30)),
+                batch_size=archive_config.get('batch_size', 500),
+                interval=timedelta(hours=archive_config.get('interval_hours', 6))
+            )
+        self.conversations = ConversationDispatcher()
+        self.add_listener(self.conversations.on_message, 'on_message')
+        self.broker = None
+        if worker is not None:
+            self.broker = BrokerClient(sharding.get('broker_host', '127.0.0.1'), sharding.get('broker_port', 9200))
+            self.db.add_listener(lambda kind, key: self.broker.publish('invalidate', kind=kind, key=key))
+            self.broker.subscribe('invalidate', self.on_remote_invalidate)
+            self.broker.subscribe('conversation_message', self.on_relayed_message)
+            self.broker.add_resync_listener(self.on_broker_resync)
+            self.add_listener(self.relay_direct_message, 'on_message')
+        metrics_config = self.config.get('metrics', {})
+        self.loop_lag = LoopLagMonitor(metrics_config.get('loop_lag_interval', 0.5))
+        self.metrics_server = None
+        if metrics_config.get('enabled', False):
+            self.metrics_server = MetricsServer(
+                host=metrics_config.get('host', '127.0.0.1'),
+                # Workers on one host each take the next port
+                port=metrics_config.get('port', 9108) + (worker or 0)
+            )
+        self.tree.error(self.on_app_command_error)
+
+    def register_metrics(self):
+        """Expose the in-process caches' own counters on the metrics endpoint"""
+        REGISTRY.add_stats('eventbot_event_cache', 'Event row and roster cache', lambda: self.db.cache.stats())
+        REGISTRY.add_stats(
+            'eventbot_recent_events', 'Per-guild recent events served to autocomplete', lambda: self.db.recent_events.stats()
+        )
+        REGISTRY.add_stats('eventbot_renderer', 'Rendered role section cache', self.renderer.stats)
+        REGISTRY.add_stats('eventbot_message_updater', 'Coalesced event message edits', self.message_updater.stats)
+        REGISTRY.add_stats('eventbot_interactions', 'Recent interaction latency', self.interaction_latency.stats)
+        REGISTRY.add_stats('eventbot_scheduler', 'Reminder and auto-close scheduler', self.scheduler.stats)
+        REGISTRY.add_stats('eventbot_series', 'Recurring event generation and paced posts', self.series.stats)
+        if self.archiver:
+            REGISTRY.add_stats('eventbot_archiver', 'Past events moved to the archive tables', self.archiver.stats)
+        REGISTRY.add_stats('eventbot_conversations', 'Open setup and creation wizards', self.conversations.stats)
+        if self.broker:
+            REGISTRY.add_stats('eventbot_broker', 'Cross-process invalidation broker', self.broker.stats)
 
     async def setup_hook(self):
-        await self.load_extension('commands.admin_commands')
-        await self.load_extension('commands.create_event')
-        await self.load_extension('commands.edit_event')
-        await self.load_extension('commands.close_event')
-        await self.load_extension('commands.open_event')
-        await self.load_extension('commands.delete_event')
+        instrument_http(self.http)
+        count_rate_limits()
+        self.register_metrics()
+        self.loop_lag.start()
+        self.conversations.start()
+        if self.broker:
+            self.broker.start()
+        if self.metrics_server:
+            try:
+                await self.metrics_server.start()
+            except OSError as e:
+                logger.error("Error starting metrics server: %s", e)
+        with self.startup.phase('db_connect'):
+            await self.db.connect()
+        with self.startup.phase('template_revisions'):
+            await self.sync_template_revisions()
+        with self.startup.phase('guild_settings'):
+            try:
+                await self.guild_settings.load()
+            except Exception as e:
+                logger.error("Error loading guild settings: %s", e)
+        with self.startup.phase('cogs'):
+            await self.load_extensions()
+        with self.startup.phase('views'):
+            await self.restore_event_views()
+        with self.startup.phase('scheduler'):
+            try:
+                await self.scheduler.start()
+            except Exception as e:
+                logger.error("Error starting the event scheduler: %s", e)
+        self.series.start()
+        if self.archiver:
+            self.archiver.start()
+        self._setup_finished = time.perf_counter()
+
+    async def load_extensions(self):
+        """Load the cogs listed under bot.extensions (all of them by default), in that order"""
+        for name in self.config['bot'].get('extensions') or EXTENSIONS:
+            try:
+                await self.load_extension(name)
+            except commands.ExtensionError as e:
+                logger.error("Error loading extension %s: %s", name, e)
+
+    async def sync_template_revisions(self):
+        """Persist the loaded template revisions and restore the ones open events are pinned to"""
+        try:
+            await self.db.store_template_revisions(self.templates.values())
+            for row in await self.db.get_pinned_template_revisions():
+                self.templates.add_revision(row['template_name'], row['version'], row['body'])
+        except Exception as e:
+            logger.error("Error syncing template revisions: %s", e)
+        self.templates.add_listener(lambda changed: asyncio.create_task(self._store_template_revisions(changed)))
+        self.templates.start()
+
+    async def _store_template_revisions(self, templates):
+        try:
+            await self.db.store_template_revisions(templates)
+        except Exception as e:
+            logger.error("Error storing template revisions: %s", e)
+
+    async def restore_event_views(self):
+        """Re-attach signup views to every open event message using a single query"""
+        try:
+            events = await self.db.get_open_events()
+        except Exception as e:
+            logger.error("Error restoring event views: %s", e)
+            return
+        create_event_command = self.get_cog('CreateEventCommand')
+        events = [event for event in events if self.owns_guild(event['guild_id'])]
+        for event in events:
+            self.add_view(EventSignupView(create_event_command, event, self.templates), message_id=event['message_id'])
+        logger.info("Restored %d event views", len(events))
+
+    async def render_event_message(self, event_id):
+        """Render the current state of an event as message content"""
+        event, participants = await self.db.get_roster(event_id)
+        if not event:
+            raise ValueError("Event not found")
+        return self.renderer.render_text(event, participants)
+
+    async def get_event_message(self, event_id):
+        """Return a partial message for the event's posted message from the index, or None"""
+        location = await self.db.get_event_message(event_id)
+        if not location:
+            return None
+        channel = self.get_channel(location['channel_id']) or self.get_partial_messageable(location['channel_id'])
+        return channel.get_partial_message(location['message_id'])
+
+    async def refresh_event_message(self, event_id):
+        """Queue a re-render of the event's posted message, if it has one"""
+        message = await self.get_event_message(event_id)
+        if message:
+            self.message_updater.request_update(event_id, message)
+
+    async def close(self):
+        self.message_updater.stop()
+        self.templates.stop()
+        self.notifier.stop()
+        self.scheduler.stop()
+        self.series.stop()
+        if self.archiver:
+            self.archiver.stop()
+        self.conversations.stop()
+        if self.broker:
+            self.broker.stop()
+        self.loop_lag.stop()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        await super().close()
+        self.db.close()
+
+    def text(self, guild_id, key_path, **kwargs):
+        """Translated text in the language selected for a guild"""
+        return self.localization.get_guild_text(guild_id, key_path, **kwargs)
+
+    def owns_guild(self, guild_id):
+        """Whether guild_id is on one of the shards this process runs"""
+        if self.shard_ids is None:
+            return True
+        return (guild_id >> 22) % self.shard_count in self.shard_ids
+
+    def on_remote_invalidate(self, data):
+        """Another worker wrote to the database: forget what this process cached"""
+        if data['kind'] == 'event':
+            self.db.cache.invalidate(data['key'])
+            self.db.recent_events.invalidate_event(data['key'])
+        elif data['kind'] == 'guild':
+            return self.guild_settings.reload(data['key'])
+
+    async def on_broker_resync(self):
+        # Invalidations sent while this process (or a peer) was disconnected may be lost
+        self.db.cache.clear()
+        self.db.recent_events.clear()
+        await self.guild_settings.load()
+
+    async def relay_direct_message(self, message):
+        """Forward DM replies to the worker whose wizard is waiting for them"""
+        if message.guild is not None or message.author.bot:
+            return
+        if (message.author.id, message.channel.id) in self.conversations:
+            return
+        self.broker.publish(
+            'conversation_message',
+            user_id=message.author.id, channel_id=message.channel.id, content=message.content
+        )
+
+    async def on_relayed_message(self, data):
+        await self.conversations.route(data['user_id'], data['channel_id'], data['content'])
 
     async def on_ready(self):
-        print(f'{self.user} has connected to Discord')
-        await self.tree.sync()
+        logger.info("%s has connected to Discord", self.user)
+        # on_ready fires again after every reconnect; startup work happens once per process
+        if self._commands_checked:
+            return
+        self._commands_checked = True
+        if self._setup_finished is not None:
+            self.startup.record('gateway_ready', time.perf_counter() - self._setup_finished)
+        self.startup.record('total', self.startup.since_start())
+        self.startup.log()
+        if self.worker not in (None, 0):
+            # Commands are global: one worker syncing them is enough
+            return
+        try:
+            await sync_if_changed(self.tree, self.application_id, self.command_sync)
+        except discord.HTTPException as e:
+            logger.error("Error syncing application commands: %s", e)
+
+    async def on_app_command_completion(self, interaction: discord.Interaction, command):
+        COMMAND_SECONDS.labels(command.qualified_name, 'ok').observe(self.interaction_latency.elapsed(interaction))
+
+    async def on_app_command_error(self, interaction: discord.Interaction, error):
+        command = interaction.command
+        name = command.qualified_name if command else 'unknown'
+        COMMAND_SECONDS.labels(name, type(error).__name__).observe(self.interaction_latency.elapsed(interaction))
+        logger.error("Ignoring exception in command %r", name, exc_info=error)
+
+    async def on_guild_channel_delete(self, channel):
+        self.guild_settings.invalidate_channel(channel)
+
+    async def on_guild_remove(self, guild):
+        self.guild_settings.invalidate_guild(guild.id)
+
+    async def acknowledge(self, interaction: discord.Interaction, name: str):
+        """Defer the response before any other work so the 3 second deadline is always met"""
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        self.interaction_latency.record_ack(interaction, name)
 
     async def on_interaction(self, interaction: discord.Interaction):
         if interaction.type == discord.InteractionType.component:
-            custom_id = interaction.data.get('custom_id', ' ')
-            if custom_id.startswith('signup_'):
-                event_id = int(custom_id.split('_')[1])
-                role_name = custom_id.split('_')[2]
-                create_event_command = self.get_cog('CreateEventCommand')
-                if create_event_command:
-                    await create_event_command.handle_signup(interaction, event_id, role_name)
-            elif custom_id.startswith('cancel_'):
-                event_id = int(custom_id.split('_')[1])
-                create_event_command = self.get_cog('CreateEventCommand')
-                if create_event_command:
-                    await create_event_command.handle_cancel(interaction)
-
-def main():
-    bot = EventBot()
-    bot.run(os.getenv('DISCORD_TOKEN'))
+            route = self.router.resolve(interaction.data.get('custom_id', ' '))
+            if route is None:
+                return
+            action, handler, defer, args = route
+            started = time.perf_counter()
+            outcome = 'ok'
+            try:
+                if defer:
+                    await self.acknowledge(interaction, action)
+                await handler(interaction, *args)
+            except Exception as e:
+                outcome = type(e).__name__
+                raise
+            finally:
+                COMPONENT_SECONDS.labels(action, outcome).observe(time.perf_counter() - started)
+            self.interaction_latency.record_done(interaction)
+
+def main(worker=None):
+    config = ConfigLoader().load_config()
+    listener = setup_logging(config.get('logging', {}).get('level', 'INFO'))
+    try:
+        bot = EventBot(worker)
+        # Logging is already configured; keep discord.py from adding its own handler
+        bot.run(os.getenv('DISCORD_TOKEN'), log_handler=None)
+    finally:
+        listener.stop()
 
 if __name__ == '__main__':
     main()
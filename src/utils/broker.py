@@ -0,0 +1,215 @@
+import asyncio
+from collections import deque
+import inspect
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A client whose socket buffer grows past this is disconnected; it drops its
+# caches when it reconnects, which is cheaper than queueing without bound
+MAX_CLIENT_BUFFER = 1024 * 1024
+# Messages a disconnected client keeps for replay; past this its peers are told to resync
+MAX_PENDING_MESSAGES = 1000
+# Asks every other client to drop its caches, as if it had reconnected itself
+RESYNC_TOPIC = 'resync'
+
+class Broker:
+    """A minimal local pub/sub relay standing in for Redis between worker processes.
+
+    Clients send newline-delimited JSON messages; each line is relayed
+    unparsed to every other connected client. Nothing is stored, so a
+    client that was disconnected must assume it missed messages.
+    """
+
+    def __init__(self, host='127.0.0.1', port=9200):
+        self.host = host
+        self.port = port
+        self._server = None
+        self._clients = set()
+        self._handlers = set()
+        self.relayed = 0
+        self.disconnected = 0
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        logger.info("Broker listening on %s:%s", self.host, self.port)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._clients):
+                writer.close()
+            # Closing the sockets ends each handler at its next read
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve(self, reader, writer):
+        self._clients.add(writer)
+        self._handlers.add(asyncio.current_task())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                for client in list(self._clients):
+                    if client is writer:
+                        continue
+                    if client.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+                        logger.warning("Dropping a broker client that stopped reading")
+                        self._clients.discard(client)
+                        self.disconnected += 1
+                        client.close()
+                        continue
+                    client.write(line)
+                self.relayed += 1
+        except (ConnectionError, ValueError) as e:
+            logger.warning("Broker client error: %s", e)
+        finally:
+            self._clients.discard(writer)
+            self._handlers.discard(asyncio.current_task())
+            writer.close()
+
+class BrokerClient:
+    """One worker's connection to the Broker.
+
+    publish() never waits: while disconnected, messages are queued (up to
+    MAX_PENDING_MESSAGES) and sent once the connection is back. If the
+    queue overflowed, the oldest messages are dropped and a resync message
+    goes out first, so the other processes drop their caches instead of
+    missing invalidations. subscribe(topic, callback) runs callback(data)
+    for every message other processes publish on topic; coroutine
+    callbacks are run as tasks. Resync listeners run after every connect,
+    the first included, and whenever another process asks for a resync,
+    so the caller can drop whatever it may have missed invalidations for.
+    """
+
+    def __init__(self, host='127.0.0.1', port=9200, reconnect_delay=1.0, max_pending=MAX_PENDING_MESSAGES):
+        self.host = host
+        self.port = port
+        self.reconnect_delay = reconnect_delay
+        self._handlers = {}
+        self._resync_listeners = []
+        self._writer = None
+        self._task = None
+        self._pending = deque(maxlen=max_pending)
+        self._overflowed = False
+        self.published = 0
+        self.received = 0
+        self.dropped = 0
+        self.replayed = 0
+        self.reconnects = 0
+        self.resyncs = 0
+
+    @property
+    def connected(self):
+        return self._writer is not None
+
+    def subscribe(self, topic, callback):
+        self._handlers.setdefault(topic, []).append(callback)
+
+    def add_resync_listener(self, callback):
+        self._resync_listeners.append(callback)
+
+    def publish(self, topic, **data):
+        line = json.dumps({'topic': topic, 'data': data}).encode() + b'\n'
+        if self._writer is None:
+            if len(self._pending) == self._pending.maxlen:
+                self.dropped += 1
+                self._overflowed = True
+            self._pending.append(line)
+            return
+        self._writer.write(line)
+        self.published += 1
+
+    def _replay(self):
+        """Send what was published while disconnected, behind a resync if some of it was lost"""
+        if self._overflowed:
+            self._writer.write(json.dumps({'topic': RESYNC_TOPIC, 'data': {}}).encode() + b'\n')
+            self._overflowed = False
+        self.replayed += len(self._pending)
+        self.published += len(self._pending)
+        self._writer.writelines(self._pending)
+        self._pending.clear()
+
+    def _resync(self):
+        self.resyncs += 1
+        for callback in self._resync_listeners:
+            self._call(callback)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    async def _run(self):
+        connected_before = False
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError as e:
+                logger.warning("Cannot reach the broker at %s:%s: %s", self.host, self.port, e)
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+            self._writer = writer
+            self._replay()
+            if connected_before:
+                self.reconnects += 1
+            connected_before = True
+            # Whatever was cached before this connection may have missed invalidations
+            self._resync()
+            logger.info("Connected to the broker at %s:%s", self.host, self.port)
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    self._dispatch(line)
+            except ConnectionError as e:
+                logger.warning("Lost the broker connection: %s", e)
+            finally:
+                self._writer = None
+                writer.close()
+            await asyncio.sleep(self.reconnect_delay)
+
+    def _dispatch(self, line):
+        try:
+            message = json.loads(line)
+        except ValueError:
+            logger.warning("Ignoring malformed broker message: %r", line[:100])
+            return
+        self.received += 1
+        if message.get('topic') == RESYNC_TOPIC:
+            self._resync()
+            return
+        for callback in self._handlers.get(message.get('topic'), ()):
+            self._call(callback, message.get('data', {}))
+
+    @staticmethod
+    def _call(callback, *args):
+        try:
+            result = callback(*args)
+            if inspect.isawaitable(result):
+                asyncio.create_task(result)
+        except Exception as e:
+            logger.exception("Error in broker callback: %s", e)
+
+    def stats(self):
+        return {
+            'connected': int(self.connected),
+            'published': self.published,
+            'received': self.received,
+            'pending': len(self._pending),
+            'dropped': self.dropped,
+            'replayed': self.replayed,
+            'reconnects': self.reconnects,
+            'resyncs': self.resyncs
+        }
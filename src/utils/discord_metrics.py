@@ -0,0 +1,57 @@
+import logging
+import time
+import discord
+from utils.metrics import REGISTRY
+
+COMMAND_SECONDS = REGISTRY.histogram(
+    'eventbot_command_seconds', 'Slash command latency from interaction creation to completion',
+    ['command', 'outcome']
+)
+COMPONENT_SECONDS = REGISTRY.histogram(
+    'eventbot_component_handler_seconds', 'Run time of component (button) handlers', ['action', 'outcome']
+)
+DISCORD_API_SECONDS = REGISTRY.histogram(
+    'eventbot_discord_api_seconds', 'Discord REST call latency, including rate limit waits',
+    ['method', 'route', 'status']
+)
+DISCORD_RATE_LIMITS = REGISTRY.counter(
+    'eventbot_discord_rate_limits_total', 'Rate limited (429) Discord REST responses', ['scope']
+)
+
+def instrument_http(http):
+    """Time every REST request the client makes, labelled by route template"""
+    request = http.request
+
+    async def timed_request(route, **kwargs):
+        started = time.perf_counter()
+        status = 'ok'
+        try:
+            return await request(route, **kwargs)
+        except discord.RateLimited:
+            status = '429'
+            raise
+        except discord.HTTPException as e:
+            status = str(e.status)
+            raise
+        except Exception:
+            status = 'error'
+            raise
+        finally:
+            DISCORD_API_SECONDS.labels(route.method, route.path, status).observe(time.perf_counter() - started)
+
+    http.request = timed_request
+
+class RateLimitLogHandler(logging.Handler):
+    """Counts the 429s discord.py handles internally, which it only reports by logging"""
+
+    def emit(self, record):
+        message = str(record.msg)
+        if message.startswith('Global rate limit has been hit'):
+            DISCORD_RATE_LIMITS.labels('global').inc()
+        elif message.startswith('We are being rate limited'):
+            DISCORD_RATE_LIMITS.labels('route').inc()
+
+def count_rate_limits():
+    logger = logging.getLogger('discord.http')
+    if not any(isinstance(handler, RateLimitLogHandler) for handler in logger.handlers):
+        logger.addHandler(RateLimitLogHandler(logging.WARNING))
@@ -0,0 +1,77 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+class GuildSettingsCache:
+    """Per-guild settings held in memory, written through to the database.
+
+    All rows are loaded at startup; a guild without a row is looked up
+    once and remembered as unset. The resolved listening channel is kept
+    alongside the settings and dropped when the gateway reports the
+    channel or guild is gone.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._settings = {}
+        self._channels = {}
+
+    async def load(self):
+        """Replace the cache with every stored guild_settings row"""
+        rows = await self.bot.db.get_all_guild_settings()
+        self._settings = {row['guild_id']: row for row in rows}
+        self._channels.clear()
+        for row in rows:
+            self.bot.localization.set_guild_language(row['guild_id'], row.get('language'))
+        logger.info("Loaded settings for %d guilds", len(rows))
+
+    async def get(self, guild_id):
+        if guild_id not in self._settings:
+            settings = await self.bot.db.get_guild_settings(guild_id)
+            self._settings[guild_id] = settings
+            if settings:
+                self.bot.localization.set_guild_language(guild_id, settings.get('language'))
+        return self._settings.get(guild_id)
+
+    async def update(self, guild_id, listening_channel):
+        await self.bot.db.update_guild_settings(guild_id, listening_channel=listening_channel)
+        settings = dict(await self.get(guild_id) or {'guild_id': guild_id, 'language': None})
+        settings['listening_channel'] = listening_channel
+        self._settings[guild_id] = settings
+        self._channels.pop(guild_id, None)
+
+    async def update_language(self, guild_id, language):
+        await self.bot.db.update_guild_language(guild_id, language)
+        settings = dict(await self.get(guild_id) or {'guild_id': guild_id, 'listening_channel': None})
+        settings['language'] = language
+        self._settings[guild_id] = settings
+        self.bot.localization.set_guild_language(guild_id, language)
+
+    async def get_listening_channel(self, guild_id):
+        """Return the guild's listening channel object, or None if unset or gone"""
+        channel = self._channels.get(guild_id)
+        if channel is not None:
+            return channel
+        settings = await self.get(guild_id)
+        if not settings or not settings.get('listening_channel'):
+            return None
+        channel = self.bot.get_channel(settings['listening_channel'])
+        if channel is not None:
+            self._channels[guild_id] = channel
+        return channel
+
+    def invalidate_channel(self, channel):
+        """Forget a deleted channel so it is resolved again (and found missing) next time"""
+        guild_id = channel.guild.id
+        cached = self._channels.get(guild_id)
+        if cached is not None and cached.id == channel.id:
+            del self._channels[guild_id]
+
+    def invalidate_guild(self, guild_id):
+        self._settings.pop(guild_id, None)
+        self._channels.pop(guild_id, None)
+
+    async def reload(self, guild_id):
+        """Re-read one guild's settings after another process changed them"""
+        self.invalidate_guild(guild_id)
+        await self.get(guild_id)
@@ -0,0 +1,63 @@
+from collections import deque
+import logging
+import discord
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Discord fails an interaction that is not acknowledged within 3 seconds
+INTERACTION_DEADLINE = 3.0
+
+INTERACTION_ACK_SECONDS = REGISTRY.histogram(
+    'eventbot_interaction_ack_seconds', 'Time from interaction creation to acknowledgement', ['name']
+)
+MISSED_DEADLINE = REGISTRY.counter(
+    'eventbot_interaction_missed_deadline_total', 'Interactions acknowledged after the 3 second deadline'
+)
+
+class InteractionLatencyTracker:
+    """Keeps recent interaction latencies measured from Discord's creation time"""
+
+    def __init__(self, samples=1000, warn_after=2.0):
+        self.warn_after = warn_after
+        self.ack = deque(maxlen=samples)
+        self.total = deque(maxlen=samples)
+        self.missed_deadline = 0
+
+    @staticmethod
+    def elapsed(interaction):
+        return (discord.utils.utcnow() - interaction.created_at).total_seconds()
+
+    def record_ack(self, interaction, name):
+        seconds = self.elapsed(interaction)
+        self.ack.append(seconds)
+        INTERACTION_ACK_SECONDS.labels(name).observe(seconds)
+        if seconds >= INTERACTION_DEADLINE:
+            self.missed_deadline += 1
+            MISSED_DEADLINE.inc()
+            logger.warning("Interaction %s acknowledged after the deadline (%.2fs)", name, seconds)
+        elif seconds >= self.warn_after:
+            logger.warning("Interaction %s acknowledged close to the deadline (%.2fs)", name, seconds)
+        return seconds
+
+    def record_done(self, interaction):
+        seconds = self.elapsed(interaction)
+        self.total.append(seconds)
+        return seconds
+
+    @staticmethod
+    def _percentile(samples, fraction):
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def stats(self):
+        return {
+            'ack_p50': self._percentile(self.ack, 0.50),
+            'ack_p95': self._percentile(self.ack, 0.95),
+            'ack_p99': self._percentile(self.ack, 0.99),
+            'total_p50': self._percentile(self.total, 0.50),
+            'total_p95': self._percentile(self.total, 0.95),
+            'missed_deadline': self.missed_deadline
+        }
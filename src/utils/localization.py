@@ -1,23 +1,118 @@
 ﻿import os
 import json
+import logging
+from string import Formatter
+
+logger = logging.getLogger(__name__)
+
+LOCALIZATION_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'localization')
+KEY_SEPARATOR = '-'
+# The language of the built-in catalog, used when the configured default has no file
+FALLBACK_LANGUAGE = 'en'
+
+class CompiledText:
+    """A translation string parsed once; static text skips formatting entirely"""
+
+    __slots__ = ('text', 'fields')
+
+    def __init__(self, text):
+        self.text = text
+        self.fields = frozenset(field for _, field, _, _ in Formatter().parse(text) if field is not None)
+
+    def format(self, kwargs):
+        if not self.fields:
+            return self.text
+        return self.text.format_map(kwargs)
+
+def flatten(translations, prefix=''):
+    """Turn nested translation dicts into {'event-create-start': text}"""
+    flat = {}
+    for key, value in translations.items():
+        path = f"{prefix}{KEY_SEPARATOR}{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        elif isinstance(value, str):
+            flat[path] = value
+    return flat
 
 class LocalizationManager:
-    def __init__(self, default_language='en'):
+    """Translation catalogs flattened at load time with fallbacks already applied"""
+
+    def __init__(self, default_language='en', directory=LOCALIZATION_DIR):
         self.default_language = default_language
+        self.directory = directory
         self.translations = {}
+        self.catalogs = {}
+        self._guild_languages = {}
         self.load_translations()
 
     def load_translations(self):
         """Load all translation files from the localization directory"""
-        localization_dir = 'src/localization'
-        if not os.path.exists(localization_dir):
-            os.makedirs(localization_dir)
-            self._create_default_translation(localization_dir)
-        for filename in os.listdir(localization_dir):
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        if not os.path.exists(os.path.join(self.directory, f'{self.default_language}.json')):
+            if self.default_language != FALLBACK_LANGUAGE:
+                logger.error(
+                    "No translations for default language %s in %s, using %s",
+                    self.default_language, self.directory, FALLBACK_LANGUAGE
+                )
+                self.default_language = FALLBACK_LANGUAGE
+            if not os.path.exists(os.path.join(self.directory, f'{FALLBACK_LANGUAGE}.json')):
+                self._create_default_translation(self.directory)
+        for filename in os.listdir(self.directory):
             if filename.endswith('.json'):
                 language_code = filename[:-5]  # Remove .json extension
-                with open(os.path.join(localization_dir, filename), 'r', encoding='utf-8') as f:
+                with open(os.path.join(self.directory, filename), 'r', encoding='utf-8') as f:
                     self.translations[language_code] = json.load(f)
+        self._compile()
+
+    def _compile(self):
+        """Build one flat catalog per language, filling gaps from the default language"""
+        default = {key: CompiledText(text) for key, text in flatten(self.translations[self.default_language]).items()}
+        catalogs = {}
+        for language_code, translations in self.translations.items():
+            catalog = dict(default)
+            catalog.update((key, CompiledText(text)) for key, text in flatten(translations).items())
+            catalogs[language_code] = catalog
+        self.catalogs = catalogs
+
+    def validate(self):
+        """Return {language: (missing_keys, unknown_keys)} compared with the default language"""
+        reference = set(flatten(self.translations[self.default_language]))
+        report = {}
+        for language_code, translations in self.translations.items():
+            keys = set(flatten(translations))
+            missing = sorted(reference - keys)
+            unknown = sorted(keys - reference)
+            if missing or unknown:
+                report[language_code] = (missing, unknown)
+        return report
+
+    def mismatched_placeholders(self):
+        """Return {language: [keys]} whose {fields} differ from the default language"""
+        default = self.catalogs[self.default_language]
+        report = {}
+        for language_code, catalog in self.catalogs.items():
+            keys = sorted(key for key, text in catalog.items() if key in default and text.fields != default[key].fields)
+            if keys:
+                report[language_code] = keys
+        return report
+
+    def report_missing(self):
+        """Log the validation report; meant to run once at startup"""
+        for language_code, (missing, unknown) in self.validate().items():
+            if missing:
+                logger.warning(
+                    "Language %s is missing %d keys (falls back to %s): %s",
+                    language_code, len(missing), self.default_language, ', '.join(missing)
+                )
+            if unknown:
+                logger.warning(
+                    "Language %s has %d keys unknown to %s: %s",
+                    language_code, len(unknown), self.default_language, ', '.join(unknown)
+                )
+        for language_code, keys in self.mismatched_placeholders().items():
+            logger.warning("Language %s uses different placeholders for: %s", language_code, ', '.join(keys))
 
     def _create_default_translation(self, directory):
         """Create default English translation file if it doesn't exist"""
@@ -28,26 +123,38 @@ class LocalizationManager:
                     "name_prompt": "Please provide a name for the event.",
                     "description_prompt": "Please provide a description for the event.",
                     "start_date_prompt": "When will the event start? (Format: YYYY-MM-DD HH:MM)",
+                    "use_template_prompt": "Do you want to use a template for this event? (yes/no)",
+                    "template_name_prompt": "Please provide the template name.",
+                    "check_dms": "Check your DMs to set up the event.",
+                    "dm_forbidden": "I can't send you a DM. Please check your privacy settings.",
                     "success": "Event created successfully! Event ID: {event_id}",
                     "error": "Error creating event: {error}",
                     "timeout": "Event creation timed out. Please try again."
                 },
                 "edit": {
                     "prompt": "What would you like to edit?",
+                    "invalid_field": "Invalid field. Please try again.",
                     "success": "Event updated successfully!",
+                    "reposted": "Created a new event message.",
+                    "notifying": "Event updated. Notifying participants...",
+                    "notification": "Event '{name}' has been updated.",
                     "error": "Error updating event: {error}"
                 },
                 "close": {
                     "success": "Event {event_id} has been closed.",
+                    "notifying": "Event {event_id} has been closed. Notifying participants...",
+                    "notification": "Event '{name}' has been closed.",
                     "error": "Error closing event: {error}"
                 },
                 "open": {
                     "success": "Event {event_id} has been reopened.",
+                    "notifying": "Event {event_id} has been reopened. Notifying participants...",
+                    "notification": "Event '{name}' has been reopened.",
                     "error": "Error opening event: {error}"
                 },
                 "delete": {
                     "confirm": "Are you sure you want to delete this event?",
-                    "success": "Event deleted successfully.",
+                    "success": "Event {event_id} has been deleted.",
                     "error": "Error deleting event: {error}"
                 }
             },
@@ -58,7 +165,9 @@ class LocalizationManager:
                 "event_ended": "This event has already ended.",
                 "event_closed": "This event is closed.",
                 "role_full": "This role is already full.",
-                "invalid_role": "Invalid role selected."
+                "invalid_role": "Invalid role selected.",
+                "no_listening_channel": "Listening channel not set for this guild.",
+                "listening_channel_missing": "Listening channel not found."
             },
             "buttons": {
                 "sign_up": "Sign Up",
@@ -67,28 +176,34 @@ class LocalizationManager:
                 "edit": "Edit Event"
             }
         }
-        with open(os.path.join(directory, 'en.json'), 'w', encoding='utf-8') as f:
+        with open(os.path.join(directory, f'{FALLBACK_LANGUAGE}.json'), 'w', encoding='utf-8') as f:
             json.dump(default_translations, f, indent=2)
 
     def get_text(self, language_code, key_path, **kwargs):
         """Get translated text for a given key path and language"""
-        language = self.translations.get(language_code, self.translations[self.default_language])
-        # Navigate through the nested dictionary using the key path
-        keys = key_path.split('-')
-        text = language
-        for key in keys:
-            text = text.get(key, None)
-        if isinstance(text, str):
-            return text.format(**kwargs)
-        else:
-            # If translation is missing, try default language
-            if language_code != self.default_language:
-                return self.get_text(self.default_language, key_path, **kwargs)
+        catalog = self.catalogs.get(language_code) or self.catalogs[self.default_language]
+        text = catalog.get(key_path)
+        if text is None:
             return f"Missing translation: {key_path}"
+        return text.format(kwargs)
+
+    def set_guild_language(self, guild_id, language_code):
+        if language_code:
+            self._guild_languages[guild_id] = language_code
+        else:
+            self._guild_languages.pop(guild_id, None)
+
+    def guild_language(self, guild_id):
+        return self._guild_languages.get(guild_id, self.default_language)
+
+    def get_guild_text(self, guild_id, key_path, **kwargs):
+        """Get translated text in the language selected for a guild"""
+        return self.get_text(self._guild_languages.get(guild_id, self.default_language), key_path, **kwargs)
 
     def add_language(self, language_code, translations):
         """Add a new language to the system"""
-        filepath = f"src/localization/{language_code}.json"
+        filepath = os.path.join(self.directory, f"{language_code}.json")
         with open(filepath, 'w', encoding='utf-8') as f:
             json.dump(translations, f, indent=2)
         self.translations[language_code] = translations
+        self._compile()
@@ -0,0 +1,25 @@
+import logging
+import logging.handlers
+import queue
+import sys
+
+LOG_FORMAT = '%(asctime)s %(levelname)-8s %(name)s: %(message)s'
+
+def setup_logging(level='INFO', stream=None):
+    """Route every log record through a queue drained by a background thread.
+
+    Loggers only append to an unbounded queue, so a slow terminal or disk
+    never blocks the event loop. Returns the started QueueListener; call
+    stop() on it at shutdown to flush what is left.
+    """
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+    listener.start()
+    return listener
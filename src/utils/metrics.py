@@ -0,0 +1,250 @@
+import asyncio
+import bisect
+import logging
+import math
+import threading
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def labels(self, *values):
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        values = tuple(str(value) for value in values)
+        with self._lock:
+            child = self._children.get(values)
+            if child is None:
+                child = self._children[values] = self._new_child()
+        return child
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} needs labels {self.labelnames}")
+        return self.labels()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in sorted(children):
+            lines.extend(child.render(self.name, self.labelnames, values))
+        return lines
+
+class _Value:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+    def render(self, name, labelnames, values):
+        return [f"{name}{_format_labels(labelnames, values)} {_format_value(self.value)}"]
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def set(self, value):
+        self._default().set(value)
+
+class _Buckets:
+    def __init__(self, bounds):
+        self._lock = threading.Lock()
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def render(self, name, labelnames, values):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + (math.inf,), counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labelnames, values, [('le', _format_value(bound))])} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, values)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, values)} {cumulative}")
+        return lines
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _Buckets(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+class MetricsRegistry:
+    """Metrics rendered together in the Prometheus text exposition format.
+
+    Besides counters, gauges and histograms updated as things happen, a
+    registry can sample stats() dictionaries of other components at scrape
+    time, so caches keep their own plain integer counters.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._stats = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_stats(self, prefix, documentation, stats):
+        """Expose every numeric value of stats() as a gauge named prefix_<key>"""
+        self._stats[prefix] = (documentation, stats)
+
+    def remove_stats(self, prefix):
+        self._stats.pop(prefix, None)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for prefix, (documentation, stats) in list(self._stats.items()):
+            try:
+                values = stats()
+            except Exception as e:
+                logger.warning("Error collecting %s stats: %s", prefix, e)
+                continue
+            for key, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{key}"
+                lines.append(f"# HELP {name} {documentation} ({key})")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = MetricsRegistry()
+
+LOOP_LAG = REGISTRY.histogram(
+    'eventbot_event_loop_lag_seconds', 'How late the event loop woke a sleeping task',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+LOOP_LAG_LAST = REGISTRY.gauge('eventbot_event_loop_lag_last_seconds', 'Most recent event loop lag sample')
+
+class LoopLagMonitor:
+    """Samples event loop lag by measuring how late a periodic sleep wakes up"""
+
+    def __init__(self, interval=0.5, warn_after=0.25):
+        self.interval = interval
+        self.warn_after = warn_after
+        self._task = None
+
+    async def _watch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            LOOP_LAG.observe(lag)
+            LOOP_LAG_LAST.set(lag)
+            if lag >= self.warn_after:
+                logger.warning("Event loop was blocked for %.3fs", lag)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+class MetricsServer:
+    """Serves a registry on http://host:port/metrics"""
+
+    def __init__(self, registry=REGISTRY, host='127.0.0.1', port=9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def _metrics(self, request):
+        return web.Response(
+            body=self.registry.render().encode('utf-8'),
+            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+        )
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/metrics', self._metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info("Serving metrics on http://%s:%s/metrics", self.host, self.port)
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
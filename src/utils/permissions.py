@@ -1,18 +1,18 @@
 ﻿from discord.ext import commands
 import discord
+import logging
+
+logger = logging.getLogger(__name__)
 
 def is_admin(interaction: discord.Interaction):
-    print(f"Checking admin permissions for user: {interaction.user}")
     if interaction.guild is None:
-        print("Interaction is not within a guild context.")
+        logger.debug("Admin check for %s outside a guild: denied", interaction.user)
         return False
     # Ensure the user is a Member object
     member = interaction.guild.get_member(interaction.user.id)
-    if member and member.guild_permissions.administrator:
-        print(f"User {interaction.user} is an admin.")
-        return True
-    print(f"User {interaction.user} is not an admin.")
-    return False
+    allowed = bool(member and member.guild_permissions.administrator)
+    logger.debug("Admin check for %s: %s", interaction.user, 'allowed' if allowed else 'denied')
+    return allowed
 
 def has_event_permission(interaction: discord.Interaction):
     if interaction.guild is None:
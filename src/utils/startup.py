@@ -0,0 +1,96 @@
+from contextlib import contextmanager
+import hashlib
+import json
+import logging
+import os
+import time
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+STARTUP_SECONDS = REGISTRY.gauge(
+    'eventbot_startup_phase_seconds', 'Time spent in each startup phase of this process', ['phase']
+)
+
+class StartupTimer:
+    """Wall-clock time of each startup phase, logged and exported as a gauge.
+
+    phases keeps insertion order, so the log line reads in startup order.
+    `since_start` is measured from the timer's creation, which EventBot
+    does first thing in __init__.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name, seconds):
+        self.phases[name] = seconds
+        STARTUP_SECONDS.labels(name).set(seconds)
+
+    def since_start(self):
+        return time.perf_counter() - self.started
+
+    def log(self):
+        logger.info(
+            "Startup phases: %s",
+            ', '.join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases.items())
+        )
+
+def command_tree_hash(tree):
+    """Hash of the global command payloads Discord would receive from tree.sync()"""
+    payload = sorted(
+        (command.to_dict(tree) for command in tree.get_commands()),
+        key=lambda command: (command.get('type', 1), command['name'])
+    )
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+class CommandSyncState:
+    """The hash of the last command tree synced per application, kept in a small JSON file"""
+
+    def __init__(self, path='data/command_tree.json'):
+        self.path = path
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            logger.warning("Ignoring unreadable command sync state %s: %s", self.path, e)
+            return {}
+
+    def get(self, application_id):
+        return self._load().get(str(application_id))
+
+    def set(self, application_id, digest):
+        state = self._load()
+        state[str(application_id)] = digest
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        # Write then rename so a crash never leaves half a file behind
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(state, file)
+        os.replace(temporary, self.path)
+
+async def sync_if_changed(tree, application_id, state):
+    """Sync the global command tree only when it differs from the last synced one; returns whether it synced"""
+    digest = command_tree_hash(tree)
+    if state.get(application_id) == digest:
+        logger.info("Command tree unchanged (%s), skipping sync", digest[:12])
+        return False
+    commands = await tree.sync()
+    state.set(application_id, digest)
+    logger.info("Synced %d application commands (%s)", len(commands), digest[:12])
+    return True